@@ -3,29 +3,66 @@
 import os
 import re
 import json
+import base64
 import uuid
 import logging
 import time
+import atexit
+import hashlib
 import threading
 from datetime import datetime, timezone
+from dataclasses import asdict
 from functools import wraps
 
-from flask import Flask, request, jsonify, abort, url_for
+import requests
+from flask import Flask, request, jsonify, abort, url_for, Response, stream_with_context
 from werkzeug.exceptions import HTTPException
+from sqlalchemy.exc import IntegrityError
 
 from automate_form import (
     initiate_adhar,
     submit_otp,
-    submit_pan,
-    submit_form,
-    automate_form_next,
+    execute_plan,
     submit_otp_and_captcha,
-    get_captcha_screenshot
+    get_captcha_screenshot,
+    close_driver,
+    kill_driver,
+    driver_alive,
+    portal_step_listeners
 )
+from captcha_solver import solve_captcha, CAPTCHA_CONFIDENCE_THRESHOLD
+from stage_events import stage_event_bus, publish_stage_event
+from webhooks import webhook_dispatcher
+from portal_sessions import portal_dispatcher
+from portal_health import portal_breaker, CLOSED
+from session_watchdog import session_watchdog
+from deadlines import new_deadline, deadline_passed, REGISTRATION_DEADLINE_SECONDS
+from registration_reaper import registration_reaper
+from session_registry import (
+    NODE_ID,
+    FORWARDED_HEADER,
+    claim_session,
+    release_session,
+    release_node_sessions,
+    session_owner,
+    forward_request
+)
+from gazetteer import resolve_address
+from validators import validate_registrations
+from pincode_index import lookup_coordinates
+from ifsc_directory import canonical_bank_name
+from step_plan import PlanStepError, compile_registration_plan, plan_steps
+from metrics import metrics_registry
+from db_profiling import install_query_profiling, init_request_profiling, profiled_job
 from database import (
+    engine,
     UdyamRegistration,
     get_db_session,
     Vendor,
+    WebhookDeadLetter,
+    IdempotencyKey,
+    active_registration_key,
+    load_registration_snapshot,
     FormStatus,
     Gender,
     SocialCategory,
@@ -38,12 +75,50 @@ app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "7X9Y2Z4A1B8C3D6E5F")
 
 logging.basicConfig(level=logging.DEBUG)
 DEBUG_MODE = os.environ.get("DEBUG_MODE", "False").lower() == "true"
+SSE_HEARTBEAT_SECONDS = int(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+WEBHOOKS_ENABLED = os.environ.get("WEBHOOKS_ENABLED", "True").lower() == "true"
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+
+ALL_STAGES = list(RegistrationStage)
+STAGE_ORDINALS = {stage: index for index, stage in enumerate(ALL_STAGES)}
+STATUS_FIELDS = ("form_status", "current_stage", "stages", "last_updated", "error_message")
+COMPACT_STATUS_FIELDS = ("form_status", "current_stage")
+
+BULK_STATUS_MAX_IDS = int(os.environ.get("BULK_STATUS_MAX_IDS", "50000"))
+# Stays well under SQLite's default limit of 999 bound variables per statement
+BULK_STATUS_CHUNK_SIZE = int(os.environ.get("BULK_STATUS_CHUNK_SIZE", "500"))
+# Times a failed step plan is replayed from its last checkpoint while the browser is still open
+PLAN_RESUME_ATTEMPTS = int(os.environ.get("PLAN_RESUME_ATTEMPTS", "1"))
+
+install_query_profiling(engine)
+init_request_profiling(app)
+
+if WEBHOOKS_ENABLED:
+    stage_event_bus.subscribe(webhook_dispatcher.enqueue)
+    webhook_dispatcher.start()
+    # Lets deliveries in flight finish (or reach the dead letters) instead of dying with the process
+    atexit.register(webhook_dispatcher.stop)
+
+def release_portal_session(registration_id):
+    close_driver(registration_id)
+    release_session(registration_id)
+
 
-def validate_aadhaar(aadhaar):
-    return bool(re.match(r"^\d{12}$", aadhaar))
+# Browsers do not survive a restart, so sessions this node held before are gone
+release_node_sessions()
 
-def validate_name(name):
-    return bool(re.match(r"^[a-zA-Z\s]{1,100}$", name))
+# Registrations start only while the adaptive limit on open portal sessions allows it
+portal_dispatcher.set_release_handler(release_portal_session)
+portal_step_listeners.append(portal_dispatcher.record)
+stage_event_bus.subscribe(portal_dispatcher.on_stage_event)
+# ...and while the portal circuit breaker is closed, or admitting half-open trial runs
+portal_dispatcher.set_admission(portal_breaker.allow_dispatch)
+portal_step_listeners.append(portal_breaker.record)
+portal_breaker.start()
+portal_dispatcher.start()
+# Releases the browsers of registrations whose applicant stopped responding, or that another node expired
+registration_reaper.set_local_sessions(portal_dispatcher.active_ids, portal_dispatcher.release)
+registration_reaper.start()
 
 def validate_api_key(f):
     @wraps(f)
@@ -75,11 +150,48 @@ def validate_api_key(f):
     return decorated_function
 
 
+def route_to_session_owner(f):
+    """Forward a request about a live portal session (OTP, CAPTCHA) to the node whose browser holds it"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        registration_id = (request.get_json(silent=True) or {}).get('registration_id') \
+            or request.args.get('registration_id')
+        if not registration_id or request.headers.get(FORWARDED_HEADER):
+            return f(*args, **kwargs)
+
+        owner = session_owner(registration_id, request.vendor_id)
+        if owner is None or owner.node_id == NODE_ID:
+            return f(*args, **kwargs)
+        if not owner.node_url:
+            raise InvalidAPIUsage(f"The portal session is held by node {owner.node_id}, which has no NODE_URL",
+                                  status_code=503)
+        try:
+            response = forward_request(owner.node_url, request)
+        except requests.Timeout as e:
+            # A slow owner still holds the browser and may yet finish; the session is not lost
+            app.logger.warning(f"Node {owner.node_id} holding registration {registration_id} timed out: {str(e)}")
+            raise InvalidAPIUsage(f"Node {owner.node_id} holding the portal session did not answer in time; try again",
+                                  status_code=504, payload={"registration_id": registration_id})
+        except requests.ConnectionError as e:
+            app.logger.error(f"Node {owner.node_id} holding registration {registration_id} is unreachable: {str(e)}")
+            expire_lost_session(registration_id, owner.node_id)
+            raise InvalidAPIUsage("The portal session was lost with its node; retry the registration to resume it",
+                                  status_code=409, payload={"registration_id": registration_id})
+        except requests.RequestException as e:
+            app.logger.error(f"Error forwarding registration {registration_id} to node {owner.node_id}: {str(e)}")
+            raise InvalidAPIUsage(f"Could not forward the request to node {owner.node_id}", status_code=502,
+                                  payload={"registration_id": registration_id})
+        return Response(response.content, status=response.status_code,
+                        content_type=response.headers.get("Content-Type"))
+
+    return decorated_function
+
+
 class InvalidAPIUsage(Exception):
     status_code = 400
 
-    def _init_(self, message, status_code=None, payload=None):
-        super()._init_()
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
         self.message = message
         if status_code is not None:
             self.status_code = status_code
@@ -120,210 +232,250 @@ def ensure_timezone_aware(dt):
     return dt
 
 
-def update_registration_stage(registration_id, stage, details=None, error=None):
+def update_registration_stage(registration_id, stage, details=None, error=None, form_status=None,
+                              plan_position=None, expected_status=None):
+    """Record a stage transition; with expected_status, only while the registration is still in that status.
+    Returns whether the transition was written."""
     session = get_db_session()
     try:
-        registration = session.query(UdyamRegistration).filter_by(id=registration_id).first()
+        query = session.query(UdyamRegistration).filter_by(id=registration_id)
+        if expected_status:
+            # Holds the row against the reaper until the transition is committed
+            query = query.with_for_update()
+        registration = query.first()
         if registration:
             if not isinstance(stage, RegistrationStage):
                 logging.error(f"Invalid stage type: {type(stage)}. Expected RegistrationStage")
-                return
+                return False
+            if expected_status and registration.form_status != expected_status:
+                logging.warning(f"Not moving registration {registration_id} to {stage.value}: it is "
+                                f"{registration.form_status.value}, not {expected_status.value}")
+                return False
             
             registration.current_stage = stage
             if details:
-                registration.stage_details[stage.value] = details
+                # Reassign rather than mutate so SQLAlchemy notices the JSON change
+                registration.stage_details = {**(registration.stage_details or {}), stage.value: details}
             if error:
                 registration.error_message = error
+            if form_status:
+                registration.form_status = form_status
+            if plan_position is not None:
+                registration.plan_position = plan_position
             
             # Ensure timezone awareness
-            registration.last_updated = ensure_timezone_aware(datetime.now())
+            registration.last_updated = datetime.now(timezone.utc)
+            vendor_id, form_status = registration.vendor_id, registration.form_status
             session.commit()
             logging.info(f"Updated registration {registration_id} to stage: {stage.value}")
+            publish_stage_event(vendor_id, registration_id, stage, form_status, error)
+            return True
     except Exception as e:
         session.rollback()
         logging.error(f"Error updating registration stage: {str(e)}")
     finally:
         session.close()
+    return False
 
 
+def touch_registration(registration_id, form_status):
+    """Bump last_updated while the registration is still in form_status, so the reaper leaves a
+    registration the applicant is acting on alone; returns whether it was still in that status"""
+    session = get_db_session()
+    try:
+        touched = session.query(UdyamRegistration).filter_by(id=registration_id, form_status=form_status).update(
+            {"last_updated": datetime.now(timezone.utc)}, synchronize_session=False)
+        session.commit()
+        return bool(touched)
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error touching registration {registration_id}: {str(e)}")
+        return False
+    finally:
+        session.close()
 
-def process_registration(registration_id):
+
+def save_plan_position(registration_id, plan_position):
+    """Move the resume point past a step that must not run twice, without changing the stage"""
     session = get_db_session()
     try:
-        registration = session.query(UdyamRegistration).filter_by(id=registration_id).first()
-        if not registration:
-            app.logger.error(f"Registration not found for ID: {registration_id}")
-            return
+        session.query(UdyamRegistration).filter_by(id=registration_id).update(
+            {"plan_position": plan_position, "last_updated": datetime.now(timezone.utc)},
+            synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error saving plan position for registration {registration_id}: {str(e)}")
+    finally:
+        session.close()
+
+
+
+def expire_hung_session(registration_id, op, label):
+    """Watchdog handler: kill the stuck browser and give its slot back to the pool"""
+    kill_driver(registration_id)
+    if op == "initiate_adhar":
+        # Nothing has reached the applicant yet, so the registration just goes back in the queue
+        portal_dispatcher.requeue(registration_id, process_registration, registration_id)
+        return
+    registration = load_registration_snapshot(registration_id)
+    update_registration_stage(registration_id, RegistrationStage.ERROR,
+                              {"retryable": True, "hung_step": label,
+                               "plan_position": registration.plan_position if registration else None},
+                              error=f"Portal session hung at {label} and was killed; the registration can be retried",
+                              form_status=FormStatus.ERROR)
+
+
+session_watchdog.set_expiry_handler(expire_hung_session)
+session_watchdog.start()
+
+
+def expire_lost_session(registration_id, node_id):
+    """The node holding the session cannot be reached; the registration can only be resumed.
+    If that node is still up, its reaper releases the browser once it sees the registration EXPIRED."""
+    release_session(registration_id, node_id)
+    update_registration_stage(registration_id, RegistrationStage.SESSION_EXPIRED,
+                              {"lost_node": node_id, "resumable": True},
+                              error=f"Portal session was lost with node {node_id}; retry to resume the registration",
+                              form_status=FormStatus.EXPIRED)
+
+
+def start_registration_deadline(registration_id):
+    """Fix the registration's end-to-end deadline as it is dispatched to a portal session"""
+    deadline_at = new_deadline()
+    session = get_db_session()
+    try:
+        session.query(UdyamRegistration).filter_by(id=registration_id).update({"deadline_at": deadline_at})
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error setting deadline for registration {registration_id}: {str(e)}")
+    finally:
+        session.close()
+    return deadline_at
 
+
+def fail_if_deadline_passed(registration_id, deadline_at, during):
+    """Record DEADLINE_EXCEEDED and return True when the registration has run out of budget"""
+    if not deadline_passed(deadline_at):
+        return False
+    update_registration_stage(registration_id, RegistrationStage.DEADLINE_EXCEEDED,
+                              {"deadline_at": ensure_timezone_aware(deadline_at).isoformat(), "during": during},
+                              error=f"Registration exceeded its {REGISTRATION_DEADLINE_SECONDS:g}s deadline "
+                                    f"during {during}",
+                              form_status=FormStatus.ERROR)
+    return True
+
+
+@profiled_job
+def process_registration(registration_id):
+    registration = load_registration_snapshot(registration_id)
+    if not registration:
+        app.logger.error(f"Registration not found for ID: {registration_id}")
+        portal_dispatcher.release(registration_id)
+        return
+
+    claim_session(registration_id)
+    deadline_at = start_registration_deadline(registration_id)
+    try:
         # Step 1: Initiate Aadhaar
-        result = initiate_adhar(registration.aadhaar, registration.name, registration_id)
+        result = initiate_adhar(registration.aadhaar, registration.name, registration_id, deadline_at=deadline_at)
         if "Error" in result:
             raise Exception(result)
         
         update_registration_stage(registration_id, RegistrationStage.AADHAAR_SUBMITTED, 
                                   {"aadhaar": registration.aadhaar, "name": registration.name})
-        
-        registration.form_status = FormStatus.AWAITING_OTP
-        session.commit()
+        update_registration_stage(registration_id, RegistrationStage.OTP_REQUESTED,
+                                  form_status=FormStatus.AWAITING_OTP)
 
         # Wait for OTP submission (this will be handled by a separate API endpoint)
         app.logger.info(f"Waiting for OTP submission for registration ID: {registration_id}")
-        return
 
     except Exception as e:
+        if session_watchdog.pop_expired(registration_id):
+            # The watchdog killed this session and has already requeued the registration
+            return
+        if fail_if_deadline_passed(registration_id, deadline_at, "the Aadhaar step"):
+            return
+        if portal_breaker.state != CLOSED:
+            # The portal is down; wait in the queue for it to recover instead of failing
+            app.logger.warning(f"Portal unavailable, requeueing registration {registration_id}: {str(e)}")
+            portal_dispatcher.requeue(registration_id, process_registration, registration_id)
+            return
         update_registration_stage(registration_id, RegistrationStage.ERROR, 
-                                  error=f"Error processing registration: {str(e)}")
-        registration.form_status = FormStatus.ERROR
-        session.commit()
+                                  error=f"Error processing registration: {str(e)}",
+                                  form_status=FormStatus.ERROR)
         app.logger.error(f"Error processing registration {registration_id}: {str(e)}")
-    finally:
-        session.close()
 
 
+@profiled_job
 def continue_registration_after_otp(registration_id):
-    session = get_db_session()
     logging.info(f"Starting post-OTP registration process for ID: {registration_id}")
-    
-    try:
-        registration = session.query(UdyamRegistration).filter_by(id=registration_id).first()
-        if not registration:
-            error_msg = f"Registration not found for ID: {registration_id}"
-            logging.error(error_msg)
-            raise ValueError(error_msg)
+    # The browser work below takes minutes; hold a detached snapshot rather than a session so
+    # no pooled connection stays checked out, and write each stage in its own short transaction
+    registration = load_registration_snapshot(registration_id)
+    if not registration:
+        error_msg = f"Registration not found for ID: {registration_id}"
+        logging.error(error_msg)
+        raise ValueError(error_msg)
 
-        try:
-            # Step 2: Submit PAN
-            logging.info("Starting PAN submission process")
-            pan_data = {
-                "pan": registration.pan,
-                "pan_name": registration.pan_name,
-                "dob": registration.dob,
-                "have_gstin": registration.have_gstin
-            }
-            
-            result = submit_pan(pan_data, registration_id)
-            if isinstance(result, str) and "Error" in result:
-                raise Exception(f"PAN submission failed: {result}")
-            
-            update_registration_stage(registration_id, RegistrationStage.PAN_SUBMITTED, 
-                                    {"pan_data": pan_data, "submission_result": result})
-            logging.info("PAN submission completed successfully")
-
-            # Step 3: Submit Basic Form Details
-            logging.info("Starting basic form submission")
-            form_data = {
-                # Personal Details
-                "mobile": registration.mobile,
-                "email": registration.email,
-                "social_category": registration.social_category.value,
-                "gender": registration.gender.value,
-                "specially_abled": "Y" if registration.specially_abled else "N",
-                
-                # Enterprise Details
-                "enterprise_name": registration.enterprise_name,
-                "unit_name": registration.unit_name,
-                
-                # Plant Address
-                "premises_number": registration.premises_number,
-                "building_name": registration.building_name,
-                "village_town": registration.village_town,
-                "block": registration.block,
-                "road_street_lane": registration.road_street_lane,
-                "city": registration.city,
-                "state": registration.state,
-                "district": registration.district,
-                "pincode": registration.pincode,
-                
-                # Official Address
-                "official_premises_number": registration.official_premises_number,
-                "official_address": registration.official_address,
-                "official_town": registration.official_town,
-                "official_block": registration.official_block,
-                "official_lane": registration.official_lane,
-                "official_city": registration.official_city,
-                "official_state": registration.official_state,
-                "official_district": registration.official_district,
-                "official_pincode": registration.official_pincode,
-                
-                # Business Details
-                "date_of_incorporation": registration.date_of_incorporation,
-                "date_of_commencement": registration.date_of_commencement,
-                "bank_name": registration.bank_name,
-                "account_number": registration.account_number,
-                "ifsc_code": registration.ifsc_code
-            }
-            
-            result = submit_form(form_data, registration_id)
-            if isinstance(result, str) and "Error" in result:
-                raise Exception(f"Form submission failed: {result}")
-            
-            update_registration_stage(registration_id, RegistrationStage.BASIC_DETAILS_FILLED, 
-                                    {"form_data": form_data, "submission_result": result})
-            logging.info("Basic form details submitted successfully")
-
-            # Step 4: Submit Additional Details
-            logging.info("Starting additional details submission")
-            additional_data = {
-                "major_activity": registration.major_activity,
-                "second_form_section": registration.second_form_section,
-                "nic_codes": registration.nic_codes,
-                "employee_counts": {
-                    "male": registration.male_employees,
-                    "female": registration.female_employees,
-                    "others": registration.other_employees
-                },
-                "investment_data": {
-                    "wdv": registration.investment_wdv,
-                    "exclusion_cost": registration.investment_exclusion_cost
-                },
-                "turnover_data": {
-                    "total_turnover": registration.total_turnover,
-                    "export_turnover": registration.export_turnover
-                },
-                "district": registration.district
-            }
-            
-            result = automate_form_next(registration_id, **additional_data)
-            if isinstance(result, dict) and result.get('status') == 'error':
-                raise Exception(f"Additional details submission failed: {result.get('message')}")
-            
-            update_registration_stage(registration_id, RegistrationStage.ADDITIONAL_DETAILS_FILLED, 
-                                    {"additional_data": additional_data, "submission_result": result})
-            logging.info("Additional details submitted successfully")
+    def checkpoint(position, stage, details):
+        if stage is None:
+            save_plan_position(registration_id, position)
+        else:
+            update_registration_stage(registration_id, stage, details, plan_position=position)
 
-            # Update final status
-            registration.form_status = FormStatus.COMPLETED
-            registration.current_stage = RegistrationStage.COMPLETED
-            session.commit()
-            logging.info(f"Registration {registration_id} completed successfully")
+    try:
+        # PAN, basic details and additional details, as compiled at ingest
+        steps = plan_steps(asdict(registration))
+        start_step = 0
+        for attempt in range(PLAN_RESUME_ATTEMPTS + 1):
+            try:
+                outputs = execute_plan(steps, registration_id, start=start_step, on_checkpoint=checkpoint,
+                                       deadline_at=registration.deadline_at)
+                break
+            except PlanStepError as step_error:
+                # The page is still where the last checkpoint left it, so replay from there
+                if attempt == PLAN_RESUME_ATTEMPTS or not driver_alive(registration_id):
+                    raise
+                start_step = load_registration_snapshot(registration_id).plan_position
+                logging.warning(f"Resuming registration {registration_id} from plan step {start_step} "
+                                f"after: {str(step_error)}")
 
-        except Exception as process_error:
-            error_msg = f"Process error: {str(process_error)}"
-            logging.error(error_msg)
-            update_registration_stage(registration_id, RegistrationStage.ERROR, error=error_msg)
-            registration.form_status = FormStatus.ERROR
-            session.commit()
-            raise Exception(error_msg)
+        # The portal now waits for the final OTP and CAPTCHA; completion is recorded by
+        # submit_otp_and_captcha_route once the portal accepts them
+        update_registration_stage(registration_id, RegistrationStage.CAPTCHA_REQUIRED,
+                                  {"captcha_url": outputs.get("captcha_url")},
+                                  form_status=FormStatus.IN_PROGRESS, plan_position=len(steps))
+        logging.info(f"Registration {registration_id} is awaiting final OTP and CAPTCHA")
 
-    except Exception as e:
-        error_msg = f"Error continuing registration {registration_id}: {str(e)}"
+    except Exception as process_error:
+        error_msg = f"Error continuing registration {registration_id}: Process error: {str(process_error)}"
         logging.error(error_msg)
-        try:
-            update_registration_stage(registration_id, RegistrationStage.ERROR, error=error_msg)
-            if registration:
-                registration.form_status = FormStatus.ERROR
-                session.commit()
-        except Exception as commit_error:
-            logging.error(f"Failed to record error state: {str(commit_error)}")
+        if session_watchdog.pop_expired(registration_id):
+            # Already recorded as a retryable hang by the watchdog
+            return
+        if fail_if_deadline_passed(registration_id, registration.deadline_at, "the registration form"):
+            return
+        update_registration_stage(registration_id, RegistrationStage.ERROR, error=error_msg,
+                                  form_status=FormStatus.ERROR)
         raise Exception(error_msg)
 
-    finally:
-        try:
-            session.close()
-            logging.info(f"Session closed for registration {registration_id}")
-        except Exception as session_error:
-            logging.error(f"Error closing session: {str(session_error)}")
 
+def idempotent_replay(session, idempotency_key, request_hash):
+    """Return the stored response for a repeated Idempotency-Key, or None if the key is new"""
+    record = session.query(IdempotencyKey).filter_by(vendor_id=request.vendor_id, key=idempotency_key).first()
+    if not record:
+        return None
+    if record.request_hash != request_hash:
+        raise InvalidAPIUsage("Idempotency-Key was already used with a different request body", status_code=422)
+    response = jsonify({
+        "status": "success",
+        "message": "Request already processed",
+        "registration_ids": record.registration_ids
+    })
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, 200
 
 @app.route("/api/udyam/register", methods=["POST"])
 @validate_api_key
@@ -332,11 +484,58 @@ def register_udyam():
     if not isinstance(data, list):
         data = [data]  # Convert single registration to list
     
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise InvalidAPIUsage("Idempotency-Key must be 1 to 255 characters", status_code=400)
+    request_hash = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    if idempotency_key:
+        session = get_db_session()
+        try:
+            replay = idempotent_replay(session, idempotency_key, request_hash)
+        finally:
+            session.close()
+        if replay:
+            return replay
+    
+    # Validate the whole batch before anything is stored, so bad rows never take a browser slot
+    validation_errors = validate_registrations(data)
+    if validation_errors:
+        raise InvalidAPIUsage("Invalid registration data", status_code=400, payload={"errors": validation_errors})
+    
+    # Resolve addresses, coordinates and the bank name locally so the browser can set them directly
+    for registration_data in data:
+        # The applicant's state/district spelling is stored as given; canonical names only drive lookups
+        address_fields, resolved_options, _ = resolve_address(registration_data)
+        registration_data['bank_name'] = canonical_bank_name(registration_data['ifsc_code'],
+                                                             registration_data.get('bank_name'))
+        coordinates = lookup_coordinates(registration_data.get('pincode'),
+                                         address_fields.get('state', registration_data.get('state')),
+                                         address_fields.get('district', registration_data.get('district')))
+        if coordinates:
+            resolved_options['coordinates'] = list(coordinates)
+        registration_data['resolved_options'] = resolved_options
+    
     session = get_db_session()
     registration_ids = []
+    new_registration_ids = []
     
     try:
-        for registration_data in data:
+        # One active registration per applicant: retries return the registration already in flight
+        active_keys = [
+            active_registration_key(request.vendor_id, registration_data['aadhaar'], registration_data['pan'])
+            for registration_data in data
+        ]
+        active_registrations = dict(
+            session.query(UdyamRegistration.active_key, UdyamRegistration.id)
+            .filter(UdyamRegistration.active_key.in_(set(active_keys)))
+            .all()
+        )
+        
+        for registration_data, active_key in zip(data, active_keys):
+            if active_key in active_registrations:
+                registration_ids.append(active_registrations[active_key])
+                continue
+            
             registration_id = str(uuid.uuid4())
             registration_data['id'] = registration_id
             registration_data['vendor_id'] = request.vendor_id
@@ -355,22 +554,41 @@ def register_udyam():
             else:
                 registration_data['specially_abled'] = False
             
+            registration_data['step_plan'] = compile_registration_plan(registration_data)
             new_registration = UdyamRegistration(**registration_data)
             session.add(new_registration)
             registration_ids.append(registration_id)
+            new_registration_ids.append(registration_id)
+            active_registrations[active_key] = registration_id
         
+        if idempotency_key:
+            session.add(IdempotencyKey(
+                vendor_id=request.vendor_id,
+                key=idempotency_key,
+                request_hash=request_hash,
+                registration_ids=registration_ids
+            ))
         session.commit()
         
-        # Start the registration process for each registration in separate threads
-        for reg_id in registration_ids:
+        # Queue each new registration; it starts once a portal session is free
+        for reg_id in new_registration_ids:
             update_registration_stage(reg_id, RegistrationStage.INITIATED)
-            threading.Thread(target=process_registration, args=(reg_id,)).start()
+            portal_dispatcher.submit(reg_id, process_registration, reg_id)
         
         return jsonify({
             "status": "success", 
-            "message": f"{len(registration_ids)} registrations initiated successfully",
-            "registration_ids": registration_ids
-        }), 202
+            "message": f"{len(new_registration_ids)} registrations initiated successfully",
+            "registration_ids": registration_ids,
+            "duplicate_registration_ids": [reg_id for reg_id in registration_ids if reg_id not in new_registration_ids]
+        }), 202 if new_registration_ids else 200
+    except IntegrityError:
+        # A concurrent request with the same Idempotency-Key or applicant committed first
+        session.rollback()
+        replay = idempotent_replay(session, idempotency_key, request_hash) if idempotency_key else None
+        if replay:
+            return replay
+        raise InvalidAPIUsage("A registration for this applicant is already being created, retry the request",
+                              status_code=409)
     except Exception as e:
         session.rollback()
         app.logger.error(f"Error in register_udyam: {str(e)}")
@@ -380,79 +598,148 @@ def register_udyam():
 
 @app.route("/api/udyam/submit_otp", methods=["POST"])
 @validate_api_key
+@route_to_session_owner
 def submit_otp_route():
     data = request.json
     if 'otp' not in data or 'registration_id' not in data:
         raise InvalidAPIUsage("OTP and registration ID are required", status_code=400)
     
     registration_id = data['registration_id']
-    db_session = get_db_session()
+    # The OTP postback can take a minute; a snapshot keeps no session or connection open across it
+    registration = load_registration_snapshot(registration_id)
+    if not registration or registration.vendor_id != request.vendor_id:
+        raise InvalidAPIUsage("Registration not found", status_code=404)
+    
+    if registration.form_status != FormStatus.AWAITING_OTP:
+        raise InvalidAPIUsage("Registration is not awaiting OTP", status_code=400)
+    # The applicant has answered; restart the reaper's clock before the (up to a minute long) postback
+    if not touch_registration(registration_id, FormStatus.AWAITING_OTP):
+        raise InvalidAPIUsage("Registration is no longer awaiting OTP", status_code=409)
+    
     try:
-        registration = db_session.query(UdyamRegistration).filter_by(id=registration_id, vendor_id=request.vendor_id).first()
-        if not registration:
-            raise InvalidAPIUsage("Registration not found", status_code=404)
-        
-        if registration.form_status != FormStatus.AWAITING_OTP:
-            raise InvalidAPIUsage("Registration is not awaiting OTP", status_code=400)
-        
-        result = submit_otp(data['otp'], registration_id)
+        result = submit_otp(data['otp'], registration_id, deadline_at=registration.deadline_at)
         if "Error" in result:
+            if fail_if_deadline_passed(registration_id, registration.deadline_at, "OTP verification"):
+                raise InvalidAPIUsage("Registration deadline exceeded", status_code=409)
             raise InvalidAPIUsage(result, status_code=500)
         
-        update_registration_stage(registration_id, RegistrationStage.OTP_VERIFIED, {"otp": data['otp']})
-        registration.form_status = FormStatus.OTP_VERIFIED
-        db_session.commit()
+        if not update_registration_stage(registration_id, RegistrationStage.OTP_VERIFIED, {"otp": data['otp']},
+                                         form_status=FormStatus.OTP_VERIFIED,
+                                         expected_status=FormStatus.AWAITING_OTP):
+            # Expired (and its browser released) while the OTP was being submitted
+            raise InvalidAPIUsage("Registration is no longer awaiting OTP; retry the registration", status_code=409)
         
         # Continue with the rest of the registration process
         threading.Thread(target=continue_registration_after_otp, args=(registration_id,)).start()
         
         return jsonify({"status": "success", "message": "OTP verified, continuing registration"})
+    except InvalidAPIUsage:
+        raise
     except Exception as e:
-        db_session.rollback()
         raise InvalidAPIUsage(str(e), status_code=500)
-    finally:
-        db_session.close()
 
 @app.route("/api/udyam/status/<registration_id>", methods=["GET"])
 @validate_api_key
 def get_registration_status(registration_id):
+    if request.args.get('compact', 'false').lower() == 'true':
+        fields = COMPACT_STATUS_FIELDS
+    elif request.args.get('fields'):
+        fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+        unknown = [field for field in fields if field not in STATUS_FIELDS]
+        if unknown:
+            raise InvalidAPIUsage(f"Unknown status fields: {', '.join(unknown)}", status_code=400)
+    else:
+        fields = STATUS_FIELDS
+
     session = get_db_session()
     try:
-        registration = session.query(UdyamRegistration).filter_by(id=registration_id, vendor_id=request.vendor_id).first()
-        if not registration:
+        # Only the small columns are read up front; stage_details is fetched when actually needed
+        row = session.query(
+            UdyamRegistration.last_updated,
+            UdyamRegistration.form_status,
+            UdyamRegistration.current_stage,
+            UdyamRegistration.error_message
+        ).filter_by(id=registration_id, vendor_id=request.vendor_id).first()
+        if not row:
             raise InvalidAPIUsage("Registration not found", status_code=404)
         
-        # Get all stages in order
-        all_stages = list(RegistrationStage)
-        current_stage_index = all_stages.index(registration.current_stage)
-        
-        # Create a list of all stages with their status
-        stages_status = []
-        for stage in all_stages:
-            stage_info = {
-                "stage": stage.value,
-                "completed": all_stages.index(stage) <= current_stage_index,
-                "details": registration.stage_details.get(stage.value, {})
-            }
-            stages_status.append(stage_info)
+        etag = hashlib.sha1(
+            f"{registration_id}|{row.last_updated.isoformat()}|{','.join(fields)}".encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
         
         status_info = {
             "status": "success",
-            "registration_id": registration_id,
-            "form_status": registration.form_status.value,
-            "current_stage": registration.current_stage.value,
-            "stages": stages_status,
-            "last_updated": registration.last_updated.isoformat(),
-            "error_message": registration.error_message
+            "registration_id": registration_id
         }
+        if "form_status" in fields:
+            status_info["form_status"] = row.form_status.value
+        if "current_stage" in fields:
+            status_info["current_stage"] = row.current_stage.value
+        if "stages" in fields:
+            stage_details = session.query(UdyamRegistration.stage_details).filter_by(id=registration_id).scalar() or {}
+            current_stage_index = STAGE_ORDINALS[row.current_stage]
+            status_info["stages"] = [{
+                "stage": stage.value,
+                "completed": index <= current_stage_index,
+                "details": stage_details.get(stage.value, {})
+            } for index, stage in enumerate(ALL_STAGES)]
+        if "last_updated" in fields:
+            status_info["last_updated"] = row.last_updated.isoformat()
+        if "error_message" in fields:
+            status_info["error_message"] = row.error_message
 
-        return jsonify(status_info)
+        response = jsonify(status_info)
+        response.set_etag(etag)
+        return response
+    except InvalidAPIUsage:
+        raise
     except Exception as e:
         raise InvalidAPIUsage(str(e), status_code=400)
     finally:
         session.close()
 
 
+@app.route("/api/udyam/events", methods=["GET"])
+@validate_api_key
+def stream_registration_events():
+    vendor_id = request.vendor_id
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            raise InvalidAPIUsage("Invalid Last-Event-ID", status_code=400)
+    else:
+        last_event_id = stage_event_bus.latest_id(vendor_id)
+
+    def generate():
+        cursor = last_event_id
+        yield "retry: 3000\n\n"
+        while True:
+            events, missed = stage_event_bus.wait_for_events(vendor_id, cursor, SSE_HEARTBEAT_SECONDS)
+            if missed:
+                # Events were dropped from the buffer; the client should resync via bulk_status
+                yield "event: resync\ndata: {}\n\n"
+                cursor = events[0]["id"] - 1 if events else max(cursor, stage_event_bus.boot_id)
+                continue
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield f"id: {event['id']}\nevent: stage\ndata: {json.dumps(event)}\n\n"
+                cursor = event["id"]
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/api/udyam/retry", methods=["POST"])
 @validate_api_key
 def retry_registration():
@@ -467,24 +754,34 @@ def retry_registration():
         if not registration:
             raise InvalidAPIUsage("Registration not found", status_code=404)
         
-        if registration.form_status != FormStatus.ERROR:
-            raise InvalidAPIUsage("Only failed registrations can be retried", status_code=400)
+        # Expired registrations are resumed the same way, from a fresh portal session
+        if registration.form_status not in (FormStatus.ERROR, FormStatus.EXPIRED):
+            raise InvalidAPIUsage("Only failed or expired registrations can be retried", status_code=400)
         
         # Reset the status and start the process again
         registration.form_status = FormStatus.INITIATED
         registration.current_stage = RegistrationStage.INITIATED
         registration.stage_details = {}
         registration.error_message = None
+        registration.plan_position = 0
+        registration.deadline_at = None
         db_session.commit()
         
-        # Start the registration process in a separate thread
-        threading.Thread(target=process_registration, args=(registration_id,)).start()
+        # Queue the registration again; it starts once a portal session is free
+        portal_dispatcher.submit(registration_id, process_registration, registration_id)
         
         return jsonify({
             "status": "success", 
             "message": "Registration retry initiated successfully",
             "registration_id": registration_id
         }), 202
+    except IntegrityError:
+        # Another registration for the same applicant became active while this one was failed
+        db_session.rollback()
+        active_key = active_registration_key(registration.vendor_id, registration.aadhaar, registration.pan)
+        active = db_session.query(UdyamRegistration.id).filter_by(active_key=active_key).first()
+        raise InvalidAPIUsage("Another registration for this applicant is already active", status_code=409,
+                              payload={"registration_id": active.id if active else None})
     except Exception as e:
         db_session.rollback()
         raise InvalidAPIUsage(str(e), status_code=500)
@@ -493,72 +790,103 @@ def retry_registration():
 
 @app.route("/api/udyam/fetch_captcha", methods=["GET"])
 @validate_api_key
+@route_to_session_owner
 def fetch_captcha():
     registration_id = request.args.get('registration_id')
     if not registration_id:
         raise InvalidAPIUsage("Registration ID is required", status_code=400)
 
-    db_session = get_db_session()
-    try:
-        registration = db_session.query(UdyamRegistration).filter_by(id=registration_id, vendor_id=request.vendor_id).first()
-        if not registration:
-            raise InvalidAPIUsage("Registration not found", status_code=404)
+    registration = load_registration_snapshot(registration_id)
+    if not registration or registration.vendor_id != request.vendor_id:
+        raise InvalidAPIUsage("Registration not found", status_code=404)
 
-        captcha_path = get_captcha_screenshot(registration_id)
+    try:
+        captcha_path = get_captcha_screenshot(registration_id, deadline_at=registration.deadline_at)
         if captcha_path:
             # Get the filename from the full path
             captcha_filename = os.path.basename(captcha_path)
             
-            # Construct the URL for the captcha image
+            # Construct the URL for the captcha image; only the node holding the session serves it
             captcha_url = url_for('static', filename=f'captcha_images/{captcha_filename}', _external=True)
+            with open(captcha_path, 'rb') as f:
+                captcha_image = base64.b64encode(f.read()).decode('ascii')
             
-            update_registration_stage(registration_id, RegistrationStage.CAPTCHA_REQUIRED, {"captcha_url": captcha_url})
+            # Try the local solver first; only low-confidence guesses need a human
+            stage_details = {"captcha_url": captcha_url}
+            guess = solve_captcha(captcha_path)
+            captcha_solved = bool(guess and guess.text and guess.confidence >= CAPTCHA_CONFIDENCE_THRESHOLD)
+            if captcha_solved:
+                stage_details.update({
+                    "captcha_guess": guess.text,
+                    "captcha_confidence": guess.confidence,
+                    "captcha_solver": guess.solver
+                })
+                app.logger.info(f"CAPTCHA for {registration_id} solved by {guess.solver} "
+                                f"with confidence {guess.confidence:.2f}")
+            
+            update_registration_stage(registration_id, RegistrationStage.CAPTCHA_REQUIRED, stage_details)
             
             return jsonify({
                 "status": "success", 
-                "message": "CAPTCHA screenshot saved successfully",
-                "captcha_url": captcha_url
+                "message": "CAPTCHA solved automatically, only OTP is required" if captcha_solved
+                           else "CAPTCHA screenshot saved successfully",
+                "captcha_url": captcha_url,
+                # Inline, so the image arrives even when the request was forwarded to another node
+                "captcha_image": captcha_image,
+                "captcha_solved": captcha_solved
             })
         else:
             raise InvalidAPIUsage("Failed to capture CAPTCHA screenshot", status_code=500)
+    except InvalidAPIUsage:
+        raise
     except Exception as e:
         raise InvalidAPIUsage(str(e), status_code=500)
-    finally:
-        db_session.close()
 
 @app.route("/api/udyam/submit_otp_and_captcha", methods=["POST"])
 @validate_api_key
+@route_to_session_owner
 def submit_otp_and_captcha_route():
     data = request.json
-    if 'otp' not in data or 'captcha' not in data or 'registration_id' not in data:
+    if 'otp' not in data or 'registration_id' not in data:
         raise InvalidAPIUsage("OTP, CAPTCHA, and registration ID are required", status_code=400)
     
     registration_id = data['registration_id']
-    db_session = get_db_session()
+    registration = load_registration_snapshot(registration_id)
+    if not registration or registration.vendor_id != request.vendor_id:
+        raise InvalidAPIUsage("Registration not found", status_code=404)
+    
+    # Fall back to the solver's guess when the vendor did not supply a CAPTCHA
+    captcha = data.get('captcha')
+    if not captcha:
+        captcha_details = registration.stage_details.get(RegistrationStage.CAPTCHA_REQUIRED.value, {})
+        captcha = captcha_details.get('captcha_guess')
+    if not captcha:
+        raise InvalidAPIUsage("OTP, CAPTCHA, and registration ID are required", status_code=400)
+    # Keeps the reaper off a CAPTCHA the applicant has just answered
+    if not touch_registration(registration_id, FormStatus.IN_PROGRESS):
+        raise InvalidAPIUsage("Registration is no longer awaiting the final OTP and CAPTCHA", status_code=409)
+    
     try:
-        registration = db_session.query(UdyamRegistration).filter_by(id=registration_id, vendor_id=request.vendor_id).first()
-        if not registration:
-            raise InvalidAPIUsage("Registration not found", status_code=404)
-        
-        result = submit_otp_and_captcha(data['otp'], data['captcha'], registration_id)
+        result = submit_otp_and_captcha(data['otp'], captcha, registration_id, deadline_at=registration.deadline_at)
+        # The browser is closed whatever the outcome, so its session slot is free again
+        portal_dispatcher.release(registration_id)
         
+        # Only while still IN_PROGRESS, so an outcome never overwrites a reaper or deadline write
         if result['status'] == 'success':
-            update_registration_stage(registration_id, RegistrationStage.COMPLETED, 
-                                      {"otp": data['otp'], "captcha": data['captcha']})
-            registration.form_status = FormStatus.COMPLETED
+            if not update_registration_stage(registration_id, RegistrationStage.COMPLETED,
+                                             {"otp": data['otp'], "captcha": captcha},
+                                             form_status=FormStatus.COMPLETED,
+                                             expected_status=FormStatus.IN_PROGRESS):
+                logging.warning(f"Portal accepted registration {registration_id} after it had already ended")
         elif result['status'] == 'error':
-            update_registration_stage(registration_id, RegistrationStage.ERROR, 
-                                      error=result['message'])
-            registration.form_status = FormStatus.ERROR
-        
-        db_session.commit()
+            if not fail_if_deadline_passed(registration_id, registration.deadline_at, "the final submission"):
+                update_registration_stage(registration_id, RegistrationStage.ERROR,
+                                          error=result['message'], form_status=FormStatus.ERROR,
+                                          expected_status=FormStatus.IN_PROGRESS)
         
         return jsonify(result)
     except Exception as e:
-        db_session.rollback()
         raise InvalidAPIUsage(str(e), status_code=500)
-    finally:
-        db_session.close()
 
 @app.route("/api/vendor/register", methods=["POST"])
 def register_vendor():
@@ -608,6 +936,71 @@ def refresh_api_key():
     finally:
         db_session.close()
 
+@app.route("/api/vendor/webhook", methods=["POST"])
+@validate_api_key
+def register_webhook():
+    data = request.json or {}
+    if 'url' not in data:
+        raise InvalidAPIUsage("Webhook URL is required", status_code=400)
+    
+    url = data['url']
+    if url and not re.match(r"^https?://", url):
+        raise InvalidAPIUsage("Webhook URL must be http(s)", status_code=400)
+    
+    db_session = get_db_session()
+    try:
+        vendor = db_session.query(Vendor).filter_by(id=request.vendor_id).first()
+        if not vendor:
+            raise InvalidAPIUsage("Vendor not found", status_code=404)
+        
+        # A null URL disables delivery
+        vendor.webhook_url = url or None
+        if url:
+            vendor.generate_webhook_secret()
+        else:
+            vendor.webhook_secret = None
+        db_session.commit()
+        webhook_dispatcher.invalidate_target(vendor.id)
+        
+        return jsonify({
+            "status": "success",
+            "message": "Webhook registered successfully" if url else "Webhook disabled",
+            "webhook_url": vendor.webhook_url,
+            "webhook_secret": vendor.webhook_secret
+        })
+    except Exception as e:
+        db_session.rollback()
+        raise InvalidAPIUsage(str(e), status_code=400)
+    finally:
+        db_session.close()
+
+@app.route("/api/vendor/webhook/dead_letters", methods=["GET"])
+@validate_api_key
+def get_webhook_dead_letters():
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    
+    db_session = get_db_session()
+    try:
+        dead_letters = db_session.query(WebhookDeadLetter).filter_by(vendor_id=request.vendor_id)\
+            .order_by(WebhookDeadLetter.created_at.desc())\
+            .limit(limit).all()
+        
+        return jsonify({
+            "status": "success",
+            "dead_letters": [{
+                "id": letter.id,
+                "webhook_url": letter.webhook_url,
+                "payload": letter.payload,
+                "attempts": letter.attempts,
+                "last_error": letter.last_error,
+                "created_at": letter.created_at.isoformat()
+            } for letter in dead_letters]
+        })
+    except Exception as e:
+        raise InvalidAPIUsage(str(e), status_code=400)
+    finally:
+        db_session.close()
+
 @app.route("/api/vendor/registrations", methods=["GET"])
 @validate_api_key
 def get_vendor_registrations():
@@ -616,9 +1009,13 @@ def get_vendor_registrations():
     
     db_session = get_db_session()
     try:
-        registrations = db_session.query(UdyamRegistration).filter_by(vendor_id=request.vendor_id)\
-            .order_by(UdyamRegistration.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        # Plain SQLAlchemy queries have no paginate(); page with offset/limit and a separate count
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), 100)
+        query = db_session.query(UdyamRegistration).filter_by(vendor_id=request.vendor_id)
+        total = query.count()
+        items = query.order_by(UdyamRegistration.created_at.desc())\
+            .offset((page - 1) * per_page).limit(per_page).all()
         
         registration_list = [{
             "id": reg.id,
@@ -628,13 +1025,13 @@ def get_vendor_registrations():
             "current_stage": reg.current_stage.value,
             "created_at": reg.created_at.isoformat(),
             "last_updated": reg.last_updated.isoformat()
-        } for reg in registrations.items]
+        } for reg in items]
         
         return jsonify({
             "status": "success",
             "registrations": registration_list,
-            "total": registrations.total,
-            "pages": registrations.pages,
+            "total": total,
+            "pages": (total + per_page - 1) // per_page,
             "current_page": page
         })
     except Exception as e:
@@ -677,32 +1074,79 @@ def process_registration_with_retry(registration_id, max_retries=3):
             else:
                 time.sleep(5 * (attempt + 1))  # Exponential backoff
 
+def parse_changed_since(value):
+    try:
+        changed_since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise InvalidAPIUsage("Invalid changed_since timestamp. Use ISO 8601", status_code=400)
+    # Timestamps are stored as naive UTC (every writer uses datetime.now(timezone.utc))
+    if changed_since.tzinfo is not None:
+        changed_since = changed_since.astimezone(timezone.utc).replace(tzinfo=None)
+    return changed_since
+
 @app.route("/api/udyam/bulk_status", methods=["POST"])
 @validate_api_key
 def get_bulk_registration_status():
-    data = request.json
-    if 'registration_ids' not in data or not isinstance(data['registration_ids'], list):
+    data = request.json or {}
+    registration_ids = data.get('registration_ids')
+    changed_since = data.get('changed_since')
+    include_errors = data.get('include_errors', True)
+    
+    if registration_ids is None and not changed_since:
+        raise InvalidAPIUsage("List of registration IDs is required", status_code=400)
+    if registration_ids is not None and not isinstance(registration_ids, list):
         raise InvalidAPIUsage("List of registration IDs is required", status_code=400)
+    if registration_ids is not None and len(registration_ids) > BULK_STATUS_MAX_IDS:
+        raise InvalidAPIUsage(f"At most {BULK_STATUS_MAX_IDS} registration IDs are allowed per call", status_code=400)
+    if changed_since:
+        changed_since = parse_changed_since(changed_since)
     
+    # Only the covering index columns are selected unless error messages are asked for
+    columns = [
+        UdyamRegistration.id,
+        UdyamRegistration.form_status,
+        UdyamRegistration.current_stage,
+        UdyamRegistration.last_updated
+    ]
+    if include_errors:
+        columns.append(UdyamRegistration.error_message)
+    
+    server_time = datetime.now(timezone.utc)
     db_session = get_db_session()
     try:
-        registrations = db_session.query(UdyamRegistration).filter(
-            UdyamRegistration.id.in_(data['registration_ids']),
-            UdyamRegistration.vendor_id == request.vendor_id
-        ).all()
+        base_query = db_session.query(*columns).filter(UdyamRegistration.vendor_id == request.vendor_id)
+        if changed_since:
+            base_query = base_query.filter(UdyamRegistration.last_updated > changed_since)
         
-        status_info = [{
-            "registration_id": reg.id,
-            "form_status": reg.form_status.value,
-            "current_stage": reg.current_stage.value,
-            "last_updated": reg.last_updated.isoformat(),
-            "error_message": reg.error_message
-        } for reg in registrations]
+        if registration_ids is None:
+            chunks = [base_query]
+        else:
+            unique_ids = list(dict.fromkeys(str(reg_id) for reg_id in registration_ids))
+            chunks = [
+                base_query.filter(UdyamRegistration.id.in_(unique_ids[i:i + BULK_STATUS_CHUNK_SIZE]))
+                for i in range(0, len(unique_ids), BULK_STATUS_CHUNK_SIZE)
+            ]
+        
+        status_info = []
+        for chunk in chunks:
+            for reg in chunk:
+                item = {
+                    "registration_id": reg.id,
+                    "form_status": reg.form_status.value,
+                    "current_stage": reg.current_stage.value,
+                    "last_updated": reg.last_updated.isoformat()
+                }
+                if include_errors:
+                    item["error_message"] = reg.error_message
+                status_info.append(item)
         
         return jsonify({
             "status": "success",
-            "registrations": status_info
+            "registrations": status_info,
+            "server_time": server_time.isoformat()
         })
+    except InvalidAPIUsage:
+        raise
     except Exception as e:
         raise InvalidAPIUsage(str(e), status_code=400)
     finally:
@@ -788,6 +1232,13 @@ def export_registrations():
     finally:
         db_session.close()
 
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    if not METRICS_ENABLED:
+        abort(404)
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     app.run(debug=DEBUG_MODE, port=2000)
 
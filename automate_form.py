@@ -4,11 +4,15 @@
 import os
 import re
 import time
+import difflib
 import logging
-from datetime import datetime, timezone
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
 from io import BytesIO
 
 
+import psutil
 from PIL import Image
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -20,52 +24,45 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.common.exceptions import (
-    StaleElementReferenceException,
-    TimeoutException,
-    ElementClickInterceptedException,
-)
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 from webdriver_manager.firefox import GeckoDriverManager
-from database import RegistrationStage, get_db_session, UdyamRegistration
+from database import RegistrationStage
+from nic_catalogue import get_nic_catalogue
+from locators import PortalPage, locator
+from metrics import metrics_registry
+from step_plan import PlanStepError, step_label
+from session_watchdog import session_watchdog
+from deadlines import DeadlineExceeded, bounded, deadline_bounded, deadline_passed
 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Point at mock_portal.py to run the automation offline
+UDYAM_PORTAL_URL = os.getenv("UDYAM_PORTAL_URL", "https://udyamregistration.gov.in/UdyamRegistration.aspx")
+CHROME_HEADLESS = os.getenv("CHROME_HEADLESS", "False").lower() == "true"
 
-driver = None
 
-def update_registration_stage(registration_id, stage, details=None, error=None):
-    session = get_db_session()
-    try:
-        registration = session.query(UdyamRegistration).filter_by(id=registration_id).first()
-        if registration:
-            registration.current_stage = stage
-            if details:
-                registration.stage_details[stage.value] = details
-            if error:
-                registration.error_message = error
-            registration.last_updated = datetime.now(timezone.utc)
-            session.commit()
-    except Exception as e:
-        session.rollback()
-        logging.error(f"Error updating registration stage: {str(e)}")
-    finally:
-        session.close()
+# One browser per registration, so several portal sessions can run side by side
+drivers = {}
+drivers_lock = threading.Lock()
 
-def get_driver():
-    global driver
+def get_driver(registration_id):
+    with drivers_lock:
+        driver = drivers.get(registration_id)
     if driver is None:
         chrome_options = Options()
-        # chrome_options.add_argument("--headless")
+        if CHROME_HEADLESS:
+            chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--remote-debugging-port=9222")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument('--ignore-certificate-errors')
 
         service = Service(ChromeDriverManager().install())
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        with drivers_lock:
+            drivers[registration_id] = driver
     return driver
 
 
@@ -84,965 +81,528 @@ def get_driver():
 """
 
 
-def close_driver():
-    global driver
+def close_driver(registration_id):
+    with drivers_lock:
+        driver = drivers.pop(registration_id, None)
     if driver:
         driver.quit()
-    driver = None
 
 
-def initiate_adhar(adhar, name, registration_id):
-    driver = get_driver()
+def driver_alive(registration_id):
+    """Whether the registration still has a browser that answers"""
+    with drivers_lock:
+        driver = drivers.get(registration_id)
+    if driver is None:
+        return False
     try:
-        driver.get("https://udyamregistration.gov.in/UdyamRegistration.aspx")
-
-        print("DONEDONE")
-
-        WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located(
-                (By.NAME, "ctl00$ContentPlaceHolder1$txtadharno")
-            )
-        )
-
-        driver.find_element(By.NAME, "ctl00$ContentPlaceHolder1$txtadharno").send_keys(
-            adhar
-        )
-        driver.find_element(
-            By.NAME, "ctl00$ContentPlaceHolder1$txtownername"
-        ).send_keys(name)
-
-        driver.find_element(
-            By.NAME, "ctl00$ContentPlaceHolder1$btnValidateAadhaar"
-        ).click()
-
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located(
-                (By.NAME, "ctl00$ContentPlaceHolder1$txtOtp1")
-            )
-        )
-
-        return "OTP page ready"
-    except Exception as e:
-        # close_driver()
-        return f"Error in initiate_adhar: {str(e)}"
+        driver.current_url
+        return True
+    except WebDriverException:
+        return False
 
 
-def submit_otp(otp, registration_id):
-    driver = get_driver()
+def kill_driver(registration_id):
+    """Force-kill a registration's browser process tree; quit() would block behind a hung WebDriver call"""
+    with drivers_lock:
+        driver = drivers.pop(registration_id, None)
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is None:
+        return False
     try:
-        driver.find_element(By.NAME, "ctl00$ContentPlaceHolder1$txtOtp1").send_keys(otp)
-        driver.find_element(By.NAME, "ctl00$ContentPlaceHolder1$btnValidate").click()
+        root = psutil.Process(process.pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.Error:
+        return False
+    for proc in processes:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+    logging.warning(f"Killed browser for registration {registration_id} ({len(processes)} processes)")
+    return True
 
-        WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located(
-                (By.ID, "ctl00_ContentPlaceHolder1_ddlTypeofOrg")
-            )
-        )
 
-        return "OTP submitted successfully"
-    except Exception as e:
-        # close_driver()
-        return f"Error in submit_otp: {str(e)}"
+# Callbacks (op, seconds, ok) told how long every portal round trip took and whether it failed
+portal_step_listeners = []
 
+# Plan operations that wait on the portal rather than only on the local browser
+PORTAL_ROUND_TRIP_OPS = {"wait", "wait_gone", "click", "select", "nic", "postback", "accept_alert", "capture"}
 
-def submit_pan(pan_data, registration_id):
-    driver = get_driver()
-    logging.info(f"Starting PAN submission for registration ID: {registration_id}")
-    
-    try:
-        # Initial stage - PAN Data Filling
-        update_registration_stage(registration_id, RegistrationStage.PAN_DATA_FILLING, pan_data)
-        logging.info("Starting PAN data filling")
-
-        # Wait for the dropdown to be present
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_ddlTypeofOrg"))
-        )
-        logging.info("Organization type dropdown found")
-
-        # Select 'Proprietary' using JavaScript
-        script = """
-        var select = document.getElementById('ctl00_ContentPlaceHolder1_ddlTypeofOrg');
-        for(var i=0; i<select.options.length; i++) {
-            if(select.options[i].text.includes('Proprietary')) {
-                select.selectedIndex = i;
-                select.dispatchEvent(new Event('change'));
-                break;
-            }
-        }
-        """
-        driver.execute_script(script)
-        update_registration_stage(registration_id, RegistrationStage.PAN_SELECT_BOX_DONE, 
-                                {"org_type": "Proprietary"})
-        logging.info("Organization type selected")
-
-        # Wait for form elements to be ready
-        time.sleep(5)
 
+def report_portal_step(op, seconds, ok):
+    for listener in portal_step_listeners:
         try:
-            # PAN Number
-            pan_input = WebDriverWait(driver, 30).until(
-                EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_txtPan"))
-            )
-            pan_input.send_keys(pan_data["pan"])
-            update_registration_stage(registration_id, RegistrationStage.PAN_NUMBER_ADDED, 
-                                    {"pan": pan_data["pan"]})
-            logging.info("PAN number entered")
-
-            # PAN Name
-            pan_name_input = WebDriverWait(driver, 30).until(
-                EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_txtPanName"))
-            )
-            pan_name_input.send_keys(pan_data["pan_name"])
-            update_registration_stage(registration_id, RegistrationStage.PAN_NAME_ADDED, 
-                                    {"pan_name": pan_data["pan_name"]})
-            logging.info("PAN name entered")
-
-            # Date of Birth
-            dob = datetime.strptime(pan_data["dob"], "%Y-%m-%d").strftime("%d/%m/%Y")
-            dob_input = WebDriverWait(driver, 30).until(
-                EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_txtdob"))
-            )
-            dob_input.send_keys(dob)
-            update_registration_stage(registration_id, RegistrationStage.PAN_DATE_ADDED, 
-                                    {"dob": dob})
-            logging.info("Date of birth entered")
-
-            # Wait for preloader to disappear
-            WebDriverWait(driver, 30).until(
-                EC.invisibility_of_element_located((By.ID, "preloader"))
-            )
-
-            # Declaration checkbox
-            try:
-                checkbox = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_chkDecarationP"))
-                )
-                checkbox.click()
-            except ElementClickInterceptedException:
-                driver.execute_script(
-                    "document.getElementById('ctl00_ContentPlaceHolder1_chkDecarationP').click();"
-                )
-            update_registration_stage(registration_id, RegistrationStage.PAN_CHECKBOX_CHECKED)
-            logging.info("Declaration checkbox checked")
-
-            time.sleep(5)
-
-            # PAN Validation
-            try:
-                validate_button = WebDriverWait(driver, 30).until(
-                    EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_btnValidatePan"))
-                )
-                validate_button.click()
-            except ElementClickInterceptedException:
-                driver.execute_script(
-                    "document.getElementById('ctl00_ContentPlaceHolder1_btnValidatePan').click();"
-                )
-            update_registration_stage(registration_id, RegistrationStage.PAN_BUTTON_CLICKED)
-            logging.info("PAN validation button clicked")
-
-            time.sleep(10)
-
-            # Get PAN Data
-            try:
-                get_pan_data_button = WebDriverWait(driver, 30).until(
-                    EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_btnGetPanData"))
-                )
-                get_pan_data_button.click()
-            except ElementClickInterceptedException:
-                driver.execute_script(
-                    "document.getElementById('ctl00_ContentPlaceHolder1_btnGetPanData').click();"
-                )
-            logging.info("Get PAN Data button clicked")
-
-            # GSTIN Selection
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_rblWhetherGstn"))
-            )
-            logging.info("GSTIN radio buttons found")
-
-            gstin_option = pan_data.get("have_gstin", "Exempted")
-            gstin_value = "1" if gstin_option == "Yes" else "3"
-            gstin_id = f"ctl00_ContentPlaceHolder1_rblWhetherGstn_{int(gstin_value) - 1}"
-            
-            try:
-                gstin_radio = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, gstin_id))
-                )
-                gstin_radio.click()
-            except Exception as e:
-                logging.warning(f"Failed to click GSTIN radio button normally: {str(e)}")
-                driver.execute_script(f"document.getElementById('{gstin_id}').click();")
-            
-            update_registration_stage(registration_id, RegistrationStage.GST_BTN_CLICKABLE, 
-                                    {"gstin_option": gstin_option})
-            logging.info(f"GSTIN option selected: {gstin_option}")
-
-            # Wait for mobile input field
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtmobile"))
-            )
-            logging.info("Mobile input field found")
-
-            # Final PAN submission stage
-            update_registration_stage(registration_id, RegistrationStage.PAN_SUBMITTED, 
-                                    {"status": "success"})
-            
-            return "PAN and GSTIN details submitted successfully"
-
-        except TimeoutException as e:
-            error_msg = f"Timeout waiting for element: {str(e)}"
-            logging.error(error_msg)
-            update_registration_stage(registration_id, RegistrationStage.ERROR, 
-                                    error=error_msg)
-            return f"Error in submit_pan: {error_msg}"
-
-    except Exception as e:
-        error_msg = f"Error in PAN submission: {str(e)}"
-        logging.error(error_msg)
-        update_registration_stage(registration_id, RegistrationStage.ERROR, 
-                                error=error_msg)
-        return f"Error in submit_pan: {error_msg}"
-
+            listener(op, seconds, ok)
+        except Exception as e:
+            logging.error(f"Portal step listener failed: {str(e)}")
 
 
-def select_option_by_regex(dropdown_element, user_input):
-    # Create a Select object for the dropdown
-    select = Select(dropdown_element)
+@contextmanager
+def portal_round_trip(op):
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        report_portal_step(op, time.perf_counter() - started, ok)
+
+
+# Sets every field through the native value setter and fires the events ASP.NET validators and
+# jQuery handlers listen for. Fields with inline key handlers are cleared and left for real keystrokes.
+BULK_FILL_SCRIPT = """
+var values = arguments[0], missing = [], keyed = [];
+Object.keys(values).forEach(function(id) {
+    var el = document.getElementById(id);
+    if (!el) { missing.push(id); return; }
+    if (el.disabled) return;
+    if (el.onkeydown || el.onkeypress || el.onkeyup) { el.value = ''; keyed.push(id); return; }
+    var proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, values[id]);
+    ['input', 'change', 'blur'].forEach(function(type) {
+        el.dispatchEvent(new Event(type, {bubbles: true}));
+    });
+});
+return [missing, keyed];
+"""
 
-    # Normalize the user's input to uppercase for matching
-    user_input = user_input.upper()
 
-    # Iterate through the options in the dropdown to find a regex match
-    for option in select.options:
-        option_text = option.text.upper()
+def fill_fields(driver, values, timeout=10):
+    """Fill {element id: value} in one script call; retries only ids not yet on the page and returns those still missing"""
+    pending = {field_id: "" if value is None else str(value) for field_id, value in values.items()}
 
-        # Extract the district name from the option text
-        district_name = option_text.split('.')[-1].strip()
+    def attempt(d):
+        missing, keyed = d.execute_script(BULK_FILL_SCRIPT, pending)
+        for field_id in keyed:
+            d.find_element(By.ID, field_id).send_keys(pending[field_id])
+        for field_id in set(pending) - set(missing):
+            del pending[field_id]
+        return not pending
 
-        # Use regex to match the user's input with the district name
-        if re.search(rf"\b{re.escape(user_input)}\b", district_name):
-            select.select_by_visible_text(option.text)
-            return
+    try:
+        WebDriverWait(driver, bounded(timeout)).until(attempt)
+    except TimeoutException:
+        logging.warning(f"Fields not found on page: {sorted(pending)}")
+    return sorted(pending)
 
-    # If no match is found, try a more lenient search
-    for option in select.options:
-        option_text = option.text.upper()
-        if user_input in option_text:
-            select.select_by_visible_text(option.text)
-            return
 
-    # Raise an error if no match is found
-    raise ValueError(f"Could not locate element with matching text for: {user_input}")
+def fill_required_fields(driver, values, timeout=10):
+    missing = fill_fields(driver, values, timeout)
+    if missing:
+        raise Exception(f"Form fields not found: {', '.join(missing)}")
 
 
-def submit_form(form_data, registration_id):
-    driver = get_driver()
+@deadline_bounded
+def initiate_adhar(adhar, name, registration_id):
+    driver = get_driver(registration_id)
+    session_watchdog.beat(registration_id, "initiate_adhar", "initiate_adhar", 120)
     try:
-        # Wait for the form to load
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtmobile"))
-        )
-        logging.info("Form loaded successfully")
+        with portal_round_trip("initiate_adhar"):
+            driver.get(UDYAM_PORTAL_URL)
+            page = PortalPage(driver, "aadhaar")
 
-        # Fill in form fields
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtmobile").send_keys(form_data.get("mobile", ""))
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtemail"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtemail").send_keys(form_data.get("email", ""))
-        logging.info("Mobile and email filled")
-
-        # Social Category
-        social_category_map = {"General": "0", "SC": "1", "ST": "2", "OBC": "3"}
-        social_category_id = f"ctl00_ContentPlaceHolder1_rdbcategory_{social_category_map.get(form_data.get('social_category', 'General'), '0')}"
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, social_category_id))).click()
-        logging.info("Social category selected")
-
-        # Gender
-        gender_map = {"M": "0", "F": "1", "O": "2"}
-        gender_id = f"ctl00_ContentPlaceHolder1_rbtGender_{gender_map.get(form_data.get('gender', 'M'), '0')}"
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, gender_id))).click()
-        logging.info("Gender selected")
-
-        # Specially Abled
-        specially_abled_map = {"Y": "0", "N": "1"}
-        specially_abled_id = f"ctl00_ContentPlaceHolder1_rbtPh_{specially_abled_map.get(form_data.get('specially_abled', 'N'), '1')}"
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, specially_abled_id))).click()
-        logging.info("Specially abled option selected")
-
-        # Fill in the form fields
-        enterprise_name = form_data.get("enterprise_name") or form_data.get("pan_name", "")
-        unit_name = form_data.get("unit_name") or form_data.get("pan_name", "")
-
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtenterprisename"))
-        )
+            fill_required_fields(driver, page.ids({"aadhaar": adhar, "owner_name": name}), timeout=60)
+            page.click("validate_aadhaar")
+            page.element("otp", timeout=30)
 
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtenterprisename").send_keys(enterprise_name)
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtUnitName"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtUnitName").send_keys(unit_name)
-        logging.info("Enterprise and unit name filled")
+        return "OTP page ready"
+    except Exception as e:
+        # close_driver()
+        return f"Error in initiate_adhar: {str(e)}"
+    finally:
+        session_watchdog.clear(registration_id)
 
-        # Click the "Add Unit" button
-        add_unit_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_btnAddUnit"))
-        )
-        add_unit_button.click()
-        logging.info("Add Unit button clicked")
 
-        # Wait for 2 seconds
-        time.sleep(2)
+@deadline_bounded
+def submit_otp(otp, registration_id):
+    driver = get_driver(registration_id)
+    session_watchdog.beat(registration_id, "submit_otp", "submit_otp", 100)
+    try:
+        page = PortalPage(driver, "aadhaar")
+        fill_required_fields(driver, page.ids({"otp": otp}))
+        with portal_round_trip("submit_otp"):
+            page.click("validate_otp")
+            PortalPage(driver, "pan").element("org_type", timeout=60)
 
-        # Create a Select object and choose the first option
-        dropdown_element = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_ddlUnitName"))
-        )
-        select = Select(dropdown_element)
-        select.select_by_index(1)
-        logging.info("Unit selected from dropdown")
-
-        # Fill address details
-        address_fields = [
-            ("ctl00_ContentPlaceHolder1_txtPFlat", "premises_number"),
-            ("ctl00_ContentPlaceHolder1_txtPBuilding", "building_name"),
-            ("ctl00_ContentPlaceHolder1_txtPVillageTown", "village_town"),
-            ("ctl00_ContentPlaceHolder1_txtPBlock", "block"),
-            ("ctl00_ContentPlaceHolder1_txtPRoadStreetLane", "road_street_lane"),
-            ("ctl00_ContentPlaceHolder1_txtPCity", "city"),
-            ("ctl00_ContentPlaceHolder1_txtPpin", "pincode")
-        ]
-
-        for field_id, data_key in address_fields:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, field_id))
-            ).send_keys(form_data.get(data_key, ""))
-        logging.info("Address details filled")
-
-        # Select state
-        state_dropdown = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_ddlPState"))
-        )
-        select_option_by_regex(state_dropdown, form_data.get("state", ""))
-        logging.info("State selected")
+        return "OTP submitted successfully"
+    except Exception as e:
+        # close_driver()
+        return f"Error in submit_otp: {str(e)}"
+    finally:
+        session_watchdog.clear(registration_id)
+
+
+# Both scripts touch every option in a single WebDriver round-trip
+OPTION_SNAPSHOT_SCRIPT = "return Array.from(arguments[0].options, function(o) { return [o.value, o.text]; });"
+SELECT_VALUE_SCRIPT = """
+var select = arguments[0];
+for (var i = 0; i < select.options.length; i++) {
+    if (select.options[i].value === arguments[1]) {
+        select.selectedIndex = i;
+        select.dispatchEvent(new Event('change', {bubbles: true}));
+        return select.value;
+    }
+}
+return null;
+"""
 
-        # Wait for the district dropdown to load options
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "#ctl00_ContentPlaceHolder1_ddlPDistrict option:not([value='0'])"))
-        )
 
-        # Select district
-        district_dropdown = driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_ddlPDistrict")
-        select_option_by_regex(district_dropdown, form_data.get("district", ""))
-        logging.info("District selected")
+def normalize_option_text(text):
+    return re.sub(r"\s+", " ", text or "").strip().upper()
 
-        # Click the "Add Plant" button
-        add_plant_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_BtnPAdd"))
-        )
-        add_plant_button.click()
 
-        # Wait for 4 seconds
-        time.sleep(4)
+@lru_cache(maxsize=256)
+def build_option_index(options):
+    # options is a tuple of (value, text); district style options look like "12. NAME"
+    index = []
+    for value, text in options:
+        normalized = normalize_option_text(text)
+        index.append((value, text, normalized, normalized.split('.')[-1].strip()))
+    return tuple(index)
 
-        # Official address of the enterprise (same as plant address)
 
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffFlatNo"))
-        )
+def match_option(options, user_input):
+    """Return the option value best matching user_input, or None"""
+    index = build_option_index(tuple(tuple(option) for option in options))
+    needle = normalize_option_text(user_input)
 
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffFlatNo").send_keys(form_data["premises_number"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffBuilding"))
-        )
+    # Whole-word match on the option name
+    pattern = re.compile(rf"\b{re.escape(needle)}\b")
+    for value, _, _, name in index:
+        if pattern.search(name):
+            return value
 
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffBuilding").send_keys(form_data["building_name"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffVillageTown"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffVillageTown").send_keys(form_data["village_town"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffBlock"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffBlock").send_keys(form_data["block"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffRoadStreetLane"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffRoadStreetLane").send_keys(
-            form_data["road_street_lane"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffCity"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffCity").send_keys(form_data["city"])
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtOffPin"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOffPin").send_keys(form_data["pincode"])
+    # Lenient substring match on the full option text
+    for value, _, normalized, _ in index:
+        if needle in normalized:
+            return value
 
-        # Select state (same as plant address)
+    # Fuzzy match to absorb small spelling differences
+    names = [name for _, _, _, name in index]
+    close = difflib.get_close_matches(needle, names, n=1, cutoff=0.8)
+    if close:
+        return index[names.index(close[0])][0]
+    return None
 
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_ddlstate"))
-        )
-        state_dropdown = driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_ddlstate")
-        select_option_by_regex(state_dropdown, form_data["state"])
 
-        # Wait for the district dropdown to load options
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located(
-                (By.CSS_SELECTOR, "#ctl00_ContentPlaceHolder1_ddlDistrict option:not([value='0'])"))
-        )
+def select_option_by_value(dropdown_element, value):
+    return dropdown_element.parent.execute_script(SELECT_VALUE_SCRIPT, dropdown_element, value)
 
-        # Select district (same as plant address)
-        district_dropdown = driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_ddlDistrict")
-        select_option_by_regex(district_dropdown, form_data["district"])
 
-        # Click the "Get Latitude & Longitude" button
-        get_lat_long_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "ctl00_ContentPlaceHolder1_Button1"))
-        )
-        get_lat_long_button.click()
-
-        # Store the current window handle (parent window)
-        parent_window = driver.current_window_handle
-
-        # Wait for the new window to open and switch to it
-        WebDriverWait(driver, 10).until(EC.number_of_windows_to_be(2))
-        all_windows = driver.window_handles
-        new_window = [window for window in all_windows if window != parent_window][0]
-        driver.switch_to.window(new_window)
-
-        # Wait for the map to load
-        wait = WebDriverWait(driver, 40)
-
-        # Wait for the map div to be present
-        map_div = wait.until(EC.presence_of_element_located((By.ID, 'mapDiv')))
-        print("Map div found")
-
-        # Wait for SVG to load
-        svg = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'svg')))
-        print("SVG element found")
-
-        # Implement a retry mechanism for finding path elements
-        max_retries = 5
-        for attempt in range(max_retries):
-            paths = driver.find_elements(By.CSS_SELECTOR, 'path')
-            if paths:
-                print(f"Found {len(paths)} path elements")
-                district_path = paths[0]
-                actions = ActionChains(driver)
-
-                # Scroll the element into view
-                driver.execute_script("arguments[0].scrollIntoView();", district_path)
-
-                # Click the path
-                actions.move_to_element(district_path).click().perform()
-                print("Clicked on a path element")
-                time.sleep(2)  # Wait for 2 seconds after clicking
-                break
-            else:
-                print(f"No path elements found. Attempt {attempt + 1} of {max_retries}")
-                time.sleep(2)  # Wait for 2 seconds before retrying
-        else:
-            print("Failed to find path elements after all attempts")
+def select_option_by_regex(dropdown_element, user_input):
+    driver = dropdown_element.parent
+    options = driver.execute_script(OPTION_SNAPSHOT_SCRIPT, dropdown_element)
+
+    value = match_option(options, user_input)
+    if value is None:
+        # Raise an error if no match is found
+        raise ValueError(f"Could not locate element with matching text for: {user_input.upper()}")
+
+    select_option_by_value(dropdown_element, value)
+    return value
+
+
+def select_known_option(dropdown_element, text, value=None):
+    # Use the option value resolved at ingest when there is one; otherwise match on text
+    if value and select_option_by_value(dropdown_element, value) == value:
+        return value
+    return select_option_by_regex(dropdown_element, text)
+
+
+FILL_COORDINATES_SCRIPT = """
+var latitude = document.getElementById(arguments[0]);
+var longitude = document.getElementById(arguments[1]);
+if (!latitude || !longitude) return false;
+latitude.value = arguments[2];
+longitude.value = arguments[3];
+[latitude, longitude].forEach(function(field) {
+    field.dispatchEvent(new Event('change', {bubbles: true}));
+});
+return true;
+"""
 
-        # Wait for latitude and longitude fields to be visible
-        latitude = wait.until(EC.visibility_of_element_located((By.ID, 'ctl00_ContentPlaceHolder1_txtlatitude1')))
-        longitude = wait.until(EC.visibility_of_element_located((By.ID, 'ctl00_ContentPlaceHolder1_txtlongitude1')))
 
-        latitude_value = latitude.get_attribute('value')
-        longitude_value = longitude.get_attribute('value')
+def capture_coordinates_from_map(driver, coordinates=None):
+    # Click the "Get Latitude & Longitude" button
+    PortalPage(driver, "form").click("get_coordinates", timeout=10)
 
-        print(f'Latitude: {latitude_value}')
-        print(f'Longitude: {longitude_value}')
+    # Store the current window handle (parent window)
+    parent_window = driver.current_window_handle
 
-        # Click the OK button
-        ok_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button.btn.btn-primary[onclick="f2();"]')))
-        ok_button.click()
-        print("Clicked the OK button")
-        time.sleep(2)
+    # Wait for the new window to open and switch to it
+    WebDriverWait(driver, bounded(10)).until(EC.number_of_windows_to_be(2))
+    all_windows = driver.window_handles
+    new_window = [window for window in all_windows if window != parent_window][0]
+    driver.switch_to.window(new_window)
+    page = PortalPage(driver, "map")
 
-        # Switch back to the original window
+    if coordinates:
+        # The index knows this location: fill the popup's fields and confirm without the map
+        page.element("latitude", timeout=40)
+        driver.execute_script(FILL_COORDINATES_SCRIPT, page.id("latitude"), page.id("longitude"), *coordinates)
+        driver.execute_script("f2();")
+        logging.info(f"Coordinates set in map popup from local pincode index: {coordinates}")
+        try:
+            WebDriverWait(driver, bounded(5)).until(EC.number_of_windows_to_be(1))
+        except TimeoutException:
+            pass
         driver.switch_to.window(parent_window)
+        return
+
+    # Wait for the map and its SVG to load
+    page.resolve("map", "svg", timeout=40)
+    logging.info("Map div and SVG element found")
+
+    # Implement a retry mechanism for finding path elements
+    max_retries = 5
+    for attempt in range(max_retries):
+        paths = driver.find_elements(*page.locator("paths"))
+        if paths:
+            logging.info(f"Found {len(paths)} path elements")
+            district_path = paths[0]
+            actions = ActionChains(driver)
+
+            # Scroll the element into view
+            driver.execute_script("arguments[0].scrollIntoView();", district_path)
+
+            # Click the path
+            actions.move_to_element(district_path).click().perform()
+            logging.info("Clicked on a path element")
+            time.sleep(bounded(2))  # Wait for 2 seconds after clicking
+            break
+        else:
+            logging.warning(f"No path elements found. Attempt {attempt + 1} of {max_retries}")
+            time.sleep(bounded(2))  # Wait for 2 seconds before retrying
+    else:
+        logging.error("Failed to find path elements after all attempts")
+
+    # Wait for latitude and longitude fields to be visible
+    page.wait_until(EC.visibility_of_element_located, "latitude", timeout=40)
+    page.wait_until(EC.visibility_of_element_located, "longitude", timeout=40)
+
+    logging.info(f'Coordinates from portal map: {page.attribute("latitude", "value")}, '
+                 f'{page.attribute("longitude", "value")}')
+
+    # Click the OK button
+    page.click("ok", timeout=40)
+    logging.info("Clicked the OK button")
+    time.sleep(bounded(2))
+
+    # Switch back to the original window
+    driver.switch_to.window(parent_window)
+
+
+NIC_OPTION_READY_SCRIPT = """
+var select = document.getElementsByName(arguments[0])[0];
+if (!select) return false;
+for (var i = 0; i < select.options.length; i++) {
+    var option = select.options[i];
+    if (option.value === arguments[1] || option.text.trim().indexOf(arguments[2]) === 0) return true;
+}
+return false;
+"""
+POSTBACK_IDLE_SCRIPT = """
+if (document.readyState !== 'complete') return false;
+var prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager;
+return !(prm && prm.getInstance().get_isInAsyncPostBack());
+"""
 
-        # Date of incorporation (convert to DD/MM/YYYY format)
-        incorporation_date = datetime.strptime(form_data["date_of_incorporation"], "%Y-%m-%d").strftime("%d/%m/%Y")
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtdateIncorporation"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtdateIncorporation").send_keys(incorporation_date)
-
-        # Date of Commencement (use incorporation date if not provided)
-        commencement_date = form_data.get("date_of_commencement", form_data["date_of_incorporation"])
-        commencement_date = datetime.strptime(commencement_date, "%Y-%m-%d").strftime("%d/%m/%Y")
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtcommencedate"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtcommencedate").send_keys(commencement_date)
-
-        # Bank Details
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtBankName"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtBankName").send_keys(form_data["bank_name"])
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtaccountno"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtaccountno").send_keys(form_data["account_number"])
 
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtifsccode"))
-        )
-        driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtifsccode").send_keys(form_data["ifsc_code"])
-
-        major_activity = form_data.get("major_activity", "Manufacturing")
-        if major_activity == "Manufacturing":
-            activity_id = "ctl00_ContentPlaceHolder1_rdbCatgg_0"
-        else:  # Services
-            activity_id = "ctl00_ContentPlaceHolder1_rdbCatgg_1"
-
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, activity_id))
-        ).click()
-        logging.info(f"Selected Major Activity: {major_activity}")
-
-        # If Services is selected, handle the sub-category
-        if major_activity == "Services":
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_divsubcatg"))
-            )
-
-            sub_activity = form_data.get("sub_activity", "Non-Trading")
-            if sub_activity == "Non-Trading":
-                sub_activity_id = "ctl00_ContentPlaceHolder1_rdbSubCategg_0"
-            else:  # Trading
-                sub_activity_id = "ctl00_ContentPlaceHolder1_rdbSubCategg_1"
-
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, sub_activity_id))
-            ).click()
-            logging.info(f"Selected Sub-Activity: {sub_activity}")
-
-        time.sleep(7)
-
-        return "Form submitted successfully"
-    except Exception as e:
-        return f"Error submitting form: {str(e)}"
+def wait_for_postback(driver, timeout=30):
+    WebDriverWait(driver, bounded(timeout)).until(lambda d: d.execute_script(POSTBACK_IDLE_SCRIPT))
 
 
+def nic_select_name(level):
+    return locator("additional", "nic_level", level)[1]
 
-def automate_form_next(registration_id, major_activity, second_form_section, nic_codes, employee_counts, investment_data, turnover_data,
-                       district):
-    driver = get_driver()  # Get the WebDriver instance
-    if not driver:
-        return {"status": "error", "message": "Failed to initialize WebDriver"}
 
-    def safe_find_element(by, value, timeout=15):
-        try:
-            return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
-        except TimeoutException:
-            logging.warning(f"Element not found: {value}")
-            return None
+def nic_option_ready(driver, level, code):
+    value = get_nic_catalogue().option_value(code)
+    return driver.execute_script(NIC_OPTION_READY_SCRIPT, nic_select_name(level), value, code)
 
-    def safe_click(element):
-        try:
-            driver.execute_script("arguments[0].scrollIntoView(true);", element)
-            WebDriverWait(driver, 10).until(EC.element_to_be_clickable(element))
-            element.click()
-        except ElementClickInterceptedException:
-            driver.execute_script("arguments[0].click();", element)
-        except Exception as e:
-            logging.error(f"Error clicking element: {e}")
 
-    def select_option_by_text(select_element, text):
-        try:
-            select = Select(select_element)
-            select.select_by_visible_text(text)
-            return True
-        except Exception as e:
-            logging.error(f"Error selecting option {text}: {e}")
-            return False
+def select_nic_level(driver, level, code, dependent_level=None, dependent_code=None, timeout=30):
+    WebDriverWait(driver, bounded(timeout)).until(lambda d: nic_option_ready(d, level, code))
+    dropdown = driver.find_element(*locator("additional", "nic_level", level))
 
-    def get_options_count(select_element):
-        try:
-            select = Select(select_element)
-            options = select.options
-            return len(options)
-        except Exception as e:
-            logging.error(f"Error getting options count: {e}")
-            return 0
-
-    def reselect_previous_dropdown(previous_dropdown_element, previous_text, new_dropdown_element, new_text):
-        # Reselect previous dropdown option
-        if select_option_by_text(previous_dropdown_element, previous_text):
-            logging.info(f"Reselected previous dropdown option: {previous_text}")
-            # Select the current dropdown option again
-            if select_option_by_text(new_dropdown_element, new_text):
-                logging.info(f"Selected option from current dropdown: {new_text}")
-                return True
-        return False
+    value = get_nic_catalogue().option_value(code)
+    if select_option_by_value(dropdown, value) != value:
+        # The portal labels this option differently from the catalogue; match on the code text
+        select_option_by_regex(dropdown, code)
+    logging.info(f"Selected {level}-digit NIC code: {code}")
 
-    try:
-        # Major Activity of Unit
-        activity_map = {"Mfg": "1", "Service": "2", "Trading": "2"}
-        major_activity_id = f'ctl00_ContentPlaceHolder1_rdbCatgg_{activity_map.get(major_activity, "1")}'
-        radio_button_script = f"document.getElementById('{major_activity_id}').click();"
-
-        # Major Activity Under Services (if applicable)
-        if major_activity == "2":  # Services
-            second_form_section_id = f'ctl00_ContentPlaceHolder1_rdbSubCategg_{int(second_form_section) - 1}'
-            safe_click(safe_find_element(By.ID, second_form_section_id))
-            logging.info(f"Selected second form section: {second_form_section}")
-
-        # NIC Code Selection
-        category_radios = {
-            "Manufacturing": "//table[@id='ctl00_ContentPlaceHolder1_rdbCatggMultiple']//label[contains(text(),'Manufacturing')]",
-            "Services": "//table[@id='ctl00_ContentPlaceHolder1_rdbCatggMultiple']//label[contains(text(),'Services')]",
-            "Trading": "//table[@id='ctl00_ContentPlaceHolder1_rdbCatggMultiple']//label[contains(text(),'Trading')]"
-        }
-
-        category_element = safe_find_element(By.XPATH, category_radios[nic_codes[0]['category']])
-        if category_element:
-            safe_click(category_element)
-            logging.info(f"Selected category: {nic_codes[0]['category']}")
+    if dependent_level:
+        WebDriverWait(driver, bounded(timeout)).until(
+            lambda d: d.execute_script(POSTBACK_IDLE_SCRIPT) and nic_option_ready(d, dependent_level, dependent_code)
+        )
+    else:
+        wait_for_postback(driver, timeout)
+
+
+PLAN_STEP_SECONDS = metrics_registry.histogram(
+    "udyam_plan_step_seconds", "Time spent executing each step plan operation", ["op"],
+    buckets=(0.05, 0.25, 1, 2.5, 5, 10, 30, 60))
+
+
+def run_plan_step(driver, pages, step, outputs):
+    """Perform one compiled portal action (see step_plan.py for the operations)"""
+    op = step["op"]
+    name = step.get("name")
+    args = step.get("args", ())
+    timeout = step.get("timeout", 15)
+    page = None
+    if "page" in step:
+        page = pages.setdefault(step["page"], PortalPage(driver, step["page"]))
+
+    if op == "wait":
+        page.element(name, *args, timeout=timeout)
+    elif op == "wait_gone":
+        page.wait_until(EC.invisibility_of_element_located, name, *args, timeout=timeout)
+    elif op == "fill":
+        if step.get("optional"):
+            fill_fields(driver, page.ids(step["values"]), timeout)
         else:
-            logging.warning(f"Category element not found for: {nic_codes[0]['category']}")
-
-        time.sleep(3)  # Wait for the page to load
-
-        print("NIC CODES >>>> ", nic_codes)
-        for nic_code in nic_codes:
-            print("NIC CODE >>>>>>>> ", nic_code)
-
-            two_digit = safe_find_element(By.XPATH, "//select[@name='ctl00$ContentPlaceHolder1$ddl2NicCode']")
-            select_option_by_regex(two_digit, nic_code['2_digit'])
-            print("TWO DIGIT >>>>> ", two_digit)
-
-            print("WAITING")
-
-            if two_digit:
-                logging.info(f"Selected 2-digit NIC code: {nic_code['2_digit']}")
-
-                print("DONE 2")
-
-                time.sleep(5)
-
-                four_digit = safe_find_element(By.XPATH, "//select[@name='ctl00$ContentPlaceHolder1$ddl4NicCode']")
-                print("four digit")
-                if four_digit:
-                    print("if passed four digit")
-                    print("option count>>>>> ", get_options_count(four_digit))
-
-                    if get_options_count(four_digit) > 1:
-                        # Continue if there are more than one option
-                        select_option_by_regex(four_digit, nic_code['4_digit'])
-                        logging.info(f"Selected 4-digit NIC code: {nic_code['4_digit']}")
-                        print("second selected")
-                        time.sleep(6)
-                    else:
-                        print("---------------------else second")
-                        # Reselect the previous 2-digit option and try again
-                        logging.info(
-                            "Only one option in 4-digit dropdown, reselecting 2-digit option and trying again.")
-                        reselect_previous_dropdown(two_digit, nic_code['2_digit'], four_digit, nic_code['4_digit'])
-
-                    # Now select the 5-digit NIC code
-                    print("second done")
-                    five_digit = safe_find_element(By.XPATH, "//select[@name='ctl00$ContentPlaceHolder1$ddl5NicCode']")
-                    print("FIVE DIGIT >>", five_digit)
-                    if five_digit:
-                        print("If passed five <<<<<<<<<<<")
-                        print("option count five ::::::::: ", get_options_count(five_digit))
-                        if get_options_count(five_digit) > 1:
-                            print("DONE   MSKDM")
-                            # Continue if there are more than one option
-                            select_option_by_regex(five_digit, nic_code['5_digit'])
-                            print("selected")
-                            print("DONE LAST")
-                            logging.info(f"Selected 5-digit NIC code: {nic_code['5_digit']}")
-                        else:
-                            print("Else ------------------------- five")
-                            # Reselect the previous 4-digit option and try again
-                            logging.info(
-                                "Only one option in 5-digit dropdown, reselecting 4-digit option and trying again.")
-                            reselect_previous_dropdown(four_digit, nic_code['4_digit'], five_digit, nic_code['5_digit'])
-
-            time.sleep(10)
-            print("DONE")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//input[@name='ctl00$ContentPlaceHolder1$btnAddMore'][@value='Add Activity']"))
-            )
-            add_activity = safe_find_element(By.XPATH,
-                                             "//input[@name='ctl00$ContentPlaceHolder1$btnAddMore'][@value='Add Activity']")
-            if add_activity:
-                safe_click(add_activity)
-                logging.info("Added activity")
-            else:
-                logging.warning("Add Activity button not found")
-
-            time.sleep(5)  # Wait for the page to load
-
-        # Number of persons employed
-        try:
-            print("Waiting for male employee input field")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonMale"))
-            )
-            print("Found male employee input field")
-            driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonMale").send_keys(
-                str(employee_counts.get("male", 0)))
-            print("Entered male employee count:", employee_counts.get("male", 0))
-        except:
-            pass
-
-        try:
-            print("Waiting for female employee input field")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonFemale"))
-            )
-            print("Found female employee input field")
-            driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonFemale").send_keys(
-                str(employee_counts.get("female", 0)))
-            print("Entered female employee count:", employee_counts.get("female", 0))
-
-        except:
-            pass
-
-
-        try:
-            print("Waiting for others employee input field")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonOthers"))
-            )
-            print("Found others employee input field")
-            driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtNoofpersonOthers").send_keys(
-                str(employee_counts.get("others", 0)))
-            print("Entered others employee count:", employee_counts.get("others", 0))
-        except:
-            pass
-        
-
-        try:
-            # Investment in Plant and Machinery or Equipment
-            print("Checking Written Down Value (WDV) input field")
-            wdv_field = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtDepCost"))
-            )
-            print("Found Written Down Value (WDV) input field")
-        except:
-            pass
-
-        if wdv_field.is_enabled():
-            print("WDV field is enabled")
-            wdv_field.clear()
-            wdv_field.send_keys(str(investment_data.get("wdv", 5000000)))
-            print("Entered Written Down Value (WDV):", investment_data.get("wdv", 5000000))
+            fill_required_fields(driver, page.ids(step["values"]), timeout)
+    elif op == "click":
+        if step.get("script"):
+            page.script_click(name, *args, timeout=timeout)
         else:
-            print("WDV field is disabled. Skipping input.")
-            logging.info("WDV field is disabled. Value not entered.")
-        
-        try:
-            print("Waiting for exclusion cost input field")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtExCost"))
-            )
-            print("Found exclusion cost input field")
-            driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtExCost").send_keys(
-                str(investment_data.get("exclusion_cost", 200000)))
-            print("Entered exclusion cost:", investment_data.get("exclusion_cost", 200000))
-        except:
-            pass
-
-
-        try:
-            # Turnover
-            print("Waiting for total turnover input field")
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_txtTotalTurnoverA"))
-            )
-            print("Found total turnover input field")
-            driver.find_element(By.ID, "ctl00_ContentPlaceHolder1_txtTotalTurnoverA").send_keys(
-                str(turnover_data.get("total_turnover", 0)))
-            print("Entered total turnover:", turnover_data.get("total_turnover", 0))
-
-        except Exception as e:
-            pass
-
-        # Additional registrations (all set to "No")
-        no_buttons = [
-            '#ctl00_ContentPlaceHolder1_rblGeM_1',
-            '#ctl00_ContentPlaceHolder1_rblTReDS_1',
-            '#ctl00_ContentPlaceHolder1_rblNCS_1',
-            '#ctl00_ContentPlaceHolder1_rblnsic_1',
-            '#ctl00_ContentPlaceHolder1_rblnixi_1',
-            '#ctl00_ContentPlaceHolder1_rblsid_1'
-        ]
-
-        print("Clicking 'No' buttons for additional registrations")
-        for button_id in no_buttons:
-            print(f"Clicking 'No' button for {button_id}")
+            page.click(name, *args, timeout=timeout)
+    elif op == "select":
+        page.act(name, lambda dropdown: select_known_option(dropdown, step["text"], step.get("value")),
+                 *args, timeout=timeout)
+    elif op == "select_index":
+        page.act(name, lambda dropdown: Select(dropdown).select_by_index(step["index"]), *args, timeout=timeout)
+    elif op == "nic":
+        select_nic_level(driver, step["level"], step["code"], step.get("dependent_level"),
+                         step.get("dependent_code"), step.get("timeout", 30))
+    elif op == "postback":
+        wait_for_postback(driver, step.get("timeout", 30))
+    elif op == "coordinates":
+        # Coordinates from the local pincode index skip the map popup entirely
+        form = pages.setdefault("form", PortalPage(driver, "form"))
+        coordinates = step.get("coordinates")
+        if coordinates and driver.execute_script(FILL_COORDINATES_SCRIPT, form.id("latitude"),
+                                                 form.id("longitude"), *coordinates):
+            logging.info(f"Coordinates filled from local pincode index: {coordinates}")
+        else:
+            capture_coordinates_from_map(driver, coordinates)
+    elif op == "accept_alert":
+        WebDriverWait(driver, bounded(timeout)).until(EC.alert_is_present())
+        Alert(driver).accept()
+    elif op == "sleep":
+        time.sleep(bounded(step["seconds"]))
+    elif op == "capture":
+        outputs[step["output"]] = page.attribute(name, step["attribute"], *args, timeout=timeout)
+    else:
+        raise ValueError(f"Unknown plan operation: {op}")
+
+
+def step_budget(step):
+    """Seconds a plan step may legitimately take, before the watchdog's grace period"""
+    if step["op"] == "sleep":
+        return step["seconds"]
+    return step.get("timeout", 30)
+
+
+@deadline_bounded
+def execute_plan(steps, registration_id, start=0, on_checkpoint=None, on_step=None):
+    """Run steps[start:] in the browser and return the values the plan captured (e.g. captcha_url).
+    Stage steps go to on_checkpoint(resume_index, stage, details), and steps marked once to
+    on_checkpoint(resume_index, None, None) so a resume never repeats them; on_step(index, step, seconds) sees every step.
+    Every wait is cut to the deadline_at budget; DeadlineExceeded is raised once it is spent."""
+    driver = get_driver(registration_id)
+    pages = {}
+    outputs = {}
+    try:
+        for index in range(start, len(steps)):
+            step = steps[index]
+            # Fails fast once the registration's budget is spent, before the step touches the portal
+            budget = bounded(step_budget(step), f"step {index} ({step_label(step)})")
+            session_watchdog.beat(registration_id, step["op"], step_label(step), budget)
+            started = time.perf_counter()
             try:
-                no_button = driver.find_element(By.CSS_SELECTOR, button_id)
-                driver.execute_script("arguments[0].click();", no_button)
-                logging.info(f"Clicked 'No' button: {button_id}")
-                print(f"Clicked 'No' button: {button_id}")
+                if step["op"] == "stage":
+                    if on_checkpoint:
+                        on_checkpoint(index + 1, RegistrationStage(step["stage"]), step.get("details"))
+                else:
+                    run_plan_step(driver, pages, step, outputs)
             except Exception as e:
-                logging.error(f'Error selecting "No" button with ID {button_id}: {str(e)}')
-                print(f'Error selecting "No" button with ID {button_id}: {str(e)}')
-
-        # District Industries Centre
-        print("Selecting district from dropdown")
-        district_dropdown = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_ddlDIC")
-        if district_dropdown:
-            if select_option_by_text(district_dropdown, district):
-                logging.info(f"Selected district: {district}")
-                print(f"Selected district: {district}")
-            else:
-                logging.warning(f"Failed to select district: {district}")
-                print(f"Failed to select district: {district}")
-        else:
-            logging.warning("District dropdown not found")
-            print("District dropdown not found")
-
-        # Final submission
-        print("Looking for submit button")
-        submit_button = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_btnsubmit")
-        if submit_button:
-            safe_click(submit_button)
-            logging.info("Clicked initial submit button")
-            print("Clicked initial submit button")
-        else:
-            logging.error("Initial submit button not found")
-            print("Initial submit button not found")
-            return {"status": "error", "message": "Initial submit button not found"}
-
-        try:
-            # Wait for the alert to be present
-            WebDriverWait(driver, 20).until(EC.alert_is_present())
-
-            # Switch to the alert
-            alert = Alert(driver)
-
-            # Print alert text (for debugging purposes)
-            print(f"Alert says: {alert.text}")
-
-            # Accept the alert to click OK
-            alert.accept()
-            print("Alert accepted successfully.")
-
-        except Exception as e:
-            print(f"Error handling alert: {e}")
-
-        # Wait for 5 seconds
-        print("Waiting for 5 seconds before CAPTCHA")
-        time.sleep(50)
-
-        # Wait for the CAPTCHA image to load
-        print("Waiting for CAPTCHA image to load")
-        captcha_element = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_imgCaptcha", timeout=30)
-        if not captcha_element:
-            logging.error("CAPTCHA image not found")
-            return {"status": "error", "message": "CAPTCHA image not found"}
-
-        # Get the CAPTCHA image URL
-        captcha_url = captcha_element.get_attribute("src")
-        print("CAPTCHA image URL:", captcha_url)
-
-        return {"status": "success", "message": "OTP and CAPTCHA required", "captcha_url": captcha_url}
-
-    except Exception as e:
-        logging.error(f"Unexpected error in form submission: {str(e)}")
-        return {"status": "error", "message": str(e)}
+                if deadline_passed():
+                    raise DeadlineExceeded(f"Registration deadline passed during step {index} "
+                                           f"({step_label(step)})") from e
+                if not step.get("optional"):
+                    if step["op"] in PORTAL_ROUND_TRIP_OPS:
+                        report_portal_step(step["op"], time.perf_counter() - started, False)
+                    raise PlanStepError(index, step, e) from e
+                logging.warning(f"Skipped optional step {index} ({step_label(step)}) "
+                                f"for registration {registration_id}: {e}")
+            seconds = time.perf_counter() - started
+            PLAN_STEP_SECONDS.observe(seconds, op=step["op"])
+            if step["op"] in PORTAL_ROUND_TRIP_OPS:
+                report_portal_step(step["op"], seconds, True)
+            if step.get("once") and on_checkpoint:
+                on_checkpoint(index + 1, None, None)
+            if on_step:
+                on_step(index, step, seconds)
     finally:
-        pass
-
-
-def safe_find_element(by, value, timeout=15):
-    try:
-        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, value)))
-    except TimeoutException:
-        logging.warning(f"Element not found: {value}")
-        return None
-
-
-def safe_click(element):
-    try:
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable(element))
-        element.click()
-    except ElementClickInterceptedException:
-        driver.execute_script("arguments[0].click();", element)
-    except Exception as e:
-        logging.error(f"Error clicking element: {e}")
+        session_watchdog.clear(registration_id)
+    return outputs
 
 
+@deadline_bounded
 def submit_otp_and_captcha(otp, captcha_code, registration_id):
-    driver = get_driver()
+    driver = get_driver(registration_id)
+    session_watchdog.beat(registration_id, "final_submit", "submit_otp_and_captcha", 90)
     try:
-        # Enter OTP
-        otp_input = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_txtOtp")
-        if otp_input:
-            otp_input.clear()
-            otp_input.send_keys(otp)
-            logging.info("Entered OTP")
-        else:
+        page = PortalPage(driver, "final")
+
+        # Enter OTP and CAPTCHA
+        missing = fill_fields(driver, page.ids({"otp": otp, "captcha": captcha_code}), timeout=15)
+        if page.id("otp") in missing:
             logging.error("OTP input field not found")
             return {"status": "error", "message": "OTP input field not found"}
-
-        # Enter CAPTCHA
-        captcha_input = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_txtCaptcha")
-        if captcha_input:
-            captcha_input.clear()
-            captcha_input.send_keys(captcha_code)
-            logging.info("Entered CAPTCHA code")
-        else:
+        if page.id("captcha") in missing:
             logging.error("CAPTCHA input field not found")
             return {"status": "error", "message": "CAPTCHA input field not found"}
+        logging.info("Entered OTP and CAPTCHA code")
 
         # Click the final submit button
-        final_submit_button = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_btn_finalsubmit")
-        if final_submit_button:
-            safe_click(final_submit_button)
-            logging.info("Clicked final submit button")
-        else:
+        if not page.find("final_submit"):
             logging.error("Final submit button not found")
             return {"status": "error", "message": "Final submit button not found"}
+        started = time.perf_counter()
+        page.click("final_submit")
+        logging.info("Clicked final submit button")
 
         # Wait for the submission to complete
-        success_message_element = safe_find_element(By.ID, "ctl00_ContentPlaceHolder1_lblMssgg", timeout=30)
-        if success_message_element:
-            success_message = success_message_element.text
-            if "successfully" in success_message.lower():
-                logging.info("Form submitted successfully!")
-                return {"status": "success", "message": success_message}
-            else:
-                logging.warning(f"Form submission may have failed. Message: {success_message}")
-                return {"status": "warning", "message": success_message}
-        else:
+        message = page.find("message", timeout=30)
+        report_portal_step("final_submit", time.perf_counter() - started, message is not None)
+        if not message:
             logging.error("Success message element not found")
             return {"status": "error", "message": "Success message element not found"}
 
+        success_message = page.text("message")
+        if "successfully" in success_message.lower():
+            logging.info("Form submitted successfully!")
+            return {"status": "success", "message": success_message}
+        logging.warning(f"Form submission may have failed. Message: {success_message}")
+        return {"status": "warning", "message": success_message}
+
     except Exception as e:
         logging.error(f"Unexpected error in OTP and CAPTCHA submission: {str(e)}")
         return {"status": "error", "message": str(e)}
     finally:
-        close_driver()
+        session_watchdog.clear(registration_id)
+        close_driver(registration_id)
 
 
+@deadline_bounded
 def get_captcha_screenshot(registration_id):
-    driver = get_driver()
+    driver = get_driver(registration_id)
+    session_watchdog.beat(registration_id, "captcha_screenshot", "get_captcha_screenshot", 40)
     try:
-        captcha_element = WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.ID, "ctl00_ContentPlaceHolder1_imgCaptcha"))
-        )
+        captcha_element = PortalPage(driver, "final").element("captcha_image", timeout=30)
         
         element_location = captcha_element.location
         element_size = captcha_element.size
@@ -1053,7 +613,7 @@ def get_captcha_screenshot(registration_id):
         
         driver.execute_script(f"window.scrollTo(0, {scroll_y});")
         
-        time.sleep(2)
+        time.sleep(bounded(2))
         
         captcha_screenshot = captcha_element.screenshot_as_png
         captcha_image = Image.open(BytesIO(captcha_screenshot))
@@ -1074,6 +634,8 @@ def get_captcha_screenshot(registration_id):
     except Exception as e:
         logging.error(f"Error getting CAPTCHA screenshot: {str(e)}")
         return None
+    finally:
+        session_watchdog.clear(registration_id)
 
 
 
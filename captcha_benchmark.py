@@ -0,0 +1,76 @@
+# udyam\captcha_benchmark.py
+
+import argparse
+import time
+
+from captcha_solver import (
+    CAPTCHA_CONFIDENCE_THRESHOLD,
+    CAPTCHA_MODEL_PATH,
+    LocalCaptchaSolver,
+    iter_labelled_images,
+    train_local_model,
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(folder, model_path=CAPTCHA_MODEL_PATH, threshold=CAPTCHA_CONFIDENCE_THRESHOLD):
+    solver = LocalCaptchaSolver(model_path)
+    latencies = []
+    correct = 0
+    accepted = 0
+    accepted_correct = 0
+
+    for path, label in iter_labelled_images(folder):
+        started = time.perf_counter()
+        guess = solver.solve(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        is_correct = guess.text == label
+        correct += is_correct
+        if guess.confidence >= threshold:
+            accepted += 1
+            accepted_correct += is_correct
+
+    total = len(latencies)
+    return {
+        "images": total,
+        "accuracy": correct / total if total else 0.0,
+        "auto_solved": accepted / total if total else 0.0,
+        "auto_solved_accuracy": accepted_correct / accepted if accepted else 0.0,
+        "latency_ms_mean": sum(latencies) / total if total else 0.0,
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and benchmark the local CAPTCHA solver")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train the local model from a labelled folder")
+    train_parser.add_argument("folder", help="Folder of captures named <answer>.png or <answer>_<n>.png")
+    train_parser.add_argument("--model", default=CAPTCHA_MODEL_PATH)
+
+    bench_parser = subparsers.add_parser("bench", help="Measure accuracy and latency over a labelled folder")
+    bench_parser.add_argument("folder", help="Folder of captures named <answer>.png or <answer>_<n>.png")
+    bench_parser.add_argument("--model", default=CAPTCHA_MODEL_PATH)
+    bench_parser.add_argument("--threshold", type=float, default=CAPTCHA_CONFIDENCE_THRESHOLD)
+
+    args = parser.parse_args()
+    if args.command == "train":
+        print(f"Model saved to {train_local_model(args.folder, args.model)}")
+    else:
+        results = run_benchmark(args.folder, args.model, args.threshold)
+        print(f"Images:                 {results['images']}")
+        print(f"Accuracy:               {results['accuracy']:.2%}")
+        print(f"Auto-solved (>= {args.threshold:.2f}): {results['auto_solved']:.2%}")
+        print(f"Auto-solved accuracy:   {results['auto_solved_accuracy']:.2%}")
+        print(f"Latency mean/p50/p95:   {results['latency_ms_mean']:.2f} / "
+              f"{results['latency_ms_p50']:.2f} / {results['latency_ms_p95']:.2f} ms")
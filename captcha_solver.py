@@ -0,0 +1,221 @@
+# udyam\captcha_solver.py
+
+import os
+import logging
+from collections import namedtuple, Counter
+
+import numpy as np
+from PIL import Image
+
+
+CAPTCHA_SOLVER = os.getenv("CAPTCHA_SOLVER", "local")
+CAPTCHA_CONFIDENCE_THRESHOLD = float(os.getenv("CAPTCHA_CONFIDENCE_THRESHOLD", "0.85"))
+CAPTCHA_MODEL_PATH = os.getenv(
+    "CAPTCHA_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "captcha_model.npz")
+)
+
+# Every segmented character is normalised to this (width, height) before classification
+GLYPH_SIZE = (16, 20)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+
+CaptchaGuess = namedtuple("CaptchaGuess", ["text", "confidence", "solver"])
+
+
+class CaptchaSolver:
+    name = "base"
+
+    def solve(self, image):
+        raise NotImplementedError
+
+
+def load_image(image):
+    if isinstance(image, Image.Image):
+        return image
+    return Image.open(image)
+
+
+def binarize(image):
+    """Return a 2D bool array where True marks ink pixels"""
+    gray = np.asarray(load_image(image).convert("L"), dtype=np.uint8)
+
+    # Otsu threshold over the grayscale histogram
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (means[-1] * weights / total - means) ** 2 / (weights * (total - weights))
+    threshold = int(np.nanargmax(between))
+
+    ink = gray <= threshold
+    # Text is the minority class; flip if the background came out dark
+    if ink.mean() > 0.5:
+        ink = ~ink
+
+    # Drop isolated noise pixels (fewer than two inked 8-neighbours)
+    padded = np.pad(ink, 1).astype(np.uint8)
+    neighbours = sum(
+        padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    )
+    return ink & (neighbours >= 2)
+
+
+def segment(ink, expected_length=None):
+    """Split a binarized captcha into per-character glyph arrays using column projection"""
+    columns = ink.sum(axis=0) > 0
+    runs = []
+    start = None
+    for x, filled in enumerate(columns):
+        if filled and start is None:
+            start = x
+        elif not filled and start is not None:
+            runs.append((start, x))
+            start = None
+    if start is not None:
+        runs.append((start, len(columns)))
+
+    # Discard specks narrower than two columns
+    runs = [run for run in runs if run[1] - run[0] >= 2]
+
+    # Touching characters show up as one wide run; split the widest until we hit the expected count
+    if expected_length:
+        while runs and len(runs) < expected_length:
+            widest = max(range(len(runs)), key=lambda i: runs[i][1] - runs[i][0])
+            left, right = runs[widest]
+            if right - left < 4:
+                break
+            middle = left + (right - left) // 2
+            runs[widest:widest + 1] = [(left, middle), (middle, right)]
+
+    glyphs = []
+    for left, right in runs:
+        block = ink[:, left:right]
+        rows = np.where(block.any(axis=1))[0]
+        if rows.size == 0:
+            continue
+        block = block[rows[0]:rows[-1] + 1]
+        glyph = Image.fromarray((block * 255).astype(np.uint8)).resize(GLYPH_SIZE, Image.BILINEAR)
+        glyphs.append(np.asarray(glyph, dtype=np.float32).ravel() / 255.0)
+    return glyphs
+
+
+def softmax(scores):
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class LocalCaptchaSolver(CaptchaSolver):
+    """Segments the image and classifies glyphs with a small softmax model on the CPU"""
+    name = "local"
+
+    def __init__(self, model_path=CAPTCHA_MODEL_PATH):
+        self.model_path = model_path
+        self.labels = None
+        self.weights = None
+        self.bias = None
+        self.captcha_length = None
+        if model_path and os.path.exists(model_path):
+            model = np.load(model_path)
+            self.labels = [str(label) for label in model["labels"]]
+            self.weights = model["weights"]
+            self.bias = model["bias"]
+            self.captcha_length = int(model["captcha_length"])
+            logging.info(f"Loaded CAPTCHA model with {len(self.labels)} classes from {model_path}")
+        else:
+            logging.warning(f"CAPTCHA model not found at {model_path}; local solver will defer to vendors")
+
+    def solve(self, image):
+        if self.weights is None:
+            return CaptchaGuess("", 0.0, self.name)
+
+        glyphs = segment(binarize(image), self.captcha_length)
+        if not glyphs or (self.captcha_length and len(glyphs) != self.captcha_length):
+            return CaptchaGuess("", 0.0, self.name)
+
+        probabilities = softmax(np.stack(glyphs) @ self.weights + self.bias)
+        best = probabilities.argmax(axis=1)
+        text = "".join(self.labels[i] for i in best)
+        # A guess is only as good as its least certain character
+        confidence = float(probabilities[np.arange(len(best)), best].min())
+        return CaptchaGuess(text, confidence, self.name)
+
+
+def label_from_filename(path):
+    # Labelled captures are saved as <answer>.png or <answer>_<n>.png
+    return os.path.splitext(os.path.basename(path))[0].split("_")[0]
+
+
+def iter_labelled_images(folder):
+    for filename in sorted(os.listdir(folder)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.join(folder, filename), label_from_filename(filename)
+
+
+def train_local_model(folder, model_path=CAPTCHA_MODEL_PATH, epochs=300, learning_rate=0.5, l2=1e-4):
+    samples = list(iter_labelled_images(folder))
+    if not samples:
+        raise ValueError(f"No labelled CAPTCHA images found in {folder}")
+
+    captcha_length = Counter(len(label) for _, label in samples).most_common(1)[0][0]
+
+    features, targets = [], []
+    skipped = 0
+    for path, label in samples:
+        glyphs = segment(binarize(path), captcha_length)
+        if len(glyphs) != len(label):
+            skipped += 1
+            continue
+        features.extend(glyphs)
+        targets.extend(label)
+    if not features:
+        raise ValueError("No CAPTCHA images could be segmented into the labelled number of characters")
+
+    labels = sorted(set(targets))
+    index = {label: i for i, label in enumerate(labels)}
+    x = np.stack(features)
+    y = np.zeros((len(targets), len(labels)), dtype=np.float32)
+    y[np.arange(len(targets)), [index[t] for t in targets]] = 1.0
+
+    weights = np.zeros((x.shape[1], len(labels)), dtype=np.float32)
+    bias = np.zeros(len(labels), dtype=np.float32)
+    for _ in range(epochs):
+        gradient = (softmax(x @ weights + bias) - y) / len(x)
+        weights -= learning_rate * (x.T @ gradient + l2 * weights)
+        bias -= learning_rate * gradient.sum(axis=0)
+
+    os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+    np.savez(model_path, labels=np.array(labels), weights=weights, bias=bias, captcha_length=captcha_length)
+    logging.info(f"Trained CAPTCHA model on {len(samples) - skipped} images ({skipped} skipped), saved to {model_path}")
+    return model_path
+
+
+SOLVERS = {
+    "local": LocalCaptchaSolver,
+}
+
+_solver = None
+
+
+def register_solver(name, solver_class):
+    SOLVERS[name] = solver_class
+
+
+def get_captcha_solver():
+    global _solver
+    if _solver is None and CAPTCHA_SOLVER in SOLVERS:
+        _solver = SOLVERS[CAPTCHA_SOLVER]()
+    return _solver
+
+
+def solve_captcha(image):
+    solver = get_captcha_solver()
+    if solver is None:
+        return None
+    try:
+        return solver.solve(image)
+    except Exception as e:
+        logging.error(f"CAPTCHA solver {solver.name} failed: {str(e)}")
+        return None
@@ -1,8 +1,9 @@
 # udyam\database.py
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, JSON, Enum, Index, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, JSON, Enum, Index, ForeignKey, UniqueConstraint, event, select
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from dataclasses import dataclass, fields
 from datetime import datetime, timezone, timedelta
 import secrets
 import uuid
@@ -18,6 +19,8 @@ class FormStatus(enum.Enum):
     IN_PROGRESS = "In Progress"
     COMPLETED = "Completed"
     ERROR = "Error"
+    # The applicant did not respond in time; the browser was released but the registration can be retried
+    EXPIRED = "Expired"
 
 class RegistrationStage(enum.Enum):
     INITIATED = "Initiated"
@@ -50,6 +53,8 @@ class RegistrationStage(enum.Enum):
     CAPTCHA_REQUIRED = "CAPTCHA Required"
     COMPLETED = "Completed"
     ERROR = "Error"
+    DEADLINE_EXCEEDED = "Deadline Exceeded"
+    SESSION_EXPIRED = "Session Expired"
 
 
 class Gender(enum.Enum):
@@ -71,12 +76,17 @@ class Vendor(Base):
     email = Column(String(100), unique=True, nullable=False)
     api_key = Column(String(64), unique=True, nullable=False)
     api_key_expires_at = Column(DateTime, nullable=False)
+    webhook_url = Column(String(500), nullable=True)
+    webhook_secret = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     def generate_api_key(self):
         self.api_key = secrets.token_urlsafe(32)
         self.api_key_expires_at = datetime.now(timezone.utc) + timedelta(days=30)
 
+    def generate_webhook_secret(self):
+        self.webhook_secret = secrets.token_hex(32)
+
 class UdyamRegistration(Base):
     __tablename__ = 'udyam_registrations'
 
@@ -139,6 +149,16 @@ class UdyamRegistration(Base):
     
     have_gstin = Column(String(3), nullable=False)
     
+    # Portal option values and derived fields resolved locally at ingest
+    resolved_options = Column(JSON, default={})
+    
+    # Portal actions compiled at ingest (step_plan.py) and the index to resume them from
+    step_plan = Column(JSON, nullable=True)
+    plan_position = Column(Integer, default=0)
+    
+    # End-to-end budget, fixed when the registration is dispatched to a portal session (deadlines.py)
+    deadline_at = Column(DateTime, nullable=True)
+    
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
@@ -147,14 +167,70 @@ class UdyamRegistration(Base):
     stage_details = Column(JSON, default={})
     error_message = Column(String(500))
     last_updated = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    
+    # vendor:aadhaar:pan while the registration is in flight or completed, NULL once it fails;
+    # the unique constraint allows one active registration per applicant and vendor
+    active_key = Column(String(64), unique=True, nullable=True)
 
     __table_args__ = (
         Index('idx_aadhaar_pan', 'aadhaar', 'pan'),
-        Index('idx_vendor_id', 'vendor_id'),
+        # Covers bulk status lookups so they never touch the table rows; also serves vendor_id filters
+        Index('idx_vendor_status_cover', 'vendor_id', 'id', 'form_status', 'current_stage', 'last_updated'),
+        # Lets the reaper find registrations that have waited too long in a status
+        Index('idx_status_last_updated', 'form_status', 'last_updated'),
     )
 
 Vendor.registrations = relationship("UdyamRegistration", order_by=UdyamRegistration.created_at, back_populates="vendor")
 
+def active_registration_key(vendor_id, aadhaar, pan):
+    return f"{vendor_id}:{aadhaar}:{pan}"
+
+@event.listens_for(UdyamRegistration, 'before_insert')
+@event.listens_for(UdyamRegistration, 'before_update')
+def set_active_key(mapper, connection, registration):
+    if registration.form_status == FormStatus.ERROR:
+        registration.active_key = None
+    else:
+        registration.active_key = active_registration_key(registration.vendor_id, registration.aadhaar, registration.pan)
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    vendor_id = Column(String(36), ForeignKey('vendors.id'), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    registration_ids = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        UniqueConstraint('vendor_id', 'key', name='uq_idempotency_vendor_key'),
+    )
+
+class PortalSession(Base):
+    """Which node's browser holds a registration's live portal session (session_registry.py)"""
+    __tablename__ = 'portal_sessions'
+
+    registration_id = Column(String(36), ForeignKey('udyam_registrations.id'), primary_key=True)
+    node_id = Column(String(100), nullable=False, index=True)
+    node_url = Column(String(500), nullable=True)
+    claimed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class WebhookDeadLetter(Base):
+    __tablename__ = 'webhook_dead_letters'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    vendor_id = Column(String(36), ForeignKey('vendors.id'), nullable=False)
+    webhook_url = Column(String(500), nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String(500))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index('idx_dead_letter_vendor', 'vendor_id', 'created_at'),
+    )
+
 database_url = os.getenv('DATABASE_URL', 'sqlite:///udyam_registrations.db')
 engine = create_engine(database_url)
 Base.metadata.create_all(engine)
@@ -164,6 +240,78 @@ Session = sessionmaker(bind=engine)
 def get_db_session():
     return Session()
 
+@dataclass(frozen=True)
+class RegistrationSnapshot:
+    """Detached, read-only copy of the applicant data the automation workers need"""
+    id: str
+    vendor_id: str
+    aadhaar: str
+    name: str
+    pan: str
+    pan_name: str
+    dob: str
+    mobile: str
+    email: str
+    social_category: SocialCategory
+    gender: Gender
+    specially_abled: bool
+    enterprise_name: str
+    unit_name: str
+    premises_number: str
+    building_name: str
+    village_town: str
+    block: str
+    road_street_lane: str
+    city: str
+    state: str
+    district: str
+    pincode: str
+    official_premises_number: str
+    official_address: str
+    official_town: str
+    official_block: str
+    official_lane: str
+    official_city: str
+    official_state: str
+    official_district: str
+    official_pincode: str
+    date_of_incorporation: str
+    date_of_commencement: str
+    bank_name: str
+    account_number: str
+    ifsc_code: str
+    major_activity: str
+    second_form_section: str
+    nic_codes: list
+    male_employees: int
+    female_employees: int
+    other_employees: int
+    investment_wdv: float
+    investment_exclusion_cost: float
+    total_turnover: float
+    export_turnover: float
+    have_gstin: str
+    resolved_options: dict
+    step_plan: dict
+    plan_position: int
+    deadline_at: datetime
+    form_status: FormStatus
+    stage_details: dict
+
+SNAPSHOT_COLUMNS = [getattr(UdyamRegistration.__table__.c, field.name) for field in fields(RegistrationSnapshot)]
+
+def load_registration_snapshot(registration_id):
+    """Read a registration in one short transaction; no session or connection outlives the call"""
+    with engine.connect() as connection:
+        row = connection.execute(
+            select(*SNAPSHOT_COLUMNS).where(UdyamRegistration.id == registration_id)
+        ).mappings().first()
+    if row is None:
+        return None
+    return RegistrationSnapshot(**{**row, "resolved_options": row["resolved_options"] or {},
+                                   "stage_details": row["stage_details"] or {},
+                                   "plan_position": row["plan_position"] or 0})
+
 if __name__ == "__main__":
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
@@ -0,0 +1,126 @@
+# udyam\db_profiling.py
+
+import os
+import time
+import logging
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import event
+
+from metrics import metrics_registry
+
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+# Per-request X-DB-Queries / X-DB-Time-Ms headers; on by default in debug mode
+DB_PROFILE_HEADERS = os.getenv("DB_PROFILE_HEADERS", os.getenv("DEBUG_MODE", "False")).lower() == "true"
+
+db_statements = metrics_registry.counter(
+    "udyam_db_statements_total", "SQL statements executed", ["scope", "name"])
+db_seconds = metrics_registry.counter(
+    "udyam_db_seconds_total", "Time spent executing SQL statements", ["scope", "name"])
+db_slow_statements = metrics_registry.counter(
+    "udyam_db_slow_statements_total", "SQL statements slower than SLOW_QUERY_THRESHOLD_MS", ["scope", "name"])
+db_statements_per_scope = metrics_registry.histogram(
+    "udyam_db_statements_per_scope", "SQL statements issued by one request or background job", ["scope", "name"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 500))
+
+
+class QueryStats:
+    __slots__ = ("scope", "name", "statements", "seconds")
+
+    def __init__(self, scope, name):
+        self.scope = scope
+        self.name = name
+        self.statements = 0
+        self.seconds = 0.0
+
+
+current_stats = contextvars.ContextVar("current_db_stats", default=None)
+
+
+def redact_parameters(parameters):
+    """Keep the shape of bound parameters but never their values (Aadhaar, PAN, mobile...)"""
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return type(parameters)(redact_parameters(value) for value in parameters)
+    if parameters is None:
+        return None
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__}:{len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = current_stats.get()
+    scope, name = (stats.scope, stats.name) if stats else ("other", "")
+    if stats:
+        stats.statements += 1
+        stats.seconds += elapsed
+    db_statements.inc(scope=scope, name=name)
+    db_seconds.inc(elapsed, scope=scope, name=name)
+
+    if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        db_slow_statements.inc(scope=scope, name=name)
+        logging.warning(f"Slow query ({elapsed * 1000:.1f} ms) in {scope} {name}: {' '.join(statement.split())} "
+                        f"params={redact_parameters(parameters)}")
+
+
+def install_query_profiling(engine):
+    if not event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def profile_scope(scope, name):
+    """Attribute every statement run in this context (thread) to one request or job"""
+    stats = QueryStats(scope, name)
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+        db_statements_per_scope.observe(stats.statements, scope=scope, name=name)
+
+
+def profiled_job(func):
+    """Profile a background job; logs its statement count and DB time when it finishes"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_scope("job", func.__name__) as stats:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                logging.info(f"{func.__name__} issued {stats.statements} statements "
+                             f"in {stats.seconds * 1000:.1f} ms")
+    return wrapper
+
+
+def init_request_profiling(app):
+    @app.before_request
+    def start_request_profile():
+        request._db_profile = profile_scope("request", request.endpoint or "unknown")
+        request._db_stats = request._db_profile.__enter__()
+
+    @app.after_request
+    def add_profile_headers(response):
+        stats = getattr(request, "_db_stats", None)
+        if stats and DB_PROFILE_HEADERS:
+            response.headers["X-DB-Queries"] = str(stats.statements)
+            response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+        return response
+
+    @app.teardown_request
+    def finish_request_profile(exc=None):
+        profile = getattr(request, "_db_profile", None)
+        if profile:
+            profile.__exit__(None, None, None)
@@ -0,0 +1,65 @@
+# udyam\deadlines.py
+
+import os
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+
+
+# Wall-clock budget of a registration from dispatch to the final submission, the applicant's OTP steps included
+REGISTRATION_DEADLINE_SECONDS = float(os.getenv("REGISTRATION_DEADLINE_SECONDS", "1800"))
+
+
+class DeadlineExceeded(Exception):
+    """The registration's end-to-end budget ran out"""
+
+
+current_deadline = contextvars.ContextVar("registration_deadline", default=None)
+
+
+def new_deadline(seconds=REGISTRATION_DEADLINE_SECONDS):
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+def remaining_seconds(deadline_at):
+    # SQLite hands DateTime columns back without a timezone; they are stored as UTC
+    if deadline_at.tzinfo is None:
+        deadline_at = deadline_at.replace(tzinfo=timezone.utc)
+    return (deadline_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def deadline_passed(deadline_at=None):
+    """Whether deadline_at (default: the current registration's deadline) is behind us"""
+    deadline_at = deadline_at or current_deadline.get()
+    return deadline_at is not None and remaining_seconds(deadline_at) <= 0
+
+
+@contextmanager
+def registration_deadline(deadline_at):
+    """Bound every portal wait in this context (thread) by deadline_at; None leaves the waits as they are"""
+    token = current_deadline.set(deadline_at)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def deadline_bounded(func):
+    """Run func under the deadline passed as its deadline_at keyword argument"""
+    @wraps(func)
+    def wrapper(*args, deadline_at=None, **kwargs):
+        with registration_deadline(deadline_at):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def bounded(timeout, what="portal wait"):
+    """min(timeout, remaining budget) for a wait or sleep; raises DeadlineExceeded once the budget is spent"""
+    deadline_at = current_deadline.get()
+    if deadline_at is None:
+        return timeout
+    remaining = remaining_seconds(deadline_at)
+    if remaining <= 0:
+        raise DeadlineExceeded(f"Registration deadline passed before {what}")
+    return min(timeout, remaining)
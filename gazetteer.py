@@ -0,0 +1,174 @@
+# udyam\gazetteer.py
+
+import os
+import re
+import csv
+import json
+import difflib
+import argparse
+from functools import lru_cache
+
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+)
+GAZETTEER_FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.85"))
+
+
+def normalize_place(name):
+    name = (name or "").upper().replace("&", " AND ")
+    return re.sub(r"[^A-Z0-9]+", " ", name).strip()
+
+
+class Gazetteer:
+    """States, districts and DICs with pincode prefixes and portal option values.
+
+    The bundled data holds states, aliases and pincode prefixes only. A state whose district
+    list is empty has not been imported yet; its districts pass through unresolved and are
+    matched against the live dropdown as before.
+    """
+
+    def __init__(self, data):
+        self.version = data.get("version", "unknown")
+        self.states = data.get("states", {})
+        self._state_index = {}
+        self._district_index = {}
+        for name, state in self.states.items():
+            for alias in [name] + state.get("aliases", []):
+                self._state_index[normalize_place(alias)] = name
+            self._district_index[name] = {
+                normalize_place(alias): district
+                for district, entry in state.get("districts", {}).items()
+                for alias in [district] + entry.get("aliases", [])
+            }
+
+    @staticmethod
+    def _fuzzy(index, name):
+        key = normalize_place(name)
+        if key in index:
+            return index[key]
+        close = difflib.get_close_matches(key, list(index), n=1, cutoff=GAZETTEER_FUZZY_CUTOFF)
+        return index[close[0]] if close else None
+
+    def resolve_state(self, name):
+        return self._fuzzy(self._state_index, name)
+
+    def has_districts(self, state):
+        return bool(self._district_index.get(state))
+
+    def resolve_district(self, state, name):
+        return self._fuzzy(self._district_index.get(state, {}), name)
+
+    def state_value(self, state):
+        return self.states.get(state, {}).get("value")
+
+    def district_entry(self, state, district):
+        return self.states.get(state, {}).get("districts", {}).get(district, {})
+
+    def pincode_matches_state(self, pincode, state):
+        prefixes = self.states.get(state, {}).get("pincode_prefixes", [])
+        return any(str(pincode).startswith(prefix) for prefix in prefixes)
+
+    def _resolve_pair(self, data, state_field, district_field, errors):
+        state = self.resolve_state(data.get(state_field))
+        if not state:
+            errors.append(f"{state_field} '{data.get(state_field)}' is not a known state")
+            return None, None
+        district = data.get(district_field)
+        if self.has_districts(state):
+            district = self.resolve_district(state, district)
+            if not district:
+                errors.append(f"{district_field} '{data.get(district_field)}' is not a district of {state}")
+        return state, district
+
+    def resolve_address(self, data):
+        """Return (fields, options, errors) for a registration payload.
+
+        fields holds the canonical state/district names, for lookups only: the registration keeps
+        the applicant's spelling. options holds the portal option values and DIC, where imported.
+        """
+        errors = []
+        fields = {}
+        options = {}
+        for prefix in ("", "official_"):
+            state, district = self._resolve_pair(data, f"{prefix}state", f"{prefix}district", errors)
+            if not state:
+                continue
+            fields[f"{prefix}state"] = state
+            if district:
+                fields[f"{prefix}district"] = district
+            entry = self.district_entry(state, district)
+            if self.state_value(state):
+                options[f"{prefix}state_value"] = self.state_value(state)
+            if entry.get("value"):
+                options[f"{prefix}district_value"] = entry["value"]
+            if not prefix and entry.get("dic"):
+                options["dic"] = entry["dic"]
+                if entry.get("dic_value"):
+                    options["dic_value"] = entry["dic_value"]
+        return fields, options, errors
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    with open(path, encoding="utf-8") as f:
+        return Gazetteer(json.load(f))
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    return load_gazetteer()
+
+
+def resolve_address(data):
+    return get_gazetteer().resolve_address(data)
+
+
+def import_csv(csv_path, version, path=GAZETTEER_PATH):
+    """Merge a state,district[,dic[,district_value[,dic_value]]] CSV into the gazetteer"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    gazetteer = Gazetteer(data)
+
+    imported = 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            row = [cell.strip() for cell in row] + [""] * 5
+            state = gazetteer.resolve_state(row[0])
+            if not state or not row[1]:
+                continue
+            entry = {"dic": row[2] or normalize_place(row[1])}
+            if row[3]:
+                entry["value"] = row[3]
+            if row[4]:
+                entry["dic_value"] = row[4]
+            data["states"][state]["districts"][normalize_place(row[1])] = entry
+            imported += 1
+
+    data["version"] = version
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or extend the local state/district gazetteer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import districts from a CSV")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--version", required=True)
+
+    resolve_parser = subparsers.add_parser("resolve", help="Resolve a state and optional district")
+    resolve_parser.add_argument("state")
+    resolve_parser.add_argument("district", nargs="?")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        print(f"Imported {import_csv(args.csv_path, args.version)} districts")
+    else:
+        print(resolve_address({
+            "state": args.state, "district": args.district,
+            "official_state": args.state, "official_district": args.district
+        }))
@@ -0,0 +1,187 @@
+# udyam\ifsc_directory.py
+
+import os
+import re
+import csv
+import json
+import mmap
+import logging
+import argparse
+from functools import lru_cache
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+IFSC_BANKS_PATH = os.getenv("IFSC_BANKS_PATH", os.path.join(DATA_DIR, "ifsc_banks.json"))
+IFSC_BRANCH_INDEX_PATH = os.getenv("IFSC_BRANCH_INDEX_PATH", os.path.join(DATA_DIR, "ifsc_branches.idx"))
+
+IFSC_PATTERN = re.compile(r"[A-Z]{4}0[A-Z0-9]{6}")
+IFSC_LENGTH = 11
+# Each branch record is the IFSC followed by the branch name, space padded to a fixed width
+BRANCH_RECORD_SIZE = 64
+
+
+def normalize_bank(name):
+    name = (name or "").upper().replace("&", " AND ")
+    name = re.sub(r"[^A-Z0-9]+", " ", name)
+    name = re.sub(r"^THE |\b(LTD|LIMITED)\b", "", name)
+    return " ".join(name.split())
+
+
+class BranchIndex:
+    """Sorted fixed-width branch records, memory-mapped and binary searched in place"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = len(self._map) // BRANCH_RECORD_SIZE
+
+    def _key(self, position):
+        start = position * BRANCH_RECORD_SIZE
+        return self._map[start:start + IFSC_LENGTH]
+
+    def find(self, ifsc):
+        """Return the branch name for an IFSC, or None if the directory does not list it"""
+        key = ifsc.encode("ascii")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == key:
+            start = low * BRANCH_RECORD_SIZE + IFSC_LENGTH
+            return self._map[start:start + BRANCH_RECORD_SIZE - IFSC_LENGTH].decode("ascii").rstrip()
+        return None
+
+
+class IfscDirectory:
+    """Bank names keyed by the 4-letter IFSC bank code, plus an optional branch index.
+
+    Without the branch index only retired bank codes are rejected, and bank names are checked
+    for the banks listed; branch-level existence is checked once an index has been built with
+    `python3 ifsc_directory.py build`.
+    """
+
+    def __init__(self, data, branches=None):
+        self.version = data.get("version", "unknown")
+        self.banks = data.get("banks", {})
+        self.retired = data.get("retired", {})
+        self.branches = branches
+        self._names = {
+            code: {normalize_bank(name) for name in [bank["name"]] + bank.get("aliases", [])}
+            for code, bank in self.banks.items()
+        }
+
+    def bank_name(self, ifsc):
+        """The bank name the portal expects for an IFSC, or None if the bank is not listed"""
+        return self.banks.get(str(ifsc)[:4], {}).get("name")
+
+    def branch(self, ifsc):
+        return self.branches.find(ifsc) if self.branches else None
+
+    def validate(self, ifsc, bank_name=None):
+        ifsc = str(ifsc or "")
+        if not IFSC_PATTERN.fullmatch(ifsc):
+            return []  # Format errors are reported by the field rules
+
+        code = ifsc[:4]
+        if code in self.retired:
+            retired = self.retired[code]
+            return [f"ifsc_code {ifsc} belongs to {retired['name']}, which merged into "
+                    f"{retired['merged_into']}; use the branch's new IFSC"]
+        if self.branches and self.branches.find(ifsc) is None:
+            return [f"ifsc_code {ifsc} is not in IFSC directory {self.version}"]
+        if code not in self.banks:
+            if not self.branches:
+                # The bank list is not exhaustive; without a branch index there is nothing to check against
+                logging.warning(f"IFSC bank code {code} of {ifsc} is not in IFSC directory {self.version}; "
+                                f"accepting it unchecked")
+            if not bank_name:
+                return ["bank_name is required for this ifsc_code"]
+            return []
+        if bank_name and normalize_bank(bank_name) not in self._names[code]:
+            return [f"bank_name '{bank_name}' does not match {self.banks[code]['name']} for ifsc_code {ifsc}"]
+        return []
+
+
+def load_branch_index(path=IFSC_BRANCH_INDEX_PATH):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        logging.info(f"IFSC branch index not found at {path}; only bank codes will be checked")
+        return None
+    return BranchIndex(path)
+
+
+def load_directory(path=IFSC_BANKS_PATH, branch_index_path=IFSC_BRANCH_INDEX_PATH):
+    with open(path, encoding="utf-8") as f:
+        return IfscDirectory(json.load(f), load_branch_index(branch_index_path))
+
+
+@lru_cache(maxsize=1)
+def get_ifsc_directory():
+    return load_directory()
+
+
+def validate_ifsc(ifsc, bank_name=None):
+    return get_ifsc_directory().validate(ifsc, bank_name)
+
+
+def canonical_bank_name(ifsc, bank_name=None):
+    return get_ifsc_directory().bank_name(ifsc) or bank_name
+
+
+def build_branch_index(csv_path, version, path=IFSC_BANKS_PATH, index_path=IFSC_BRANCH_INDEX_PATH):
+    """Build the branch index from an RBI/Razorpay style CSV with BANK, IFSC and BRANCH columns.
+
+    Bank codes missing from the bank list are added with the CSV's bank name.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    records = {}
+    with open(csv_path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.DictReader(f):
+            row = {(key or "").strip().upper(): (value or "").strip() for key, value in row.items()}
+            ifsc = row.get("IFSC", "").upper()
+            if not IFSC_PATTERN.fullmatch(ifsc):
+                continue
+            branch = row.get("BRANCH", "").encode("ascii", "replace")[:BRANCH_RECORD_SIZE - IFSC_LENGTH]
+            records[ifsc] = ifsc.encode("ascii") + branch.ljust(BRANCH_RECORD_SIZE - IFSC_LENGTH)
+            code = ifsc[:4]
+            if code not in data["banks"] and code not in data["retired"] and row.get("BANK"):
+                data["banks"][code] = {"name": row["BANK"], "aliases": []}
+
+    temporary_path = f"{index_path}.tmp"
+    with open(temporary_path, "wb") as f:
+        for ifsc in sorted(records):
+            f.write(records[ifsc])
+    os.replace(temporary_path, index_path)
+
+    data["version"] = version
+    data["banks"] = dict(sorted(data["banks"].items()))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the local IFSC directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the branch index from an IFSC CSV")
+    build_parser.add_argument("csv_path")
+    build_parser.add_argument("--version", required=True)
+
+    lookup_parser = subparsers.add_parser("lookup", help="Look up an IFSC")
+    lookup_parser.add_argument("ifsc")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print(f"Indexed {build_branch_index(args.csv_path, args.version)} branches")
+    else:
+        directory = get_ifsc_directory()
+        ifsc = args.ifsc.upper()
+        print(f"{ifsc}\t{directory.bank_name(ifsc)}\t{directory.branch(ifsc)}")
+        for error in directory.validate(ifsc):
+            print(error)
@@ -0,0 +1,371 @@
+# udyam\loadtest.py
+
+import os
+import sys
+import json
+import time
+import uuid
+import types
+import random
+import secrets
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import requests
+
+from captcha_benchmark import percentile
+
+
+# Reference numbers live in the repository; refresh them from the reference machine only
+LOADTEST_BASELINE_PATH = os.getenv(
+    "LOADTEST_BASELINE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "loadtest-baseline.json")
+)
+# Run settings that must match for two reports to be comparable
+COMPARABLE_SETTINGS = ("vendors", "registrations", "duration", "concurrency", "automation_latency", "database")
+
+# Share of requests per endpoint in the mixed workload
+WORKLOAD_MIX = {
+    "status": 30,
+    "status_compact": 15,
+    "bulk_status": 10,
+    "bulk_status_changed": 5,
+    "registrations_page": 10,
+    "statistics": 5,
+    "export": 5,
+    "register": 5,
+    "invalid_key": 5,
+    "login": 10,
+}
+SAMPLE_IDS_PER_VENDOR = 200
+SEED_BATCH_SIZE = 10000
+SEED_STATUS_WEIGHTS = {
+    "COMPLETED": 60,
+    "ERROR": 10,
+    "AWAITING_OTP": 10,
+    "IN_PROGRESS": 15,
+    "INITIATED": 5,
+}
+
+
+def stub_automation(latency=0.0):
+    """Stand-in for automate_form: every step succeeds after `latency` seconds without a browser"""
+    def step(result):
+        def run(*args, **kwargs):
+            time.sleep(latency)
+            return result
+        return run
+
+    module = types.ModuleType("automate_form")
+    module.initiate_adhar = step("OTP page ready")
+    module.submit_otp = step("OTP submitted successfully")
+    module.execute_plan = step({"captcha_url": None})
+    module.submit_otp_and_captcha = step({"status": "success", "message": "Registration completed successfully"})
+    module.get_captcha_screenshot = step(None)
+    module.close_driver = step(None)
+    module.kill_driver = step(False)
+    module.driver_alive = step(False)
+    module.portal_step_listeners = []
+    return module
+
+
+def seed_database(vendors, registrations, seed=None):
+    """Bulk insert vendors and registrations; returns [(email, api_key, sample_registration_ids)]"""
+    from database import (
+        engine, Vendor, UdyamRegistration, FormStatus, RegistrationStage, Gender, SocialCategory,
+        active_registration_key
+    )
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    stage_for_status = {
+        FormStatus.COMPLETED: RegistrationStage.COMPLETED,
+        FormStatus.ERROR: RegistrationStage.ERROR,
+        FormStatus.AWAITING_OTP: RegistrationStage.OTP_REQUESTED,
+        FormStatus.IN_PROGRESS: RegistrationStage.CAPTCHA_REQUIRED,
+        FormStatus.INITIATED: RegistrationStage.INITIATED,
+    }
+    statuses = [FormStatus[name] for name in SEED_STATUS_WEIGHTS]
+    weights = list(SEED_STATUS_WEIGHTS.values())
+
+    vendor_rows = [{
+        "id": str(uuid.uuid4()),
+        "name": f"Load Vendor {index}",
+        "email": f"load-vendor-{index}-{uuid.uuid4().hex[:8]}@example.com",
+        "api_key": secrets.token_urlsafe(32),
+        "api_key_expires_at": now + timedelta(days=30),
+        "created_at": now,
+    } for index in range(vendors)]
+
+    template = {
+        "name": "Load User", "pan_name": "Load User", "dob": "1985-01-01", "email": "load@example.com",
+        "social_category": SocialCategory.GENERAL, "gender": Gender.MALE, "specially_abled": False,
+        "enterprise_name": "Load Enterprise", "unit_name": "Main Unit", "premises_number": "1",
+        "building_name": "Load Tower", "village_town": "Load Town", "block": "Block A",
+        "road_street_lane": "Main Road", "city": "Bengaluru", "state": "KARNATAKA",
+        "district": "BENGALURU URBAN", "pincode": "560001", "official_premises_number": "1",
+        "official_address": "Load Tower, Main Road", "official_town": "Load Town", "official_block": "Block A",
+        "official_lane": "Main Road", "official_city": "Bengaluru", "official_state": "KARNATAKA",
+        "official_district": "BENGALURU URBAN", "official_pincode": "560001",
+        "date_of_incorporation": "2020-01-01", "date_of_commencement": "2020-02-01",
+        "bank_name": "State Bank of India", "account_number": "12345678901", "ifsc_code": "SBIN0001234",
+        "major_activity": "Manufacturing", "second_form_section": None,
+        "nic_codes": [{"category": "Manufacturing", "2_digit": "10", "4_digit": "1010", "5_digit": "10101"}],
+        "male_employees": 5, "female_employees": 3, "other_employees": 0, "investment_wdv": 500000.0,
+        "investment_exclusion_cost": 200000.0, "total_turnover": 1000000.0, "export_turnover": 200000.0,
+        "have_gstin": "No", "resolved_options": {}, "stage_details": {},
+    }
+
+    samples = {row["id"]: [] for row in vendor_rows}
+    with engine.begin() as connection:
+        connection.execute(Vendor.__table__.insert(), vendor_rows)
+
+    batch = []
+    for index in range(registrations):
+        vendor_id = vendor_rows[index % vendors]["id"]
+        status = rng.choices(statuses, weights)[0]
+        created_at = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        aadhaar = f"{2 + index % 8}{index:011d}"
+        pan = f"AAAP{chr(65 + index % 26)}{index % 10000:04d}Z"
+        row = dict(template)
+        row.update({
+            "id": str(uuid.uuid4()),
+            "vendor_id": vendor_id,
+            "aadhaar": aadhaar,
+            "pan": pan,
+            "mobile": f"9{index % 1000000000:09d}",
+            "form_status": status,
+            "current_stage": stage_for_status[status],
+            "error_message": "Process error: portal timeout" if status == FormStatus.ERROR else None,
+            "active_key": None if status == FormStatus.ERROR else active_registration_key(vendor_id, aadhaar, pan),
+            "created_at": created_at,
+            "updated_at": created_at,
+            "last_updated": min(now, created_at + timedelta(seconds=rng.randint(0, 2 * 86400))),
+        })
+        batch.append(row)
+        if len(samples[vendor_id]) < SAMPLE_IDS_PER_VENDOR:
+            samples[vendor_id].append(row["id"])
+        if len(batch) >= SEED_BATCH_SIZE:
+            with engine.begin() as connection:
+                connection.execute(UdyamRegistration.__table__.insert(), batch)
+            batch = []
+            logging.info(f"Seeded {index + 1} of {registrations} registrations")
+    if batch:
+        with engine.begin() as connection:
+            connection.execute(UdyamRegistration.__table__.insert(), batch)
+
+    return [(row["email"], row["api_key"], samples[row["id"]]) for row in vendor_rows]
+
+
+class LoadClient:
+    """Builds one request per call for a randomly chosen vendor"""
+
+    def __init__(self, base_url, vendors, rng):
+        self.base_url = base_url
+        self.vendors = vendors
+        self.rng = rng
+        self.session = requests.Session()
+
+    def request(self, endpoint):
+        email, api_key, sample_ids = self.rng.choice(self.vendors)
+        headers = {"X-API-Key": api_key}
+        url = self.base_url
+        if endpoint in ("status", "status_compact"):
+            registration_id = self.rng.choice(sample_ids)
+            params = {"compact": "true"} if endpoint == "status_compact" else None
+            return self.session.get(f"{url}/api/udyam/status/{registration_id}", headers=headers, params=params)
+        if endpoint == "bulk_status":
+            return self.session.post(f"{url}/api/udyam/bulk_status", headers=headers,
+                                     json={"registration_ids": sample_ids})
+        if endpoint == "bulk_status_changed":
+            since = (datetime.utcnow() - timedelta(hours=1)).isoformat() + "Z"
+            return self.session.post(f"{url}/api/udyam/bulk_status", headers=headers,
+                                     json={"changed_since": since, "include_errors": False})
+        if endpoint == "registrations_page":
+            return self.session.get(f"{url}/api/vendor/registrations", headers=headers,
+                                    params={"page": self.rng.randint(1, 50), "per_page": 20})
+        if endpoint == "statistics":
+            return self.session.get(f"{url}/api/udyam/statistics", headers=headers)
+        if endpoint == "export":
+            end = datetime.utcnow() - timedelta(days=self.rng.randint(0, 300))
+            return self.session.get(f"{url}/api/udyam/export", headers=headers, params={
+                "start_date": (end - timedelta(days=30)).strftime("%Y-%m-%d"), "end_date": end.strftime("%Y-%m-%d")
+            })
+        if endpoint == "register":
+            from mock_portal import MOCK_DISTRICTS
+            from portal_benchmark import synthetic_registration
+            # Ten-digit indexes stay clear of the seeded Aadhaar numbers
+            index = self.rng.randint(10 ** 9, 9 * 10 ** 9)
+            payload = [synthetic_registration(index + offset, MOCK_DISTRICTS) for offset in range(5)]
+            return self.session.post(f"{url}/api/udyam/register", headers=headers, json=payload)
+        if endpoint == "invalid_key":
+            return self.session.get(f"{url}/api/udyam/statistics", headers={"X-API-Key": secrets.token_urlsafe(32)})
+        if endpoint == "login":
+            return self.session.post(f"{url}/api/vendor/login", json={"email": email, "api_key": api_key})
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def run_workload(base_url, vendors, duration, concurrency, seed=None):
+    endpoints = list(WORKLOAD_MIX)
+    weights = list(WORKLOAD_MIX.values())
+    samples = {endpoint: [] for endpoint in endpoints}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(worker_index):
+        rng = random.Random(None if seed is None else seed + worker_index)
+        client = LoadClient(base_url, vendors, rng)
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = client.request(endpoint)
+                ok = response.status_code < 400 or endpoint == "invalid_key" and response.status_code == 401
+                queries = int(response.headers.get("X-DB-Queries", 0))
+            except requests.RequestException:
+                ok, queries = False, 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[endpoint].append((elapsed, ok, queries))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.monotonic() - started
+
+    report = {"wall_seconds": wall_seconds, "concurrency": concurrency, "endpoints": {}}
+    for endpoint, values in samples.items():
+        if not values:
+            continue
+        latencies = [latency for latency, _, _ in values]
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": sum(1 for _, ok, _ in values if not ok),
+            "rps": len(values) / wall_seconds,
+            "latency_ms_p50": percentile(latencies, 50),
+            "latency_ms_p95": percentile(latencies, 95),
+            "latency_ms_p99": percentile(latencies, 99),
+            "db_queries_per_request": sum(queries for _, _, queries in values) / len(values),
+        }
+    report["total_rps"] = sum(stats["rps"] for stats in report["endpoints"].values())
+    return report
+
+
+def run_settings(args):
+    return {
+        "vendors": args.vendors,
+        "registrations": args.registrations,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "automation_latency": args.automation_latency,
+        "database": (args.database_url or "sqlite").split(":", 1)[0],
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+    }
+
+
+def compare_to_baseline(report, baseline, max_regression):
+    """Return a line per endpoint whose latency, error count or query count regressed"""
+    settings, baseline_settings = report.get("settings", {}), baseline.get("settings", {})
+    for name in COMPARABLE_SETTINGS:
+        if settings.get(name) != baseline_settings.get(name):
+            logging.warning(f"Baseline was recorded with {name}={baseline_settings.get(name)}, this run used "
+                            f"{settings.get(name)}; the comparison is not like for like")
+    regressions = []
+    for endpoint, stats in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        if stats["db_queries_per_request"] > previous["db_queries_per_request"] + 0.5:
+            regressions.append(f"{endpoint}: DB queries/request {previous['db_queries_per_request']:.1f} -> "
+                               f"{stats['db_queries_per_request']:.1f}")
+        if stats["latency_ms_p95"] > previous["latency_ms_p95"] * (1 + max_regression):
+            regressions.append(f"{endpoint}: p95 {previous['latency_ms_p95']:.1f} -> "
+                               f"{stats['latency_ms_p95']:.1f} ms")
+        error_rate = stats["errors"] / stats["requests"]
+        previous_error_rate = previous["errors"] / previous["requests"] if previous["requests"] else 0.0
+        if error_rate > previous_error_rate + 0.01:
+            regressions.append(f"{endpoint}: error rate {previous_error_rate:.1%} -> {error_rate:.1%}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['total_rps']:.1f} requests/s over {report['wall_seconds']:.1f} s "
+          f"with {report['concurrency']} clients")
+    print(f"{'endpoint':<22}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for endpoint, stats in sorted(report["endpoints"].items()):
+        print(f"{endpoint:<22}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+              f"{stats['latency_ms_p50']:>9.1f}{stats['latency_ms_p95']:>9.1f}{stats['latency_ms_p99']:>9.1f}"
+              f"{stats['db_queries_per_request']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API with the browser automation stubbed out")
+    parser.add_argument("--vendors", type=int, default=1000)
+    parser.add_argument("--registrations", type=int, default=1000000)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run the mixed workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=5060)
+    parser.add_argument("--automation-latency", type=float, default=0.0,
+                        help="Seconds each stubbed automation step takes")
+    parser.add_argument("--database-url", default=None, help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--save-baseline", nargs="?", const=LOADTEST_BASELINE_PATH,
+                        help=f"Write the report to this JSON file (default {LOADTEST_BASELINE_PATH})")
+    parser.add_argument("--compare", nargs="?", const=LOADTEST_BASELINE_PATH,
+                        help=f"Compare against a baseline JSON file (default {LOADTEST_BASELINE_PATH}); "
+                             f"exits 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth, as a fraction")
+    args = parser.parse_args()
+
+    os.environ["WEBHOOKS_ENABLED"] = "False"
+    os.environ["DB_PROFILE_HEADERS"] = "True"
+    # Stubbed registrations hold no browser, so the portal session limit should not throttle them
+    os.environ.setdefault("PORTAL_INITIAL_SESSIONS", "100000")
+    os.environ.setdefault("PORTAL_MAX_SESSIONS", "100000")
+    os.environ["PORTAL_PROBE_ENABLED"] = "False"
+    os.environ["REAPER_ENABLED"] = "False"
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='udyam-load-'), 'loadtest.db')}"
+    )
+    logging.basicConfig(level=logging.INFO)
+    sys.modules["automate_form"] = stub_automation(args.automation_latency)
+
+    from werkzeug.serving import make_server
+    from app import app as flask_app
+
+    logging.info(f"Seeding {args.registrations} registrations across {args.vendors} vendors")
+    seeded_vendors = seed_database(args.vendors, args.registrations, args.seed)
+    # Request logging would dominate the measurements
+    for name in ("werkzeug", "root", flask_app.logger.name):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", args.port, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = run_workload(f"http://127.0.0.1:{args.port}", seeded_vendors, args.duration,
+                              args.concurrency, args.seed)
+    finally:
+        server.shutdown()
+    report["seed"] = {"vendors": args.vendors, "registrations": args.registrations}
+    report["settings"] = run_settings(args)
+    report["recorded_at"] = datetime.now().isoformat(timespec="seconds")
+
+    print_report(report)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,243 @@
+# udyam\locators.py
+
+import logging
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException,
+    ElementClickInterceptedException,
+)
+
+from deadlines import bounded
+
+
+def portal_id(name):
+    return f"ctl00_ContentPlaceHolder1_{name}"
+
+
+def portal_name(name):
+    return f"ctl00$ContentPlaceHolder1${name}"
+
+
+# Every portal element the automation touches, by page. Entries with {} take an index or code
+# (radio option, NIC level, category label). A markup change on the portal is fixed here only.
+PAGES = {
+    "aadhaar": {
+        "aadhaar": (By.ID, portal_id("txtadharno")),
+        "owner_name": (By.ID, portal_id("txtownername")),
+        "validate_aadhaar": (By.ID, portal_id("btnValidateAadhaar")),
+        "otp": (By.ID, portal_id("txtOtp1")),
+        "validate_otp": (By.ID, portal_id("btnValidate")),
+    },
+    "pan": {
+        "org_type": (By.ID, portal_id("ddlTypeofOrg")),
+        "pan": (By.ID, portal_id("txtPan")),
+        "pan_name": (By.ID, portal_id("txtPanName")),
+        "dob": (By.ID, portal_id("txtdob")),
+        "preloader": (By.ID, "preloader"),
+        "declaration": (By.ID, portal_id("chkDecarationP")),
+        "validate_pan": (By.ID, portal_id("btnValidatePan")),
+        "get_pan_data": (By.ID, portal_id("btnGetPanData")),
+        "gstin_options": (By.ID, portal_id("rblWhetherGstn")),
+        "gstin": (By.ID, portal_id("rblWhetherGstn_{}")),
+        "mobile": (By.ID, portal_id("txtmobile")),
+    },
+    "form": {
+        "mobile": (By.ID, portal_id("txtmobile")),
+        "email": (By.ID, portal_id("txtemail")),
+        "social_category": (By.ID, portal_id("rdbcategory_{}")),
+        "gender": (By.ID, portal_id("rbtGender_{}")),
+        "specially_abled": (By.ID, portal_id("rbtPh_{}")),
+        "enterprise_name": (By.ID, portal_id("txtenterprisename")),
+        "unit_name": (By.ID, portal_id("txtUnitName")),
+        "add_unit": (By.ID, portal_id("btnAddUnit")),
+        "unit": (By.ID, portal_id("ddlUnitName")),
+        "premises_number": (By.ID, portal_id("txtPFlat")),
+        "building_name": (By.ID, portal_id("txtPBuilding")),
+        "village_town": (By.ID, portal_id("txtPVillageTown")),
+        "block": (By.ID, portal_id("txtPBlock")),
+        "road_street_lane": (By.ID, portal_id("txtPRoadStreetLane")),
+        "city": (By.ID, portal_id("txtPCity")),
+        "pincode": (By.ID, portal_id("txtPpin")),
+        "state": (By.ID, portal_id("ddlPState")),
+        "district": (By.ID, portal_id("ddlPDistrict")),
+        "district_loaded": (By.CSS_SELECTOR, f"#{portal_id('ddlPDistrict')} option:not([value='0'])"),
+        "add_plant": (By.ID, portal_id("BtnPAdd")),
+        "official_premises_number": (By.ID, portal_id("txtOffFlatNo")),
+        "official_building_name": (By.ID, portal_id("txtOffBuilding")),
+        "official_village_town": (By.ID, portal_id("txtOffVillageTown")),
+        "official_block": (By.ID, portal_id("txtOffBlock")),
+        "official_road_street_lane": (By.ID, portal_id("txtOffRoadStreetLane")),
+        "official_city": (By.ID, portal_id("txtOffCity")),
+        "official_pincode": (By.ID, portal_id("txtOffPin")),
+        "official_state": (By.ID, portal_id("ddlstate")),
+        "official_district": (By.ID, portal_id("ddlDistrict")),
+        "official_district_loaded": (By.CSS_SELECTOR, f"#{portal_id('ddlDistrict')} option:not([value='0'])"),
+        "latitude": (By.ID, portal_id("txtlatitude")),
+        "longitude": (By.ID, portal_id("txtlongitude")),
+        "get_coordinates": (By.ID, portal_id("Button1")),
+        "date_of_incorporation": (By.ID, portal_id("txtdateIncorporation")),
+        "date_of_commencement": (By.ID, portal_id("txtcommencedate")),
+        "bank_name": (By.ID, portal_id("txtBankName")),
+        "account_number": (By.ID, portal_id("txtaccountno")),
+        "ifsc_code": (By.ID, portal_id("txtifsccode")),
+        "major_activity": (By.ID, portal_id("rdbCatgg_{}")),
+        "sub_activity_panel": (By.ID, portal_id("divsubcatg")),
+        "sub_activity": (By.ID, portal_id("rdbSubCategg_{}")),
+    },
+    "map": {
+        "latitude": (By.ID, portal_id("txtlatitude1")),
+        "longitude": (By.ID, portal_id("txtlongitude1")),
+        "map": (By.ID, "mapDiv"),
+        "svg": (By.CSS_SELECTOR, "svg"),
+        "paths": (By.CSS_SELECTOR, "path"),
+        "ok": (By.CSS_SELECTOR, 'button.btn.btn-primary[onclick="f2();"]'),
+    },
+    "additional": {
+        "sub_activity": (By.ID, portal_id("rdbSubCategg_{}")),
+        "nic_category": (By.XPATH, f"//table[@id='{portal_id('rdbCatggMultiple')}']//label[contains(text(),'{{}}')]"),
+        "nic_level": (By.NAME, portal_name("ddl{}NicCode")),
+        "add_activity": (By.XPATH, f"//input[@name='{portal_name('btnAddMore')}'][@value='Add Activity']"),
+        "male_employees": (By.ID, portal_id("txtNoofpersonMale")),
+        "female_employees": (By.ID, portal_id("txtNoofpersonFemale")),
+        "other_employees": (By.ID, portal_id("txtNoofpersonOthers")),
+        "investment_wdv": (By.ID, portal_id("txtDepCost")),
+        "investment_exclusion_cost": (By.ID, portal_id("txtExCost")),
+        "total_turnover": (By.ID, portal_id("txtTotalTurnoverA")),
+        "gem_no": (By.ID, portal_id("rblGeM_1")),
+        "treds_no": (By.ID, portal_id("rblTReDS_1")),
+        "ncs_no": (By.ID, portal_id("rblNCS_1")),
+        "nsic_no": (By.ID, portal_id("rblnsic_1")),
+        "nixi_no": (By.ID, portal_id("rblnixi_1")),
+        "sid_no": (By.ID, portal_id("rblsid_1")),
+        "dic": (By.ID, portal_id("ddlDIC")),
+        "submit": (By.ID, portal_id("btnsubmit")),
+        "captcha_image": (By.ID, portal_id("imgCaptcha")),
+    },
+    "final": {
+        "otp": (By.ID, portal_id("txtOtp")),
+        "captcha": (By.ID, portal_id("txtCaptcha")),
+        "captcha_image": (By.ID, portal_id("imgCaptcha")),
+        "final_submit": (By.ID, portal_id("btn_finalsubmit")),
+        "message": (By.ID, portal_id("lblMssgg")),
+    },
+}
+
+
+def locator(page, name, *args):
+    by, value = PAGES[page][name]
+    return by, value.format(*args) if args else value
+
+
+# Looks up a batch of locators in one round-trip; null for any not on the page yet
+RESOLVE_SCRIPT = """
+return arguments[0].map(function(locator) {
+    var by = locator[0], value = locator[1];
+    if (by === 'id') return document.getElementById(value);
+    if (by === 'name') return document.getElementsByName(value)[0] || null;
+    if (by === 'css selector') return document.querySelector(value);
+    return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+});
+"""
+
+STALE_RETRIES = 3
+
+
+class PortalPage:
+    """Element handles for one portal page, resolved in batches and cached until they go stale"""
+
+    def __init__(self, driver, page):
+        self.driver = driver
+        self.page = page
+        self._handles = {}
+
+    def locator(self, name, *args):
+        return locator(self.page, name, *args)
+
+    def id(self, name, *args):
+        by, value = self.locator(name, *args)
+        if by != By.ID:
+            raise ValueError(f"{self.page}.{name} is not located by id")
+        return value
+
+    def invalidate(self):
+        """Drop cached handles, e.g. after a full page load"""
+        self._handles.clear()
+
+    def resolve(self, *names, timeout=15):
+        """Wait until every named element is present, looking them all up in one script call per poll.
+        Names are plain strings or (name, *args) tuples."""
+        keys = [name if isinstance(name, tuple) else (name,) for name in names]
+        pending = [key for key in keys if key not in self._handles]
+
+        def attempt(d):
+            found = d.execute_script(RESOLVE_SCRIPT, [list(self.locator(*key)) for key in pending])
+            for key, element in zip(list(pending), found):
+                if element is not None:
+                    self._handles[key] = element
+                    pending.remove(key)
+            return not pending
+
+        if pending:
+            try:
+                WebDriverWait(self.driver, bounded(timeout)).until(attempt)
+            except TimeoutException:
+                raise TimeoutException(f"Elements not found on {self.page} page: "
+                                       f"{', '.join(':'.join(map(str, key)) for key in pending)}")
+        return [self._handles[key] for key in keys]
+
+    def element(self, name, *args, timeout=15):
+        return self.resolve((name, *args), timeout=timeout)[0]
+
+    def find(self, name, *args, timeout=15):
+        """Like element, but returns None instead of raising when the element never appears"""
+        try:
+            return self.element(name, *args, timeout=timeout)
+        except TimeoutException as e:
+            logging.warning(str(e))
+            return None
+
+    def wait_until(self, condition, name, *args, timeout=15):
+        """Wait on an expected_conditions factory taking a locator, e.g. EC.element_to_be_clickable"""
+        return WebDriverWait(self.driver, bounded(timeout)).until(condition(self.locator(name, *args)))
+
+    def act(self, name, action, *args, timeout=15):
+        """Run action(element), re-resolving the element if a postback replaced it in the meantime"""
+        key = (name, *args)
+        for attempt in range(1, STALE_RETRIES + 1):
+            element = self.resolve(key, timeout=timeout)[0]
+            try:
+                return action(element)
+            except StaleElementReferenceException:
+                self._handles.pop(key, None)
+                if attempt == STALE_RETRIES:
+                    raise
+                logging.info(f"Re-resolving stale element {self.page}.{name} (attempt {attempt})")
+
+    def click(self, name, *args, timeout=15):
+        """Scroll into view and click, falling back to a script click when something overlays the element"""
+        def click(element):
+            self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
+            try:
+                WebDriverWait(self.driver, bounded(10)).until(EC.element_to_be_clickable(element))
+                element.click()
+            except (ElementClickInterceptedException, TimeoutException):
+                self.driver.execute_script("arguments[0].click();", element)
+        self.act(name, click, *args, timeout=timeout)
+
+    def script_click(self, name, *args, timeout=15):
+        self.act(name, lambda element: self.driver.execute_script("arguments[0].click();", element),
+                 *args, timeout=timeout)
+
+    def attribute(self, name, attribute, *args, timeout=15):
+        return self.act(name, lambda element: element.get_attribute(attribute), *args, timeout=timeout)
+
+    def text(self, name, *args, timeout=15):
+        return self.act(name, lambda element: element.text, *args, timeout=timeout)
+
+    def ids(self, values):
+        """Map {name: value} to {element id: value} for fill_fields"""
+        return {self.id(name): value for name, value in values.items()}
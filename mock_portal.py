@@ -0,0 +1,461 @@
+# udyam\mock_portal.py
+
+import os
+import time
+import uuid
+import random
+import string
+import logging
+import argparse
+import threading
+from io import BytesIO
+
+from flask import Flask, request, jsonify, render_template_string, send_file
+from PIL import Image, ImageDraw
+from werkzeug.serving import make_server
+
+from gazetteer import get_gazetteer
+from nic_catalogue import get_nic_catalogue
+
+
+# Latency is applied to every postback; failures and slow responses are injected at random
+MOCK_PORTAL_CONFIG = {
+    "latency_ms": float(os.getenv("MOCK_PORTAL_LATENCY_MS", "200")),
+    "jitter_ms": float(os.getenv("MOCK_PORTAL_JITTER_MS", "100")),
+    "failure_rate": float(os.getenv("MOCK_PORTAL_FAILURE_RATE", "0")),
+    "slow_rate": float(os.getenv("MOCK_PORTAL_SLOW_RATE", "0")),
+    "slow_factor": float(os.getenv("MOCK_PORTAL_SLOW_FACTOR", "10")),
+    # Empty means failures may hit any postback
+    "failure_steps": [step for step in os.getenv("MOCK_PORTAL_FAILURE_STEPS", "").split(",") if step],
+}
+
+# Districts the mock offers for a few states, with a pincode in each for synthetic registrations
+MOCK_DISTRICTS = {
+    "KARNATAKA": {"BENGALURU URBAN": "560001", "MYSURU": "570001", "DHARWAD": "580001", "BELAGAVI": "590001"},
+    "MAHARASHTRA": {"MUMBAI": "400001", "PUNE": "411001", "NASHIK": "422001", "NAGPUR": "440001"},
+    "TAMIL NADU": {"CHENNAI": "600001", "COIMBATORE": "641001", "MADURAI": "625001"},
+    "GUJARAT": {"AHMEDABAD": "380001", "VADODARA": "390001", "SURAT": "395003"},
+    "DELHI": {"NEW DELHI": "110001", "SOUTH": "110017"},
+}
+CAPTCHA_ALPHABET = string.ascii_uppercase + string.digits
+
+app = Flask(__name__)
+
+SESSIONS = {}
+CAPTCHA_ANSWERS = {}
+sessions_lock = threading.Lock()
+
+
+def field_id(name):
+    return f"ctl00_ContentPlaceHolder1_{name}"
+
+
+def field_name(name):
+    return f"ctl00$ContentPlaceHolder1${name}"
+
+
+def text_input(name, label):
+    return (f'<div><label for="{field_id(name)}">{label}</label>'
+            f'<input type="text" id="{field_id(name)}" name="{field_name(name)}"></div>')
+
+
+def button(name, label, onclick):
+    return f'<input type="button" id="{field_id(name)}" name="{field_name(name)}" value="{label}" onclick="{onclick}">'
+
+
+def radio_list(name, labels, onclick=""):
+    items = "".join(
+        f'<td><input type="radio" id="{field_id(name)}_{index}" name="{field_name(name)}" value="{index}" '
+        f'onclick="{onclick}"><label for="{field_id(name)}_{index}">{label}</label></td>'
+        for index, label in enumerate(labels)
+    )
+    return f'<table id="{field_id(name)}"><tr>{items}</tr></table>'
+
+
+def select(name, options, onchange=""):
+    items = "".join(f'<option value="{value}">{text}</option>' for value, text in options)
+    return f'<select id="{field_id(name)}" name="{field_name(name)}" onchange="{onchange}">{items}</select>'
+
+
+def state_options():
+    return [("0", "Select State")] + [
+        (str(index), state) for index, state in enumerate(get_gazetteer().states, start=1)
+    ]
+
+
+def district_options(state_value):
+    states = list(get_gazetteer().states)
+    try:
+        state = states[int(state_value) - 1]
+    except (ValueError, IndexError):
+        return [("0", "Select District")]
+    districts = list(MOCK_DISTRICTS.get(state, ())) or list(get_gazetteer().states[state].get("districts", ()))
+    return [("0", "Select District")] + [(str(index), name) for index, name in enumerate(districts, start=1)]
+
+
+def nic_options(level, parent=None):
+    catalogue = get_nic_catalogue()
+    if level == 2:
+        codes = sorted(code for code in catalogue.codes if len(code) == 2)
+    else:
+        # Codes the catalogue has not imported are synthesised so every parent has children
+        codes = catalogue.children.get(parent) or [
+            f"{parent}{suffix:02d}" if level == 4 else f"{parent}{suffix}"
+            for suffix in (range(10, 100) if level == 4 else range(10))
+        ]
+    options = [("0", "Select")]
+    for code in codes:
+        entry = catalogue.lookup(code) or {}
+        options.append((code, f"{code} - {entry.get('description', 'Mock activity ' + code)}"))
+    return options
+
+
+SECTIONS = {
+    "aadhaar": (
+        text_input("txtadharno", "Aadhaar Number")
+        + text_input("txtownername", "Name of Entrepreneur")
+        + button("btnValidateAadhaar", "Validate & Generate OTP",
+                 "postback('aadhaar', fields('txtadharno', 'txtownername'))")
+    ),
+    "otp": text_input("txtOtp1", "Enter One Time Password") + button("btnValidate", "Validate", "postback('otp')"),
+    "org": select("ddlTypeofOrg", [("0", "Type of Organisation"), ("1", "1. Proprietary / एकल स्वामित्व"),
+                                   ("2", "2. Hindu Undivided Family"), ("3", "3. Partnership")],
+                  "postback('org', fields('ddlTypeofOrg'))"),
+    "pan": (
+        text_input("txtPan", "PAN")
+        + text_input("txtPanName", "Name of PAN Holder")
+        + text_input("txtdob", "DOB or DOI as per PAN")
+        + f'<input type="checkbox" id="{field_id("chkDecarationP")}" name="{field_name("chkDecarationP")}">'
+        + button("btnValidatePan", "PAN Validate", "postback('pan', fields('txtPan', 'txtPanName', 'txtdob'))")
+    ),
+    "pan_data": button("btnGetPanData", "Continue", "postback('pan_data')"),
+    "gstin": radio_list("rblWhetherGstn", ["Yes", "No", "Exempted"], "postback('gstin')"),
+    "details": (
+        text_input("txtmobile", "Mobile Number")
+        + text_input("txtemail", "Email")
+        + radio_list("rdbcategory", ["General", "SC", "ST", "OBC"])
+        + radio_list("rbtGender", ["Male", "Female", "Others"])
+        + radio_list("rbtPh", ["Yes", "No"])
+        + text_input("txtenterprisename", "Name of Enterprise")
+        + text_input("txtUnitName", "Unit Name")
+        + button("btnAddUnit", "Add Unit", "postback('add_unit', fields('txtUnitName'))")
+        + select("ddlUnitName", [("0", "Select Unit")])
+        + "".join(text_input(name, label) for name, label in (
+            ("txtPFlat", "Flat/Door/Block No."), ("txtPBuilding", "Name of Premises/Building"),
+            ("txtPVillageTown", "Village/Town"), ("txtPBlock", "Block"),
+            ("txtPRoadStreetLane", "Road/Street/Lane"), ("txtPCity", "City"), ("txtPpin", "PIN")
+        ))
+        + select("ddlPState", state_options(), "postback('plant_state', fields('ddlPState'))")
+        + select("ddlPDistrict", [("0", "Select District")])
+        + button("BtnPAdd", "Add Plant", "postback('add_plant', fields('ddlPState', 'ddlPDistrict'))")
+    ),
+    "official": (
+        "".join(text_input(name, label) for name, label in (
+            ("txtOffFlatNo", "Flat/Door/Block No."), ("txtOffBuilding", "Name of Premises/Building"),
+            ("txtOffVillageTown", "Village/Town"), ("txtOffBlock", "Block"),
+            ("txtOffRoadStreetLane", "Road/Street/Lane"), ("txtOffCity", "City"), ("txtOffPin", "PIN")
+        ))
+        + select("ddlstate", state_options(), "postback('official_state', fields('ddlstate'))")
+        + select("ddlDistrict", [("0", "Select District")])
+        + text_input("txtlatitude", "Latitude")
+        + text_input("txtlongitude", "Longitude")
+        + button("Button1", "Get Latitude & Longitude", "window.open('/mock/map', 'map', 'width=600,height=400')")
+        + text_input("txtdateIncorporation", "Date of Incorporation")
+        + text_input("txtcommencedate", "Date of Commencement")
+        + text_input("txtBankName", "Bank Name")
+        + text_input("txtaccountno", "Account Number")
+        + text_input("txtifsccode", "IFS Code")
+        + radio_list("rdbCatgg", ["Manufacturing", "Services"], "postback('activity', {value: this.value})")
+    ),
+    "subcategory": f'<div id="{field_id("divsubcatg")}">'
+                   + radio_list("rdbSubCategg", ["Non-Trading", "Trading"]) + "</div>",
+    "activity": (
+        radio_list("rdbCatggMultiple", ["Manufacturing", "Services", "Trading"], "postback('nic_category')")
+        + select("ddl2NicCode", [("0", "Select")], "postback('nic', {level: 2, code: this.value})")
+        + select("ddl4NicCode", [("0", "Select")], "postback('nic', {level: 4, code: this.value})")
+        + select("ddl5NicCode", [("0", "Select")])
+        + button("btnAddMore", "Add Activity", "postback('add_activity', fields('ddl5NicCode'))")
+        + "".join(text_input(name, label) for name, label in (
+            ("txtNoofpersonMale", "Male"), ("txtNoofpersonFemale", "Female"), ("txtNoofpersonOthers", "Others"),
+            ("txtDepCost", "Written Down Value"), ("txtExCost", "Exclusion of cost"),
+            ("txtTotalTurnoverA", "Total Turnover")
+        ))
+        + "".join(radio_list(name, ["Yes", "No"]) for name in
+                  ("rblGeM", "rblTReDS", "rblNCS", "rblnsic", "rblnixi", "rblsid"))
+        + select("ddlDIC", [("0", "Select DIC")])
+        + button("btnsubmit", "Submit & Get Final OTP",
+                 "if (confirm('Please confirm the details before submission')) postback('submit')")
+    ),
+    "captcha": (
+        text_input("txtOtp", "Enter One Time Password")
+        + '<img id="ctl00_ContentPlaceHolder1_imgCaptcha" width="150" height="50" src="">'
+        + text_input("txtCaptcha", "Enter Captcha")
+        + button("btn_finalsubmit", "Final Submit", "postback('final', fields('txtOtp', 'txtCaptcha'))")
+    ),
+}
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head><title>UDYAM REGISTRATION FORM (Mock)</title></head>
+<body>
+<div id="preloader" style="display:none">Please wait...</div>
+<span id="ctl00_ContentPlaceHolder1_lblError" style="color:red"></span>
+<div id="sections"></div>
+{% for name, html in sections.items() %}<template id="section-{{ name }}">{{ html | safe }}</template>
+{% endfor %}
+<script>
+var SESSION = "{{ session }}";
+var pending = 0;
+window.Sys = {WebForms: {PageRequestManager: {getInstance: function() {
+    return {get_isInAsyncPostBack: function() { return pending > 0; }};
+}}}};
+
+function element(name) { return document.getElementById('ctl00_ContentPlaceHolder1_' + name); }
+
+function fields() {
+    var data = {};
+    for (var i = 0; i < arguments.length; i++) {
+        var field = element(arguments[i]);
+        data[arguments[i]] = field ? field.value : null;
+    }
+    return data;
+}
+
+function reveal(name) {
+    if (document.getElementById('revealed-' + name)) return;
+    var container = document.createElement('div');
+    container.id = 'revealed-' + name;
+    container.appendChild(document.getElementById('section-' + name).content.cloneNode(true));
+    document.getElementById('sections').appendChild(container);
+}
+
+function replaceSelect(name, options) {
+    // UpdatePanels re-render the control, so references held by the client go stale
+    var old = element(name);
+    if (!old) return;
+    var replacement = old.cloneNode(false);
+    options.forEach(function(option) {
+        var node = document.createElement('option');
+        node.value = option[0];
+        node.text = option[1];
+        replacement.appendChild(node);
+    });
+    old.parentNode.replaceChild(replacement, old);
+}
+
+function postback(step, data) {
+    pending++;
+    document.getElementById('preloader').style.display = 'block';
+    var body = Object.assign({session: SESSION}, data || {});
+    return fetch('/mock/postback/' + step, {
+        method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)
+    }).then(function(response) { return response.json(); }).then(function(result) {
+        element('lblError').textContent = result.ok ? '' : result.message;
+        (result.reveal || []).forEach(reveal);
+        Object.keys(result.options || {}).forEach(function(name) { replaceSelect(name, result.options[name]); });
+        if (result.captcha_src) element('imgCaptcha').src = result.captcha_src;
+        if (result.final_message) {
+            var label = document.createElement('span');
+            label.id = 'ctl00_ContentPlaceHolder1_lblMssgg';
+            label.textContent = result.final_message;
+            document.getElementById('sections').appendChild(label);
+        }
+    }).finally(function() {
+        pending--;
+        if (!pending) document.getElementById('preloader').style.display = 'none';
+    });
+}
+
+reveal('aadhaar');
+</script>
+</body>
+</html>
+"""
+
+MAP_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Select Location (Mock)</title></head>
+<body>
+<div id="mapDiv">
+<svg width="300" height="200"><path d="M10 10 H 290 V 190 H 10 Z" fill="#9cc" onclick="pick()"></path></svg>
+</div>
+<input type="text" id="ctl00_ContentPlaceHolder1_txtlatitude1" value="">
+<input type="text" id="ctl00_ContentPlaceHolder1_txtlongitude1" value="">
+<button type="button" class="btn btn-primary" onclick="f2();">OK</button>
+<script>
+function pick() {
+    document.getElementById('ctl00_ContentPlaceHolder1_txtlatitude1').value = '12.971599';
+    document.getElementById('ctl00_ContentPlaceHolder1_txtlongitude1').value = '77.594566';
+}
+function f2() {
+    var opener = window.opener.document;
+    opener.getElementById('ctl00_ContentPlaceHolder1_txtlatitude').value =
+        document.getElementById('ctl00_ContentPlaceHolder1_txtlatitude1').value;
+    opener.getElementById('ctl00_ContentPlaceHolder1_txtlongitude').value =
+        document.getElementById('ctl00_ContentPlaceHolder1_txtlongitude1').value;
+    window.close();
+}
+</script>
+</body>
+</html>
+"""
+
+
+def configure(**settings):
+    unknown = set(settings) - set(MOCK_PORTAL_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown mock portal settings: {', '.join(sorted(unknown))}")
+    MOCK_PORTAL_CONFIG.update(settings)
+
+
+def captcha_answer(aadhaar):
+    """The CAPTCHA most recently shown to the session that entered this Aadhaar"""
+    return CAPTCHA_ANSWERS.get(aadhaar)
+
+
+def inject_latency_and_failure(step):
+    delay = MOCK_PORTAL_CONFIG["latency_ms"] + random.uniform(0, MOCK_PORTAL_CONFIG["jitter_ms"])
+    if random.random() < MOCK_PORTAL_CONFIG["slow_rate"]:
+        delay *= MOCK_PORTAL_CONFIG["slow_factor"]
+    time.sleep(delay / 1000)
+    steps = MOCK_PORTAL_CONFIG["failure_steps"]
+    if (not steps or step in steps) and random.random() < MOCK_PORTAL_CONFIG["failure_rate"]:
+        return f"Mock portal failure injected at {step}"
+    return None
+
+
+def handle_aadhaar(session, data):
+    aadhaar = data.get("txtadharno") or ""
+    if not (aadhaar.isdigit() and len(aadhaar) == 12):
+        return {"ok": False, "message": "Please enter a valid Aadhaar number"}
+    session["aadhaar"] = aadhaar
+    return {"ok": True, "reveal": ["otp"]}
+
+
+def handle_pan(session, data):
+    if len(data.get("txtPan") or "") != 10:
+        return {"ok": False, "message": "Please enter a valid PAN"}
+    return {"ok": True, "reveal": ["pan_data"]}
+
+
+def handle_add_plant(session, data):
+    session["plant_state"] = data.get("ddlPState")
+    return {"ok": True, "reveal": ["official"]}
+
+
+def handle_activity(session, data):
+    reveal = ["subcategory", "activity"] if data.get("value") == "1" else ["activity"]
+    dic_options = [("0", "Select DIC")] + district_options(session.get("plant_state"))[1:]
+    return {"ok": True, "reveal": reveal, "options": {"ddlDIC": dic_options}}
+
+
+def handle_nic(session, data):
+    level, code = int(data.get("level", 2)), data.get("code")
+    if level == 2:
+        return {"ok": True, "options": {"ddl4NicCode": nic_options(4, code), "ddl5NicCode": [("0", "Select")]}}
+    return {"ok": True, "options": {"ddl5NicCode": nic_options(5, code)}}
+
+
+def handle_add_activity(session, data):
+    if data.get("ddl5NicCode") in (None, "0"):
+        return {"ok": False, "message": "Please select NIC code"}
+    session.setdefault("activities", []).append(data["ddl5NicCode"])
+    return {"ok": True, "options": {"ddl4NicCode": [("0", "Select")], "ddl5NicCode": [("0", "Select")]}}
+
+
+def handle_submit(session, data):
+    session["captcha"] = "".join(random.choice(CAPTCHA_ALPHABET) for _ in range(5))
+    CAPTCHA_ANSWERS[session.get("aadhaar")] = session["captcha"]
+    return {"ok": True, "reveal": ["captcha"], "captcha_src": f"/mock/captcha/{session['id']}.png?{uuid.uuid4().hex}"}
+
+
+def handle_final(session, data):
+    if (data.get("txtCaptcha") or "").strip().upper() != session.get("captcha"):
+        return {"ok": True, "final_message": "Invalid Captcha, please try again"}
+    number = f"UDYAM-XX-00-{random.randint(0, 9999999):07d}"
+    return {"ok": True, "final_message": f"Your Udyam Registration Number {number} has been generated successfully"}
+
+
+POSTBACK_HANDLERS = {
+    "aadhaar": handle_aadhaar,
+    "otp": lambda session, data: {"ok": True, "reveal": ["org"]},
+    "org": lambda session, data: {"ok": True, "reveal": ["pan"]},
+    "pan": handle_pan,
+    "pan_data": lambda session, data: {"ok": True, "reveal": ["gstin"]},
+    "gstin": lambda session, data: {"ok": True, "reveal": ["details"]},
+    "add_unit": lambda session, data: {
+        "ok": True, "options": {"ddlUnitName": [("0", "Select Unit"), ("1", data.get("txtUnitName") or "Unit 1")]}
+    },
+    "plant_state": lambda session, data: {"ok": True, "options": {"ddlPDistrict": district_options(data.get("ddlPState"))}},
+    "add_plant": handle_add_plant,
+    "official_state": lambda session, data: {"ok": True, "options": {"ddlDistrict": district_options(data.get("ddlstate"))}},
+    "activity": handle_activity,
+    "nic_category": lambda session, data: {"ok": True, "options": {"ddl2NicCode": nic_options(2)}},
+    "nic": handle_nic,
+    "add_activity": handle_add_activity,
+    "submit": handle_submit,
+    "final": handle_final,
+}
+
+
+@app.route("/UdyamRegistration.aspx")
+def registration_page():
+    session_id = uuid.uuid4().hex
+    with sessions_lock:
+        SESSIONS[session_id] = {"id": session_id}
+    return render_template_string(PAGE, sections=SECTIONS, session=session_id)
+
+
+@app.route("/mock/map")
+def map_page():
+    return MAP_PAGE
+
+
+@app.route("/mock/postback/<step>", methods=["POST"])
+def postback(step):
+    if step not in POSTBACK_HANDLERS:
+        return jsonify({"ok": False, "message": f"Unknown postback {step}"}), 404
+    data = request.get_json(silent=True) or {}
+    session = SESSIONS.get(data.get("session"))
+    if session is None:
+        return jsonify({"ok": False, "message": "Session expired, please start again"})
+
+    failure = inject_latency_and_failure(step)
+    if failure:
+        logging.info(failure)
+        return jsonify({"ok": False, "message": failure})
+    return jsonify(POSTBACK_HANDLERS[step](session, data))
+
+
+@app.route("/mock/captcha/<session_id>.png")
+def captcha_image(session_id):
+    session = SESSIONS.get(session_id) or {}
+    image = Image.new("RGB", (150, 50), "white")
+    ImageDraw.Draw(image).text((45, 18), session.get("captcha", ""), fill="black")
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return send_file(buffer, mimetype="image/png")
+
+
+def start_mock_portal(host="127.0.0.1", port=5055):
+    """Serve the mock portal from a background thread; returns the server so it can be shut down"""
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Mock Udyam portal listening on http://{host}:{port}/UdyamRegistration.aspx")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Udyam registration portal")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_PORTAL_CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=MOCK_PORTAL_CONFIG["jitter_ms"])
+    parser.add_argument("--failure-rate", type=float, default=MOCK_PORTAL_CONFIG["failure_rate"])
+    parser.add_argument("--slow-rate", type=float, default=MOCK_PORTAL_CONFIG["slow_rate"])
+    args = parser.parse_args()
+
+    configure(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+              failure_rate=args.failure_rate, slow_rate=args.slow_rate)
+    app.run(host=args.host, port=args.port, threaded=True)
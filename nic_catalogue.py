@@ -0,0 +1,160 @@
+# udyam\nic_catalogue.py
+
+import os
+import re
+import csv
+import json
+import logging
+import argparse
+from functools import lru_cache
+
+
+NIC_CATALOGUE_PATH = os.getenv(
+    "NIC_CATALOGUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nic_catalogue.json")
+)
+
+NIC_LEVELS = {"2_digit": 2, "4_digit": 4, "5_digit": 5}
+
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+class NicCatalogue:
+    """Versioned NIC-2008 catalogue indexed by code, parent and keyword.
+
+    Levels listed in complete_levels are authoritative: codes missing from them are invalid.
+    Other levels are checked structurally only (digits, and the parent code as prefix), plus
+    against the children the catalogue actually knows about, if any.
+    """
+
+    def __init__(self, data):
+        self.version = data.get("version", "unknown")
+        self.categories = set(data.get("categories", ()))
+        self.complete_levels = set(data.get("complete_levels", ()))
+        self.codes = data.get("codes", {})
+        self.children = {}
+        self.keywords = {}
+        for code, entry in self.codes.items():
+            if len(code) > 2:
+                self.children.setdefault(code[:2] if len(code) == 4 else code[:4], []).append(code)
+            for token in set(tokenize(entry.get("description"))):
+                self.keywords.setdefault(token, set()).add(code)
+
+    @property
+    def structural_levels(self):
+        """Code lengths the catalogue cannot vouch for"""
+        return sorted(set(NIC_LEVELS.values()) - self.complete_levels)
+
+    def lookup(self, code):
+        return self.codes.get(code)
+
+    def option_value(self, code):
+        # The portal option value, when the catalogue recorded one that differs from the code
+        entry = self.codes.get(code) or {}
+        return entry.get("value", code)
+
+    def search(self, keyword, level=None):
+        tokens = tokenize(keyword)
+        if not tokens:
+            return []
+        matches = set.intersection(*(self.keywords.get(token, set()) for token in tokens))
+        if level:
+            matches = {code for code in matches if len(code) == level}
+        return sorted(matches)
+
+    def _check_level(self, code, length, parent):
+        if not re.fullmatch(rf"\d{{{length}}}", code or ""):
+            return f"must be a {length}-digit code"
+        if parent and not code.startswith(parent):
+            return f"{code} does not belong to {parent}"
+        if length in self.complete_levels and code not in self.codes:
+            return f"{code} is not in NIC catalogue {self.version}"
+        known_siblings = self.children.get(parent) if parent else None
+        if known_siblings and code not in known_siblings:
+            return f"{code} is not under {parent} in NIC catalogue {self.version}"
+        return None
+
+    def validate(self, nic_codes):
+        if not isinstance(nic_codes, list) or not nic_codes:
+            return ["nic_codes must be a non-empty list"]
+
+        errors = []
+        for position, nic_code in enumerate(nic_codes):
+            if not isinstance(nic_code, dict):
+                errors.append(f"nic_codes[{position}] must be an object")
+                continue
+            if self.categories and nic_code.get("category") not in self.categories:
+                errors.append(f"nic_codes[{position}].category must be one of {', '.join(sorted(self.categories))}")
+            parent = None
+            for level, length in NIC_LEVELS.items():
+                code = str(nic_code.get(level, "")).strip()
+                error = self._check_level(code, length, parent)
+                if error:
+                    errors.append(f"nic_codes[{position}].{level} {error}")
+                    break
+                parent = code
+        return errors
+
+
+def load_catalogue(path=NIC_CATALOGUE_PATH):
+    with open(path, encoding="utf-8") as f:
+        catalogue = NicCatalogue(json.load(f))
+    if catalogue.structural_levels:
+        logging.warning(f"NIC catalogue {catalogue.version} does not list every "
+                        f"{'/'.join(map(str, catalogue.structural_levels))}-digit code; those are checked "
+                        f"structurally only until the full listing is imported")
+    return catalogue
+
+
+@lru_cache(maxsize=1)
+def get_nic_catalogue():
+    return load_catalogue()
+
+
+def validate_nic_codes(nic_codes):
+    return get_nic_catalogue().validate(nic_codes)
+
+
+def import_csv(csv_path, version, path=NIC_CATALOGUE_PATH):
+    """Rebuild the catalogue from a code,description CSV of the full NIC-2008 listing"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    codes = dict(data.get("codes", {}))
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip().isdigit():
+                continue
+            code = row[0].strip()
+            if len(code) in NIC_LEVELS.values():
+                codes[code] = {**codes.get(code, {}), "description": row[1].strip()}
+
+    data["version"] = version
+    data["codes"] = dict(sorted(codes.items()))
+    data["complete_levels"] = sorted({len(code) for code in codes})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    return len(codes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the local NIC catalogue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import a code,description CSV")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--version", required=True)
+
+    search_parser = subparsers.add_parser("search", help="Find codes by keyword")
+    search_parser.add_argument("keyword")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        print(f"Catalogue now holds {import_csv(args.csv_path, args.version)} codes")
+    else:
+        catalogue = get_nic_catalogue()
+        for code in catalogue.search(args.keyword):
+            print(f"{code}\t{catalogue.lookup(code)['description']}")
@@ -0,0 +1,143 @@
+# udyam\pincode_index.py
+
+import os
+import csv
+import logging
+import argparse
+from functools import lru_cache
+
+from gazetteer import normalize_place
+
+
+PINCODE_INDEX_PATH = os.getenv(
+    "PINCODE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pincode_centroids.csv")
+)
+
+# Header names accepted for each column; the India Post "All India Pincode Directory" export
+# (pincode, district, statename, latitude, longitude) loads as-is
+COLUMN_ALIASES = {
+    "pincode": ("pincode", "pin", "pin_code"),
+    "state": ("statename", "state", "state_name"),
+    "district": ("district", "districtname", "district_name"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lng", "lon", "long"),
+}
+
+
+def _column(header, field):
+    for alias in COLUMN_ALIASES[field]:
+        if alias in header:
+            return header[alias]
+    return None
+
+
+def _average(points):
+    return (
+        round(sum(lat for lat, _ in points) / len(points), 6),
+        round(sum(lng for _, lng in points) / len(points), 6)
+    )
+
+
+class PincodeIndex:
+    """Centroids keyed by pincode and by (state, district), averaged over every post office"""
+
+    def __init__(self, by_pincode=None, by_district=None):
+        self.by_pincode = by_pincode or {}
+        self.by_district = by_district or {}
+
+    def lookup(self, pincode, state=None, district=None):
+        coordinates = self.by_pincode.get(str(pincode).strip())
+        if coordinates is None and state and district:
+            coordinates = self.by_district.get((normalize_place(state), normalize_place(district)))
+        return coordinates
+
+
+def read_points(path):
+    """Yield (pincode, state, district, (lat, lng)) for every usable row of a directory CSV"""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = {name.strip().lower(): i for i, name in enumerate(next(reader, []))}
+        columns = {field: _column(header, field) for field in COLUMN_ALIASES}
+        if columns["latitude"] is None or columns["longitude"] is None:
+            logging.error(f"Pincode index {path} has no latitude/longitude columns")
+            return
+
+        def cell(row, field):
+            return row[columns[field]].strip() if columns[field] is not None else None
+
+        for row in reader:
+            try:
+                point = (float(row[columns["latitude"]]), float(row[columns["longitude"]]))
+            except (ValueError, IndexError):
+                continue
+            # Directory rows with missing coordinates carry 0 or NA
+            if not (6 <= point[0] <= 38 and 68 <= point[1] <= 98):
+                continue
+            yield cell(row, "pincode"), cell(row, "state"), cell(row, "district"), point
+
+
+def load_pincode_index(path=PINCODE_INDEX_PATH):
+    if not os.path.exists(path):
+        logging.warning(f"Pincode index not found at {path}; coordinates will come from the portal map. "
+                        f"Build it with: python3 pincode_index.py build <pincode directory csv>")
+        return PincodeIndex()
+
+    pincode_points = {}
+    district_points = {}
+    for pincode, state, district, point in read_points(path):
+        if pincode:
+            pincode_points.setdefault(pincode, []).append(point)
+        if state and district:
+            district_points.setdefault((normalize_place(state), normalize_place(district)), []).append(point)
+
+    index = PincodeIndex(
+        {pincode: _average(points) for pincode, points in pincode_points.items()},
+        {key: _average(points) for key, points in district_points.items()}
+    )
+    logging.info(f"Loaded {len(index.by_pincode)} pincode and {len(index.by_district)} district centroids")
+    return index
+
+
+def build_index(directory_path, path=PINCODE_INDEX_PATH):
+    """Reduce a post-office level directory CSV to one centroid row per pincode at path"""
+    points = {}
+    for pincode, state, district, point in read_points(directory_path):
+        if pincode:
+            _, pincode_points = points.setdefault(pincode, ((state or "", district or ""), []))
+            pincode_points.append(point)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["pincode", "statename", "district", "latitude", "longitude"])
+        for pincode, ((state, district), pincode_points) in sorted(points.items()):
+            writer.writerow([pincode, state, district, *_average(pincode_points)])
+    return len(points)
+
+
+@lru_cache(maxsize=1)
+def get_pincode_index():
+    return load_pincode_index()
+
+
+def lookup_coordinates(pincode, state=None, district=None):
+    return get_pincode_index().lookup(pincode, state, district)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local pincode centroid index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from the India Post pincode directory CSV")
+    build_parser.add_argument("directory_csv")
+
+    lookup_parser = subparsers.add_parser("lookup", help="Look up the centroid of a pincode")
+    lookup_parser.add_argument("pincode")
+    lookup_parser.add_argument("state", nargs="?")
+    lookup_parser.add_argument("district", nargs="?")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print(f"Wrote {build_index(args.directory_csv)} pincode centroids to {PINCODE_INDEX_PATH}")
+    else:
+        print(lookup_coordinates(args.pincode, args.state, args.district))
@@ -0,0 +1,284 @@
+# udyam\portal_benchmark.py
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+
+import psutil
+
+from captcha_benchmark import percentile
+
+
+BENCHMARK_OTP = "123456"
+
+
+def with_verhoeff_digit(number):
+    from validators import verhoeff_valid
+    return next(f"{number}{digit}" for digit in range(10) if verhoeff_valid(f"{number}{digit}"))
+
+
+def synthetic_registration(index, districts):
+    """A registration that passes ingest validation and matches the mock portal's dropdowns"""
+    state = random.choice(sorted(districts))
+    district, pincode = random.choice(sorted(districts[state].items()))
+    letters = "".join(random.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(5))
+    address = {
+        "premises_number": str(index), "building_name": "Bench Tower", "village_town": "Bench Town",
+        "block": "Block A", "road_street_lane": "Main Road", "city": district.title(),
+        "state": state, "district": district, "pincode": pincode,
+    }
+    return {
+        "aadhaar": with_verhoeff_digit(f"{2 + index % 8}{index:010d}"),
+        "name": "Bench User",
+        "pan": f"{letters[:3]}P{letters[3]}{index % 10000:04d}{letters[4]}",
+        "pan_name": "Bench User",
+        "dob": "1985-01-01",
+        "mobile": f"9{index % 1000000000:09d}",
+        "email": f"bench{index}@example.com",
+        "social_category": "General",
+        "gender": "M",
+        "specially_abled": False,
+        "enterprise_name": f"Bench Enterprise {index}",
+        "unit_name": "Main Unit",
+        **address,
+        "official_premises_number": address["premises_number"],
+        "official_address": "Bench Tower, Main Road",
+        "official_town": address["village_town"],
+        "official_block": address["block"],
+        "official_lane": address["road_street_lane"],
+        "official_city": address["city"],
+        "official_state": state,
+        "official_district": district,
+        "official_pincode": pincode,
+        "date_of_incorporation": "2020-01-01",
+        "date_of_commencement": "2020-02-01",
+        "bank_name": "State Bank of India",
+        "account_number": f"{index:011d}",
+        "ifsc_code": "SBIN0001234",
+        "major_activity": "Manufacturing",
+        "nic_codes": [{"category": "Manufacturing", "2_digit": "10", "4_digit": "1010", "5_digit": "10101"}],
+        "male_employees": 5,
+        "female_employees": 3,
+        "other_employees": 0,
+        "investment_wdv": 500000,
+        "investment_exclusion_cost": 200000,
+        "total_turnover": 1000000,
+        "export_turnover": 200000,
+        "have_gstin": "No",
+    }
+
+
+class StageTracker:
+    """Records every stage event with a monotonic timestamp and lets the runner wait on them"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.events = {}
+
+    def on_event(self, vendor_id, event):
+        with self._condition:
+            self.events.setdefault(event["registration_id"], []).append((time.perf_counter(), event["stage"]))
+            self._condition.notify_all()
+
+    def wait_for(self, registration_id, stages, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                for _, stage in self.events.get(registration_id, ()):
+                    if stage in stages:
+                        return stage
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def stage_latencies(self, registration_id, started):
+        """Seconds spent reaching each stage from the previous one"""
+        latencies = []
+        previous = started
+        for timestamp, stage in self.events.get(registration_id, ()):
+            latencies.append((stage, timestamp - previous))
+            previous = timestamp
+        return latencies
+
+
+class BrowserMemorySampler:
+    """Samples the resident memory of the WebDriver process tree and keeps the peak"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def browser_rss():
+        import automate_form
+        total = 0
+        for driver in list(automate_form.drivers.values()):
+            process = getattr(getattr(driver, "service", None), "process", None)
+            if process is None:
+                continue
+            try:
+                root = psutil.Process(process.pid)
+                total += sum(p.memory_info().rss for p in [root] + root.children(recursive=True))
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.browser_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_registration(client, headers, payload, tracker, timeout):
+    from mock_portal import captcha_answer
+
+    started = time.perf_counter()
+    response = client.post("/api/udyam/register", json=payload, headers=headers)
+    if response.status_code != 202:
+        return None, started, f"register returned {response.status_code}: {response.get_json()}"
+    registration_id = response.get_json()["registration_ids"][0]
+
+    if tracker.wait_for(registration_id, {"OTP Requested", "Error"}, timeout) != "OTP Requested":
+        return registration_id, started, "did not reach OTP Requested"
+    client.post("/api/udyam/submit_otp", json={"otp": BENCHMARK_OTP, "registration_id": registration_id},
+                headers=headers)
+
+    if tracker.wait_for(registration_id, {"CAPTCHA Required", "Error"}, timeout) != "CAPTCHA Required":
+        return registration_id, started, "did not reach CAPTCHA Required"
+    client.get(f"/api/udyam/fetch_captcha?registration_id={registration_id}", headers=headers)
+    result = client.post("/api/udyam/submit_otp_and_captcha", headers=headers, json={
+        "otp": BENCHMARK_OTP,
+        "captcha": captcha_answer(payload["aadhaar"]),
+        "registration_id": registration_id
+    }).get_json()
+    if result.get("status") != "success":
+        return registration_id, started, f"final submission failed: {result.get('message')}"
+    return registration_id, started, None
+
+
+def run_benchmark(registrations, timeout=600, seed=None):
+    # Imported here so the environment set up by main() is in place before the database is opened
+    from app import app as flask_app
+    from stage_events import stage_event_bus
+    from mock_portal import MOCK_DISTRICTS
+
+    random.seed(seed)
+    tracker = StageTracker()
+    stage_event_bus.subscribe(tracker.on_event)
+
+    client = flask_app.test_client()
+    vendor = client.post("/api/vendor/register", json={
+        "name": "Benchmark Vendor", "email": f"bench-{time.time_ns()}@example.com"
+    }).get_json()
+    headers = {"X-API-Key": vendor["api_key"]}
+
+    stage_latencies = {}
+    session_peaks = []
+    durations = []
+    failures = []
+    python_rss_start = psutil.Process().memory_info().rss
+    wall_started = time.perf_counter()
+
+    # The automation drives a single shared browser, so registrations run one after another
+    for index in range(registrations):
+        payload = synthetic_registration(index, MOCK_DISTRICTS)
+        with BrowserMemorySampler() as sampler:
+            registration_id, started, error = run_registration(client, headers, payload, tracker, timeout)
+        session_peaks.append(sampler.peak_bytes)
+        if error:
+            failures.append({"index": index, "registration_id": registration_id, "error": error})
+            logging.warning(f"Benchmark registration {index} failed: {error}")
+            continue
+        durations.append(time.perf_counter() - started)
+        for stage, seconds in tracker.stage_latencies(registration_id, started):
+            stage_latencies.setdefault(stage, []).append(seconds)
+
+    wall_seconds = time.perf_counter() - wall_started
+    megabyte = 1024 * 1024
+    return {
+        "registrations": registrations,
+        "completed": len(durations),
+        "failed": len(failures),
+        "failures": failures,
+        "wall_seconds": wall_seconds,
+        "throughput_per_hour": len(durations) / wall_seconds * 3600 if wall_seconds else 0.0,
+        "registration_seconds_p50": percentile(durations, 50),
+        "registration_seconds_p95": percentile(durations, 95),
+        "stage_seconds": {
+            stage: {"p50": percentile(values, 50), "p95": percentile(values, 95), "count": len(values)}
+            for stage, values in stage_latencies.items()
+        },
+        "browser_peak_mb_mean": sum(session_peaks) / len(session_peaks) / megabyte if session_peaks else 0.0,
+        "browser_peak_mb_max": max(session_peaks, default=0) / megabyte,
+        "python_rss_growth_mb": (psutil.Process().memory_info().rss - python_rss_start) / megabyte,
+    }
+
+
+def print_results(results):
+    print(f"Completed:              {results['completed']} / {results['registrations']} "
+          f"({results['failed']} failed)")
+    print(f"Wall time:              {results['wall_seconds']:.1f} s")
+    print(f"Throughput:             {results['throughput_per_hour']:.1f} registrations/hour")
+    print(f"Registration p50/p95:   {results['registration_seconds_p50']:.1f} / "
+          f"{results['registration_seconds_p95']:.1f} s")
+    print(f"Browser peak RSS:       {results['browser_peak_mb_mean']:.0f} MB mean, "
+          f"{results['browser_peak_mb_max']:.0f} MB max per session")
+    print(f"Python RSS growth:      {results['python_rss_growth_mb']:.1f} MB")
+    print("Stage latency (p50 / p95 seconds):")
+    for stage, stats in results["stage_seconds"].items():
+        print(f"  {stage:<28} {stats['p50']:8.2f} / {stats['p95']:8.2f}  (n={stats['count']})")
+    for failure in results["failures"]:
+        print(f"  failed #{failure['index']}: {failure['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay synthetic registrations against the local mock portal")
+    parser.add_argument("--registrations", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for each stage")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    parser.add_argument("--database-url", default=None, help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ["UDYAM_PORTAL_URL"] = f"http://127.0.0.1:{args.port}/UdyamRegistration.aspx"
+    os.environ["CHROME_HEADLESS"] = "False" if args.headed else "True"
+    os.environ["WEBHOOKS_ENABLED"] = "False"
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='udyam-bench-'), 'benchmark.db')}"
+    )
+
+    from mock_portal import configure, start_mock_portal
+    configure(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+              failure_rate=args.failure_rate, slow_rate=args.slow_rate)
+    server = start_mock_portal(port=args.port)
+    try:
+        results = run_benchmark(args.registrations, args.timeout, args.seed)
+    finally:
+        server.shutdown()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,147 @@
+# udyam\portal_health.py
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import requests
+
+from metrics import metrics_registry
+
+
+PORTAL_PROBE_URL = os.getenv("PORTAL_PROBE_URL", os.getenv(
+    "UDYAM_PORTAL_URL", "https://udyamregistration.gov.in/UdyamRegistration.aspx"))
+PORTAL_PROBE_ENABLED = os.getenv("PORTAL_PROBE_ENABLED", "True").lower() == "true"
+PORTAL_PROBE_INTERVAL_SECONDS = float(os.getenv("PORTAL_PROBE_INTERVAL_SECONDS", "15"))
+PORTAL_PROBE_TIMEOUT_SECONDS = float(os.getenv("PORTAL_PROBE_TIMEOUT_SECONDS", "5"))
+# Consecutive failed probes that open the breaker
+PORTAL_PROBE_FAILURES_TO_OPEN = int(os.getenv("PORTAL_PROBE_FAILURES_TO_OPEN", "2"))
+# Rolling window over the outcomes of real portal round trips
+PORTAL_FAILURE_WINDOW = int(os.getenv("PORTAL_FAILURE_WINDOW", "20"))
+PORTAL_FAILURE_MIN_SAMPLES = int(os.getenv("PORTAL_FAILURE_MIN_SAMPLES", "5"))
+PORTAL_FAILURE_RATE_TO_OPEN = float(os.getenv("PORTAL_FAILURE_RATE_TO_OPEN", "0.5"))
+PORTAL_BREAKER_COOLDOWN_SECONDS = float(os.getenv("PORTAL_BREAKER_COOLDOWN_SECONDS", "60"))
+# Registrations let through while half-open, and the successful round trips or probes that close the breaker again
+PORTAL_HALF_OPEN_TRIALS = int(os.getenv("PORTAL_HALF_OPEN_TRIALS", "3"))
+PORTAL_HALF_OPEN_SUCCESSES = int(os.getenv("PORTAL_HALF_OPEN_SUCCESSES", "3"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+breaker_state = metrics_registry.gauge(
+    "udyam_portal_breaker_state", "Portal circuit breaker: 0 closed, 1 half-open, 2 open")
+portal_probes = metrics_registry.counter(
+    "udyam_portal_probes_total", "Health probes of the portal landing page", ["result"])
+
+
+def probe_portal(url=PORTAL_PROBE_URL, timeout=PORTAL_PROBE_TIMEOUT_SECONDS):
+    """A fast GET of the landing page; True when the portal answers without a server error"""
+    try:
+        response = requests.get(url, timeout=timeout)
+        return response.status_code < 500
+    except requests.RequestException as e:
+        logging.warning(f"Portal probe of {url} failed: {str(e)}")
+        return False
+
+
+class PortalCircuitBreaker:
+    """Stops new portal sessions while the portal is down.
+
+    Opens on consecutive failed probes or a high failure rate among real round trips. After
+    PORTAL_BREAKER_COOLDOWN_SECONDS and a good probe it goes half-open and admits a few trial
+    registrations; enough successful round trips or probes close it, any failure opens it again.
+    Probes count because a trial parks at the OTP stage after a single round trip.
+    """
+
+    def __init__(self, probe=probe_portal):
+        self._probe = probe
+        self.state = CLOSED
+        self.opened_at = None
+        self._outcomes = deque(maxlen=PORTAL_FAILURE_WINDOW)
+        self._probe_failures = 0
+        self._last_probe_ok = True
+        self._trials_left = 0
+        self._successes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        breaker_state.set(BREAKER_STATE_VALUES[CLOSED])
+
+    def start(self):
+        if self._thread is None and PORTAL_PROBE_ENABLED:
+            self._thread = threading.Thread(target=self._run, name="portal-probe", daemon=True)
+            self._thread.start()
+        return self
+
+    def _transition(self, state, reason):
+        # Called with the lock held
+        logging.warning(f"Portal circuit breaker {self.state} -> {state}: {reason}")
+        self.state = state
+        self._outcomes.clear()
+        self._probe_failures = 0
+        self._successes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._trials_left = PORTAL_HALF_OPEN_TRIALS
+        breaker_state.set(BREAKER_STATE_VALUES[state])
+
+    def _cooled_down(self):
+        return time.monotonic() - self.opened_at >= PORTAL_BREAKER_COOLDOWN_SECONDS
+
+    def allow_dispatch(self):
+        """Dispatcher admission check; while half-open each True uses up one trial"""
+        with self._lock:
+            if self.state == OPEN and self._last_probe_ok and self._cooled_down():
+                self._transition(HALF_OPEN, "cooldown elapsed")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._trials_left > 0:
+                self._trials_left -= 1
+                return True
+            return False
+
+    def record(self, op, seconds, ok):
+        """Portal step listener: the outcome of one real round trip"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not ok:
+                    self._transition(OPEN, f"trial {op} failed")
+                else:
+                    self._successes += 1
+                    if self._successes >= PORTAL_HALF_OPEN_SUCCESSES:
+                        self._transition(CLOSED, "trial runs succeeded")
+            elif self.state == CLOSED:
+                self._outcomes.append(ok)
+                failures = self._outcomes.count(False)
+                if (len(self._outcomes) >= PORTAL_FAILURE_MIN_SAMPLES
+                        and failures / len(self._outcomes) >= PORTAL_FAILURE_RATE_TO_OPEN):
+                    self._transition(OPEN, f"{failures} of the last {len(self._outcomes)} portal steps failed")
+
+    def record_probe(self, ok):
+        portal_probes.inc(result="ok" if ok else "failed")
+        with self._lock:
+            self._last_probe_ok = ok
+            if ok:
+                self._probe_failures = 0
+                if self.state == OPEN and self._cooled_down():
+                    self._transition(HALF_OPEN, "portal answering again")
+                elif self.state == HALF_OPEN:
+                    self._successes += 1
+                    if self._successes >= PORTAL_HALF_OPEN_SUCCESSES:
+                        self._transition(CLOSED, "trial runs and probes succeeded")
+                return
+            self._probe_failures += 1
+            if self.state == HALF_OPEN:
+                self._transition(OPEN, "probe failed during trial")
+            elif self.state == CLOSED and self._probe_failures >= PORTAL_PROBE_FAILURES_TO_OPEN:
+                self._transition(OPEN, f"{self._probe_failures} consecutive probes failed")
+
+    def _run(self):
+        while True:
+            self.record_probe(self._probe())
+            time.sleep(PORTAL_PROBE_INTERVAL_SECONDS)
+
+
+portal_breaker = PortalCircuitBreaker()
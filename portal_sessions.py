@@ -0,0 +1,189 @@
+# udyam\portal_sessions.py
+
+import os
+import math
+import logging
+import threading
+from collections import deque
+
+from database import RegistrationStage
+from metrics import metrics_registry
+
+
+PORTAL_MIN_SESSIONS = int(os.getenv("PORTAL_MIN_SESSIONS", "1"))
+PORTAL_MAX_SESSIONS = int(os.getenv("PORTAL_MAX_SESSIONS", "8"))
+PORTAL_INITIAL_SESSIONS = int(os.getenv("PORTAL_INITIAL_SESSIONS", "2"))
+# A window whose p90 postback latency or error rate is above these cuts the limit
+PORTAL_LATENCY_TARGET_SECONDS = float(os.getenv("PORTAL_LATENCY_TARGET_SECONDS", "8"))
+PORTAL_ERROR_RATE_THRESHOLD = float(os.getenv("PORTAL_ERROR_RATE_THRESHOLD", "0.1"))
+PORTAL_DECREASE_FACTOR = float(os.getenv("PORTAL_DECREASE_FACTOR", "0.5"))
+# Postbacks judged together before the limit moves
+PORTAL_SAMPLE_WINDOW = int(os.getenv("PORTAL_SAMPLE_WINDOW", "20"))
+# How often a refused admission (e.g. an open circuit breaker) is asked again
+ADMISSION_RETRY_SECONDS = 1.0
+
+# After these the registration's browser is no longer needed
+RELEASE_STAGES = {RegistrationStage.COMPLETED.value, RegistrationStage.ERROR.value,
+                  RegistrationStage.DEADLINE_EXCEEDED.value, RegistrationStage.SESSION_EXPIRED.value}
+
+concurrency_limit = metrics_registry.gauge(
+    "udyam_portal_concurrency_limit", "Portal sessions the adaptive controller currently allows")
+active_sessions = metrics_registry.gauge(
+    "udyam_portal_active_sessions", "Registrations holding an open portal session")
+queued_registrations = metrics_registry.gauge(
+    "udyam_portal_queued_registrations", "Registrations waiting for a portal session")
+
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease limit on concurrent portal sessions.
+
+    Postbacks are judged in windows of `window` samples: a slow p90 or too many failures multiplies
+    the limit by `decrease_factor`; a healthy window in which the limit was actually reached adds one.
+    """
+
+    def __init__(self, min_limit=PORTAL_MIN_SESSIONS, max_limit=PORTAL_MAX_SESSIONS,
+                 initial=PORTAL_INITIAL_SESSIONS, latency_target=PORTAL_LATENCY_TARGET_SECONDS,
+                 error_threshold=PORTAL_ERROR_RATE_THRESHOLD, decrease_factor=PORTAL_DECREASE_FACTOR,
+                 window=PORTAL_SAMPLE_WINDOW):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.decrease_factor = decrease_factor
+        self.window = max(1, window)
+        self._latencies = []
+        self._errors = 0
+        self._saturated = False
+        self._lock = threading.Lock()
+        concurrency_limit.set(self.limit)
+
+    def observe(self, seconds, ok, saturated):
+        """Record one postback; returns the new limit when this sample closed a window that moved it"""
+        with self._lock:
+            self._latencies.append(seconds)
+            self._errors += not ok
+            self._saturated = self._saturated or saturated
+            if len(self._latencies) < self.window:
+                return None
+
+            latencies = sorted(self._latencies)
+            p90 = latencies[int(0.9 * (len(latencies) - 1))]
+            error_rate = self._errors / len(latencies)
+            saturated = self._saturated
+            self._latencies, self._errors, self._saturated = [], 0, False
+
+            previous = self.limit
+            if error_rate > self.error_threshold or p90 > self.latency_target:
+                self.limit = max(self.min_limit, math.floor(self.limit * self.decrease_factor))
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1)
+            if self.limit == previous:
+                return None
+
+        concurrency_limit.set(self.limit)
+        logging.info(f"Portal concurrency limit {previous} -> {self.limit} "
+                     f"(p90 {p90:.2f}s, error rate {error_rate:.0%})")
+        return self.limit
+
+
+class PortalSessionDispatcher:
+    """Starts queued registrations only while fewer than `controller.limit` portal sessions are open.
+
+    A registration holds its slot from dispatch until its browser is released: after the final
+    submission, or on a COMPLETED, ERROR, DEADLINE_EXCEEDED or SESSION_EXPIRED stage event.
+    `on_release(registration_id)` closes the browser.
+    """
+
+    def __init__(self, controller=None, on_release=None, admit=None):
+        self.controller = controller or AimdController()
+        self._on_release = on_release
+        self._admit = admit
+        self._queue = deque()
+        self._active = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def set_release_handler(self, on_release):
+        self._on_release = on_release
+
+    def set_admission(self, admit):
+        """admit() -> bool is asked before each dispatch; queued registrations wait while it says no"""
+        self._admit = admit
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="portal-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, registration_id, target, *args):
+        """Run target(*args) in its own thread once a portal session is free"""
+        with self._condition:
+            self._queue.append((registration_id, target, args))
+            self._update_gauges()
+            self._condition.notify_all()
+
+    def requeue(self, registration_id, target, *args):
+        """Give up the registration's session and put it back at the front of the queue"""
+        self.release(registration_id)
+        with self._condition:
+            self._queue.appendleft((registration_id, target, args))
+            self._update_gauges()
+            self._condition.notify_all()
+
+    def release(self, registration_id):
+        with self._condition:
+            if registration_id in self._active:
+                self._active.discard(registration_id)
+                self._update_gauges()
+                self._condition.notify_all()
+        if self._on_release:
+            try:
+                self._on_release(registration_id)
+            except Exception as e:
+                logging.error(f"Error releasing portal session for {registration_id}: {str(e)}")
+
+    def active_ids(self):
+        """Registrations currently holding a portal session on this node"""
+        with self._condition:
+            return list(self._active)
+
+    def on_stage_event(self, vendor_id, event):
+        if event["stage"] in RELEASE_STAGES:
+            self.release(event["registration_id"])
+
+    def record(self, op, seconds, ok):
+        """Portal step listener: feeds one postback's latency and outcome to the controller"""
+        with self._condition:
+            saturated = bool(self._queue) or len(self._active) >= self.controller.limit
+        if self.controller.observe(seconds, ok, saturated) is not None:
+            with self._condition:
+                self._condition.notify_all()
+
+    def _update_gauges(self):
+        active_sessions.set(len(self._active))
+        queued_registrations.set(len(self._queue))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or len(self._active) >= self.controller.limit:
+                    self._condition.wait()
+                if self._admit and not self._admit():
+                    self._condition.wait(ADMISSION_RETRY_SECONDS)
+                    continue
+                registration_id, target, args = self._queue.popleft()
+                self._active.add(registration_id)
+                self._update_gauges()
+            threading.Thread(target=self._run_job, args=(registration_id, target, args)).start()
+
+    def _run_job(self, registration_id, target, args):
+        try:
+            target(*args)
+        except Exception as e:
+            logging.error(f"Portal job for registration {registration_id} failed: {str(e)}")
+            self.release(registration_id)
+
+
+portal_dispatcher = PortalSessionDispatcher()
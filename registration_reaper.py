@@ -0,0 +1,160 @@
+# udyam\registration_reaper.py
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+
+from database import UdyamRegistration, PortalSession, FormStatus, RegistrationStage, get_db_session
+from stage_events import publish_stage_event
+from db_profiling import profile_scope
+from metrics import metrics_registry
+from session_registry import NODE_ID
+
+
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "True").lower() == "true"
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "60"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "200"))
+# How long a registration may wait on the applicant at each stage before its browser is released
+AWAITING_OTP_SLA_SECONDS = int(os.getenv("AWAITING_OTP_SLA_SECONDS", "900"))
+CAPTCHA_SLA_SECONDS = int(os.getenv("CAPTCHA_SLA_SECONDS", "600"))
+
+# (form_status, current_stage or None for any stage, SLA seconds)
+STAGE_SLAS = (
+    (FormStatus.AWAITING_OTP, None, AWAITING_OTP_SLA_SECONDS),
+    (FormStatus.IN_PROGRESS, RegistrationStage.CAPTCHA_REQUIRED, CAPTCHA_SLA_SECONDS),
+)
+
+expired_registrations = metrics_registry.counter(
+    "udyam_registrations_expired_total", "Registrations whose wait for the applicant outran its SLA", ["stage"])
+
+
+def stale_cutoff(sla_seconds):
+    # last_updated is stamped in UTC, like every other timestamp
+    return datetime.now(timezone.utc) - timedelta(seconds=sla_seconds)
+
+
+def expire_stale_registrations(form_status, stage, sla_seconds, batch_size=REAPER_BATCH_SIZE):
+    """Move registrations waiting longer than sla_seconds to EXPIRED; returns how many were expired.
+
+    Candidates come from idx_status_last_updated. Each row is updated only if it has not moved
+    since it was read, so a submission racing the reaper wins.
+    """
+    session = get_db_session()
+    expired = []
+    try:
+        query = session.query(
+            UdyamRegistration.id,
+            UdyamRegistration.vendor_id,
+            UdyamRegistration.current_stage,
+            UdyamRegistration.last_updated,
+            UdyamRegistration.stage_details
+        ).outerjoin(
+            PortalSession, PortalSession.registration_id == UdyamRegistration.id
+        ).filter(
+            UdyamRegistration.form_status == form_status,
+            UdyamRegistration.last_updated < stale_cutoff(sla_seconds),
+            # Each node expires the sessions its own browsers hold, so the release happens where the browser is
+            or_(PortalSession.node_id.is_(None), PortalSession.node_id == NODE_ID)
+        )
+        if stage:
+            query = query.filter(UdyamRegistration.current_stage == stage)
+
+        for row in query.order_by(UdyamRegistration.last_updated).limit(batch_size).all():
+            details = {
+                "expired_stage": row.current_stage.value,
+                "expired_status": form_status.value,
+                "sla_seconds": sla_seconds,
+                "resumable": True,
+            }
+            updated = session.query(UdyamRegistration).filter(
+                UdyamRegistration.id == row.id,
+                UdyamRegistration.form_status == form_status,
+                UdyamRegistration.last_updated == row.last_updated
+            ).update({
+                "form_status": FormStatus.EXPIRED,
+                "current_stage": RegistrationStage.SESSION_EXPIRED,
+                "stage_details": {**(row.stage_details or {}), RegistrationStage.SESSION_EXPIRED.value: details},
+                "error_message": f"No response at {row.current_stage.value} within {sla_seconds}s; "
+                                 f"retry to resume the registration",
+                "last_updated": datetime.now(timezone.utc),
+            }, synchronize_session=False)
+            if updated:
+                expired.append(row)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error expiring registrations awaiting {form_status.value}: {str(e)}")
+        return 0
+    finally:
+        session.close()
+
+    for row in expired:
+        expired_registrations.inc(stage=row.current_stage.value)
+        logging.info(f"Registration {row.id} expired at {row.current_stage.value} after {sla_seconds}s")
+        # Subscribers release the registration's portal session
+        publish_stage_event(row.vendor_id, row.id, RegistrationStage.SESSION_EXPIRED, FormStatus.EXPIRED,
+                            f"No response at {row.current_stage.value} within {sla_seconds}s")
+    return len(expired)
+
+
+def expired_elsewhere(registration_ids):
+    """Of registration_ids, the ones already EXPIRED, e.g. by a node that could not reach this one"""
+    if not registration_ids:
+        return []
+    session = get_db_session()
+    try:
+        return [row.id for row in session.query(UdyamRegistration.id).filter(
+            UdyamRegistration.id.in_(registration_ids),
+            UdyamRegistration.form_status == FormStatus.EXPIRED
+        )]
+    finally:
+        session.close()
+
+
+class RegistrationReaper:
+    """Periodically expires registrations stuck waiting on the applicant, per STAGE_SLAS, and releases
+    local portal sessions whose registration was expired by another node"""
+
+    def __init__(self, interval=REAPER_INTERVAL_SECONDS):
+        self.interval = interval
+        self._active_ids = None
+        self._release = None
+        self._thread = None
+
+    def set_local_sessions(self, active_ids, release):
+        """active_ids() lists the registrations holding a browser on this node; release(id) frees one"""
+        self._active_ids = active_ids
+        self._release = release
+
+    def start(self):
+        if self._thread is None and REAPER_ENABLED:
+            self._thread = threading.Thread(target=self._run, name="registration-reaper", daemon=True)
+            self._thread.start()
+        return self
+
+    def reap(self):
+        with profile_scope("job", "reap_stale_registrations"):
+            expired = sum(expire_stale_registrations(form_status, stage, sla_seconds)
+                          for form_status, stage, sla_seconds in STAGE_SLAS)
+            if self._active_ids:
+                # Expiring a lost session on another node cannot reach this node's stage event subscribers
+                for registration_id in expired_elsewhere(self._active_ids()):
+                    logging.warning(f"Releasing portal session of registration {registration_id}, "
+                                    f"which another node expired")
+                    self._release(registration_id)
+            return expired
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reap()
+            except Exception as e:
+                logging.error(f"Registration reaper failed: {str(e)}")
+
+
+registration_reaper = RegistrationReaper()
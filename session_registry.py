@@ -0,0 +1,115 @@
+# udyam\session_registry.py
+
+import os
+import socket
+import logging
+from datetime import datetime, timezone
+
+import requests
+
+from database import PortalSession, UdyamRegistration, get_db_session
+from metrics import metrics_registry
+
+
+# One app process per node: portal sessions, the dispatcher and its browsers all live in that process
+NODE_ID = os.getenv("NODE_ID", socket.gethostname())
+# Base URL the other nodes reach this one at, e.g. http://10.0.0.12:2000
+NODE_URL = os.getenv("NODE_URL")
+SESSION_FORWARD_TIMEOUT_SECONDS = float(os.getenv("SESSION_FORWARD_TIMEOUT_SECONDS", "120"))
+# Set on forwarded requests so the owning node handles them itself
+FORWARDED_HEADER = "X-Udyam-Forwarded-By"
+
+session_forwards = metrics_registry.counter(
+    "udyam_session_forwards_total", "OTP/CAPTCHA requests forwarded to the node holding the session", ["result"])
+
+
+def claim_session(registration_id):
+    """Record this node as the holder of the registration's portal session"""
+    session = get_db_session()
+    try:
+        session.merge(PortalSession(registration_id=registration_id, node_id=NODE_ID, node_url=NODE_URL,
+                                    claimed_at=datetime.now(timezone.utc)))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error claiming portal session for {registration_id}: {str(e)}")
+    finally:
+        session.close()
+
+
+def release_session(registration_id, node_id=NODE_ID):
+    """Drop the registry entry, but only while node_id still holds it; a later claim elsewhere wins"""
+    session = get_db_session()
+    try:
+        session.query(PortalSession).filter_by(registration_id=registration_id, node_id=node_id).delete(
+            synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error releasing portal session for {registration_id}: {str(e)}")
+    finally:
+        session.close()
+
+
+def release_node_sessions(node_id=NODE_ID):
+    """Forget every session node_id held, e.g. at startup, when its browsers died with the previous process"""
+    session = get_db_session()
+    try:
+        released = session.query(PortalSession).filter_by(node_id=node_id).delete(synchronize_session=False)
+        session.commit()
+        if released:
+            logging.warning(f"Released {released} portal sessions left over from a previous run of {node_id}")
+        return released
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error releasing portal sessions of {node_id}: {str(e)}")
+        return 0
+    finally:
+        session.close()
+
+
+def session_owner(registration_id, vendor_id):
+    """(node_id, node_url) of the node holding the vendor's registration session, or None"""
+    session = get_db_session()
+    try:
+        return session.query(PortalSession.node_id, PortalSession.node_url).join(
+            UdyamRegistration, UdyamRegistration.id == PortalSession.registration_id
+        ).filter(
+            PortalSession.registration_id == registration_id,
+            UdyamRegistration.vendor_id == vendor_id
+        ).first()
+    finally:
+        session.close()
+
+
+def forward_request(node_url, flask_request):
+    """Replay an incoming API request on node_url; raises requests.ConnectionError if the node is unreachable
+    and requests.Timeout if it did not answer in time"""
+    headers = {
+        "X-API-Key": flask_request.headers.get("X-API-Key"),
+        # Keeps URLs the owner builds on the public host
+        "Host": flask_request.host,
+        FORWARDED_HEADER: NODE_ID,
+    }
+    if flask_request.content_type:
+        headers["Content-Type"] = flask_request.content_type
+    try:
+        response = requests.request(
+            flask_request.method,
+            node_url.rstrip("/") + flask_request.full_path.rstrip("?"),
+            data=flask_request.get_data(),
+            headers=headers,
+            timeout=SESSION_FORWARD_TIMEOUT_SECONDS
+        )
+    except requests.Timeout:
+        # Checked first: a connect timeout is a ConnectionError too, but may only mean a busy node
+        session_forwards.inc(result="timeout")
+        raise
+    except requests.ConnectionError:
+        session_forwards.inc(result="unreachable")
+        raise
+    except requests.RequestException:
+        session_forwards.inc(result="error")
+        raise
+    session_forwards.inc(result="forwarded")
+    return response
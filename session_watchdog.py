@@ -0,0 +1,83 @@
+# udyam\session_watchdog.py
+
+import os
+import time
+import logging
+import threading
+
+from metrics import metrics_registry
+
+
+WATCHDOG_INTERVAL_SECONDS = float(os.getenv("WATCHDOG_INTERVAL_SECONDS", "5"))
+# Slack on top of a step's own timeout before its session counts as hung
+WATCHDOG_GRACE_SECONDS = float(os.getenv("WATCHDOG_GRACE_SECONDS", "60"))
+
+hung_sessions = metrics_registry.counter(
+    "udyam_portal_hung_sessions_total", "Portal sessions killed by the watchdog, by the step they hung in", ["op"])
+
+
+class SessionWatchdog:
+    """Tracks a heartbeat per portal session and expires sessions stuck past their step's deadline.
+
+    The automation beats before every step with that step's timeout. `on_expire(registration_id, op,
+    label)` is expected to kill the browser (which unblocks the stuck WebDriver call) and free the slot.
+    """
+
+    def __init__(self, on_expire=None):
+        self._on_expire = on_expire
+        self._heartbeats = {}
+        self._expired = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def set_expiry_handler(self, on_expire):
+        self._on_expire = on_expire
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def beat(self, registration_id, op, label, timeout):
+        deadline = time.monotonic() + timeout + WATCHDOG_GRACE_SECONDS
+        with self._lock:
+            self._heartbeats[registration_id] = (deadline, op, label, threading.get_ident())
+
+    def clear(self, registration_id):
+        """The calling thread is done with the session; a run that replaced it keeps its heartbeat"""
+        with self._lock:
+            heartbeat = self._heartbeats.get(registration_id)
+            if heartbeat and heartbeat[3] == threading.get_ident():
+                del self._heartbeats[registration_id]
+
+    def pop_expired(self, registration_id):
+        """The label of the step this thread was killed in, if the watchdog expired its session"""
+        with self._lock:
+            return self._expired.pop((registration_id, threading.get_ident()), None)
+
+    def check(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [(registration_id, heartbeat) for registration_id, heartbeat in self._heartbeats.items()
+                       if heartbeat[0] < now]
+            for registration_id, (_, _, label, thread_id) in expired:
+                del self._heartbeats[registration_id]
+                self._expired[(registration_id, thread_id)] = label
+
+        for registration_id, (_, op, label, _) in expired:
+            logging.warning(f"Portal session for registration {registration_id} hung at {label}; expiring it")
+            hung_sessions.inc(op=op)
+            if self._on_expire:
+                try:
+                    self._on_expire(registration_id, op, label)
+                except Exception as e:
+                    logging.error(f"Error expiring hung session {registration_id}: {str(e)}")
+
+    def _run(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL_SECONDS)
+            self.check()
+
+
+session_watchdog = SessionWatchdog()
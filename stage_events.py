@@ -0,0 +1,88 @@
+# udyam\stage_events.py
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+
+STAGE_EVENT_BUFFER_SIZE = int(os.getenv("STAGE_EVENT_BUFFER_SIZE", "1000"))
+
+
+class StageEventBus:
+    """In-process fan-out of registration stage transitions, buffered per vendor for resume"""
+
+    def __init__(self, buffer_size=STAGE_EVENT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._condition = threading.Condition()
+        self._buffers = {}
+        self._evicted_upto = {}
+        self._subscribers = []
+        # Ids are microsecond timestamps so they keep increasing across restarts
+        self._last_id = time.time_ns() // 1000
+        self.boot_id = self._last_id
+
+    def _next_id(self):
+        self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+        return self._last_id
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, vendor_id, registration_id, stage, form_status=None, error=None):
+        with self._condition:
+            event = {
+                "id": self._next_id(),
+                "registration_id": registration_id,
+                "stage": stage.value,
+                "form_status": form_status.value if form_status else None,
+                "error_message": error,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            buffer = self._buffers.setdefault(vendor_id, deque())
+            buffer.append(event)
+            if len(buffer) > self.buffer_size:
+                self._evicted_upto[vendor_id] = buffer.popleft()["id"]
+            self._condition.notify_all()
+
+        for callback in self._subscribers:
+            try:
+                callback(vendor_id, event)
+            except Exception as e:
+                logging.error(f"Stage event subscriber failed: {str(e)}")
+        return event
+
+    def latest_id(self, vendor_id):
+        with self._condition:
+            buffer = self._buffers.get(vendor_id)
+            return buffer[-1]["id"] if buffer else self._last_id
+
+    def events_since(self, vendor_id, last_event_id):
+        """Return (events, missed); missed means events after last_event_id were already dropped"""
+        with self._condition:
+            buffer = self._buffers.get(vendor_id, ())
+            missed = last_event_id < max(self._evicted_upto.get(vendor_id, 0), self.boot_id)
+            return [event for event in buffer if event["id"] > last_event_id], missed
+
+    def wait_for_events(self, vendor_id, last_event_id, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events, missed = self.events_since(vendor_id, last_event_id)
+                remaining = deadline - time.monotonic()
+                if events or missed or remaining <= 0:
+                    return events, missed
+                self._condition.wait(remaining)
+
+
+stage_event_bus = StageEventBus()
+
+
+def publish_stage_event(vendor_id, registration_id, stage, form_status=None, error=None):
+    try:
+        return stage_event_bus.publish(vendor_id, registration_id, stage, form_status, error)
+    except Exception as e:
+        logging.error(f"Error publishing stage event for {registration_id}: {str(e)}")
+        return None
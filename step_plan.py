@@ -0,0 +1,253 @@
+# udyam\step_plan.py
+
+import enum
+import json
+import argparse
+from datetime import datetime
+
+from database import RegistrationStage
+
+
+# Bump when the meaning of an operation changes; stored plans of an older version are recompiled
+PLAN_VERSION = 2
+
+SOCIAL_CATEGORY_OPTIONS = {"General": 0, "SC": 1, "ST": 2, "OBC": 3}
+GENDER_OPTIONS = {"M": 0, "F": 1, "O": 2}
+ADDRESS_FIELDS = ("premises_number", "building_name", "village_town", "block", "road_street_lane", "city", "pincode")
+ADDITIONAL_REGISTRATION_NO_BUTTONS = ("gem_no", "treds_no", "ncs_no", "nsic_no", "nixi_no", "sid_no")
+
+
+class PlanStepError(Exception):
+    """A plan step failed at `index`; a resumed run starts from the last checkpoint before it"""
+
+    def __init__(self, index, step_data, cause):
+        super().__init__(f"Step {index} ({step_label(step_data)}) failed: {cause}")
+        self.index = index
+        self.step = step_data
+
+
+def enum_value(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def portal_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%d/%m/%Y")
+
+
+def step(op, page=None, name=None, **fields):
+    compiled = {"op": op}
+    if page:
+        compiled["page"] = page
+    if name:
+        compiled["name"] = name
+    compiled.update(fields)
+    return compiled
+
+
+def once(op, page=None, name=None, **fields):
+    """A step that must not run twice (it adds a row or submits a page on the portal); the interpreter moves the resume point past it"""
+    return step(op, page, name, once=True, **fields)
+
+
+def stage(registration_stage, details=None):
+    """A checkpoint: the interpreter records the stage and the plan position, so a run can resume after it"""
+    return step("stage", stage=registration_stage.value, details=details or {})
+
+
+def compile_pan_steps(registration):
+    pan_data = {
+        "pan": registration["pan"],
+        "pan_name": registration["pan_name"],
+        "dob": registration["dob"],
+        "have_gstin": registration["have_gstin"],
+    }
+    dob = portal_date(registration["dob"])
+    gstin_option = registration.get("have_gstin") or "Exempted"
+    return [
+        stage(RegistrationStage.PAN_DATA_FILLING, pan_data),
+        step("wait", "pan", "org_type", timeout=30),
+        step("select", "pan", "org_type", text="Proprietary"),
+        stage(RegistrationStage.PAN_SELECT_BOX_DONE, {"org_type": "Proprietary"}),
+        step("sleep", seconds=5),
+        step("fill", "pan", values={"pan": registration["pan"], "pan_name": registration["pan_name"], "dob": dob},
+             timeout=30),
+        stage(RegistrationStage.PAN_NUMBER_ADDED, {"pan": registration["pan"]}),
+        stage(RegistrationStage.PAN_NAME_ADDED, {"pan_name": registration["pan_name"]}),
+        stage(RegistrationStage.PAN_DATE_ADDED, {"dob": dob}),
+        step("wait_gone", "pan", "preloader", timeout=30),
+        step("click", "pan", "declaration", timeout=10),
+        stage(RegistrationStage.PAN_CHECKBOX_CHECKED),
+        step("sleep", seconds=5),
+        step("click", "pan", "validate_pan", timeout=30),
+        stage(RegistrationStage.PAN_BUTTON_CLICKED),
+        step("sleep", seconds=10),
+        step("click", "pan", "get_pan_data", timeout=30),
+        step("wait", "pan", "gstin_options", timeout=30),
+        # Anything other than Yes is entered as Exempted, as the portal flow always has
+        step("click", "pan", "gstin", args=[0 if gstin_option == "Yes" else 2], timeout=10),
+        stage(RegistrationStage.GST_BTN_CLICKABLE, {"gstin_option": gstin_option}),
+        step("wait", "pan", "mobile", timeout=30),
+        stage(RegistrationStage.PAN_SUBMITTED, {"pan_data": pan_data}),
+    ]
+
+
+def compile_form_steps(registration):
+    resolved = registration.get("resolved_options") or {}
+    major_activity = registration.get("major_activity") or "Manufacturing"
+    services = major_activity != "Manufacturing"
+    steps = [
+        step("fill", "form", values={"mobile": registration["mobile"], "email": registration["email"]}, timeout=30),
+        step("click", "form", "social_category",
+             args=[SOCIAL_CATEGORY_OPTIONS.get(enum_value(registration["social_category"]), 0)], timeout=10),
+        step("click", "form", "gender", args=[GENDER_OPTIONS.get(enum_value(registration["gender"]), 0)], timeout=10),
+        step("click", "form", "specially_abled", args=[0 if registration.get("specially_abled") else 1], timeout=10),
+        step("fill", "form", values={
+            "enterprise_name": registration.get("enterprise_name") or registration["pan_name"],
+            "unit_name": registration.get("unit_name") or registration["pan_name"],
+        }, timeout=30),
+        once("click", "form", "add_unit", timeout=10),
+        step("sleep", seconds=2),
+        step("select_index", "form", "unit", index=1),
+        step("fill", "form", values={key: registration[key] for key in ADDRESS_FIELDS}),
+        step("select", "form", "state", text=registration["state"], value=resolved.get("state_value"), timeout=10),
+        step("wait", "form", "district_loaded", timeout=10),
+        step("select", "form", "district", text=registration["district"], value=resolved.get("district_value")),
+        once("click", "form", "add_plant", timeout=10),
+        step("sleep", seconds=4),
+        # The official address is entered as the plant address
+        step("fill", "form", values={f"official_{key}": registration[key] for key in ADDRESS_FIELDS}),
+        step("select", "form", "official_state", text=registration["state"], value=resolved.get("state_value"),
+             timeout=10),
+        step("wait", "form", "official_district_loaded", timeout=10),
+        step("select", "form", "official_district", text=registration["district"],
+             value=resolved.get("district_value")),
+        step("coordinates", coordinates=resolved.get("coordinates")),
+        step("fill", "form", values={
+            "date_of_incorporation": portal_date(registration["date_of_incorporation"]),
+            "date_of_commencement": portal_date(registration.get("date_of_commencement")
+                                                or registration["date_of_incorporation"]),
+            "bank_name": registration["bank_name"],
+            "account_number": registration["account_number"],
+            "ifsc_code": registration["ifsc_code"],
+        }),
+        step("click", "form", "major_activity", args=[1 if services else 0], timeout=10),
+    ]
+    if services:
+        # second_form_section is the 1-based sub-category (validated at ingest); without it, Trading
+        # goes under Trading and everything else under Non-Trading
+        default_section = 2 if major_activity == "Trading" else 1
+        sub_activity = int(registration.get("second_form_section") or default_section) - 1
+        steps += [
+            step("wait", "form", "sub_activity_panel", timeout=10),
+            step("click", "form", "sub_activity", args=[sub_activity], timeout=10),
+        ]
+    steps += [
+        step("sleep", seconds=7),
+        stage(RegistrationStage.BASIC_DETAILS_FILLED, {
+            "enterprise_name": registration.get("enterprise_name"),
+            "district": registration["district"],
+            "major_activity": major_activity,
+        }),
+    ]
+    return steps
+
+
+def compile_additional_steps(registration):
+    resolved = registration.get("resolved_options") or {}
+    nic_codes = registration.get("nic_codes") or []
+    steps = []
+    if nic_codes:
+        steps.append(step("click", "additional", "nic_category", args=[nic_codes[0]["category"]], optional=True))
+    for nic_code in nic_codes:
+        # Codes were validated against the local catalogue at ingest, so each level is set directly
+        # and the interpreter only waits for the dependent list to carry the next code
+        steps += [
+            step("nic", level=2, code=nic_code["2_digit"], dependent_level=4, dependent_code=nic_code["4_digit"]),
+            step("nic", level=4, code=nic_code["4_digit"], dependent_level=5, dependent_code=nic_code["5_digit"]),
+            step("nic", level=5, code=nic_code["5_digit"]),
+            once("click", "additional", "add_activity", timeout=30),
+            step("postback"),
+        ]
+    steps += [
+        # Fields the portal disabled (e.g. WDV for some activities) are left as they are
+        step("fill", "additional", values={
+            "male_employees": registration.get("male_employees", 0),
+            "female_employees": registration.get("female_employees", 0),
+            "other_employees": registration.get("other_employees", 0),
+            "investment_wdv": registration.get("investment_wdv", 5000000),
+            "investment_exclusion_cost": registration.get("investment_exclusion_cost", 200000),
+            "total_turnover": registration.get("total_turnover", 0),
+        }, optional=True),
+    ]
+    steps += [step("click", "additional", button, script=True, timeout=1, optional=True)
+              for button in ADDITIONAL_REGISTRATION_NO_BUTTONS]
+    steps += [
+        step("select", "additional", "dic", text=resolved.get("dic", registration["district"]),
+             value=resolved.get("dic_value"), optional=True),
+        stage(RegistrationStage.ADDITIONAL_DETAILS_FILLED, {"nic_codes": nic_codes}),
+        once("click", "additional", "submit"),
+        step("accept_alert", timeout=20, optional=True),
+        step("sleep", seconds=50),
+        step("capture", "additional", "captcha_image", attribute="src", output="captcha_url", timeout=30),
+    ]
+    return steps
+
+
+def compile_registration_plan(registration):
+    """Turn a validated registration (a dict of UdyamRegistration fields) into the ordered portal actions
+    that take it from the OTP-verified page to the final CAPTCHA"""
+    return {
+        "version": PLAN_VERSION,
+        "steps": compile_pan_steps(registration) + compile_form_steps(registration)
+                 + compile_additional_steps(registration),
+    }
+
+
+def plan_steps(registration):
+    """The stored plan's steps, recompiling when it is missing or from an older PLAN_VERSION"""
+    plan = registration.get("step_plan")
+    if not plan or plan.get("version") != PLAN_VERSION:
+        plan = compile_registration_plan(registration)
+    return plan["steps"]
+
+
+def step_target(step_data):
+    return ".".join(part for part in (step_data.get("page"), step_data.get("name")) if part)
+
+
+def step_label(step_data):
+    return f"{step_data['op']} {step_target(step_data)}".rstrip()
+
+
+def describe_step(step_data):
+    details = {key: value for key, value in step_data.items() if key not in ("op", "page", "name")}
+    return (f"{step_data['op']:<13} {step_target(step_data):<34} "
+            f"{json.dumps(details, default=str) if details else ''}").rstrip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect compiled registration step plans")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show_parser = subparsers.add_parser("show", help="Print a stored registration's plan")
+    show_parser.add_argument("registration_id")
+    compile_parser = subparsers.add_parser("compile", help="Compile a registration JSON file as stored at ingest")
+    compile_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        from dataclasses import asdict
+        from database import load_registration_snapshot
+        snapshot = load_registration_snapshot(args.registration_id)
+        if snapshot is None:
+            parser.error(f"Registration not found: {args.registration_id}")
+        registration = asdict(snapshot)
+        steps = plan_steps(registration)
+        position = registration.get("plan_position") or 0
+    else:
+        with open(args.path) as f:
+            steps = compile_registration_plan(json.load(f))["steps"]
+        position = 0
+
+    for index, step_data in enumerate(steps):
+        marker = ">" if index == position else " "
+        print(f"{marker}{index:4d}  {describe_step(step_data)}")
@@ -0,0 +1,85 @@
+# udyam\tests\conftest.py
+
+import os
+import sys
+import uuid
+import tempfile
+
+import pytest
+
+# The app wires its background workers at import time; keep the ones that reach out of the process off
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='udyam-test-'), 'test.db')}")
+os.environ.setdefault("PORTAL_PROBE_ENABLED", "False")
+os.environ.setdefault("REAPER_ENABLED", "False")
+os.environ.setdefault("WEBHOOKS_ENABLED", "False")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REGISTRATION = {
+    "aadhaar": "234567890124", "name": "John Doe", "pan": "ABCPE1234F", "pan_name": "John Doe",
+    "dob": "1990-01-01", "mobile": "9876543210", "email": "john@example.com", "social_category": "General",
+    "gender": "M", "specially_abled": False, "enterprise_name": "John's Enterprise", "unit_name": "Main Unit",
+    "premises_number": "123", "building_name": "Business Tower", "village_town": "Sample Town",
+    "block": "Block A", "road_street_lane": "Main Street", "city": "Sample City", "state": "Karnataka",
+    "district": "Bengaluru Urban", "pincode": "560001", "official_premises_number": "123",
+    "official_address": "123 Business Tower, Main Street", "official_town": "Sample Town",
+    "official_block": "Block A", "official_lane": "Main Street", "official_city": "Sample City",
+    "official_state": "Karnataka", "official_district": "Bengaluru Urban", "official_pincode": "560001",
+    "date_of_incorporation": "2022-01-01", "date_of_commencement": "2022-01-01",
+    "bank_name": "State Bank of India", "account_number": "1234567890", "ifsc_code": "SBIN0123456",
+    "major_activity": "Manufacturing",
+    "nic_codes": [{"category": "Manufacturing", "2_digit": "10", "4_digit": "1010", "5_digit": "10101"}],
+    "male_employees": 5, "female_employees": 3, "other_employees": 0, "investment_wdv": 500000,
+    "investment_exclusion_cost": 200000, "total_turnover": 1000000, "export_turnover": 200000,
+    "have_gstin": "No",
+}
+
+
+@pytest.fixture
+def registration_data():
+    return dict(REGISTRATION)
+
+
+@pytest.fixture
+def vendor():
+    from database import Vendor, get_db_session
+
+    session = get_db_session()
+    try:
+        vendor = Vendor(name="Test Vendor", email=f"vendor-{uuid.uuid4().hex[:8]}@example.com")
+        vendor.generate_api_key()
+        session.add(vendor)
+        session.commit()
+        return {"id": vendor.id, "api_key": vendor.api_key}
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_registration(vendor):
+    """Insert a registration for the test vendor straight into the database and return its id"""
+    from database import UdyamRegistration, FormStatus, RegistrationStage, Gender, SocialCategory, get_db_session
+
+    def make(**overrides):
+        row = dict(REGISTRATION, social_category=SocialCategory.GENERAL, gender=Gender.MALE,
+                   form_status=FormStatus.AWAITING_OTP, current_stage=RegistrationStage.OTP_REQUESTED,
+                   resolved_options={}, stage_details={})
+        row.update(overrides)
+        session = get_db_session()
+        try:
+            registration = UdyamRegistration(vendor_id=vendor["id"], **row)
+            session.add(registration)
+            session.commit()
+            return registration.id
+        finally:
+            session.close()
+
+    return make
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
@@ -0,0 +1,44 @@
+# udyam\tests\test_bulk_status.py
+
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture
+def local_clock_behind_utc(monkeypatch):
+    """Run with a local clock five hours behind UTC"""
+    monkeypatch.setenv("TZ", "EST+05")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def bulk_status(client, vendor, **body):
+    response = client.post("/api/udyam/bulk_status", json=body, headers={"X-API-Key": vendor["api_key"]})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_changed_since_sees_updates_when_local_clock_is_not_utc(client, vendor, make_registration,
+                                                                 local_clock_behind_utc):
+    from app import update_registration_stage
+    from database import RegistrationStage
+
+    registration_id = make_registration()
+    cursor = bulk_status(client, vendor, changed_since="2000-01-01T00:00:00Z")["server_time"]
+
+    update_registration_stage(registration_id, RegistrationStage.OTP_VERIFIED)
+
+    changed = bulk_status(client, vendor, changed_since=cursor)["registrations"]
+    assert [item["registration_id"] for item in changed] == [registration_id]
+
+
+def test_changed_since_skips_rows_untouched_since_the_cursor(client, vendor, make_registration,
+                                                             local_clock_behind_utc):
+    make_registration()
+    cursor = bulk_status(client, vendor, changed_since="2000-01-01T00:00:00Z")["server_time"]
+
+    assert bulk_status(client, vendor, changed_since=cursor)["registrations"] == []
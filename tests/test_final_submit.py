@@ -0,0 +1,41 @@
+# udyam\tests\test_final_submit.py
+
+import pytest
+
+from database import FormStatus, RegistrationStage
+
+
+def submit_final(client, vendor, registration_id):
+    return client.post("/api/udyam/submit_otp_and_captcha", headers={"X-API-Key": vendor["api_key"]},
+                       json={"registration_id": registration_id, "otp": "123456", "captcha": "AB12C"})
+
+
+def test_expired_registration_is_rejected_before_the_portal(client, vendor, make_registration, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "submit_otp_and_captcha",
+                        lambda *args, **kwargs: pytest.fail("the portal was called for a finished registration"))
+    registration_id = make_registration(form_status=FormStatus.ERROR, current_stage=RegistrationStage.ERROR)
+
+    response = submit_final(client, vendor, registration_id)
+
+    assert response.status_code == 409
+
+
+def test_portal_outcome_does_not_overwrite_a_reaped_registration(client, vendor, make_registration, monkeypatch):
+    import app
+    from app import load_registration_snapshot
+
+    registration_id = make_registration(form_status=FormStatus.IN_PROGRESS,
+                                        current_stage=RegistrationStage.CAPTCHA_REQUIRED)
+
+    def reaped_while_submitting(otp, captcha, registration_id, deadline_at=None):
+        app.update_registration_stage(registration_id, RegistrationStage.ERROR, error="Expired",
+                                      form_status=FormStatus.ERROR)
+        return {"status": "success", "message": "Registration submitted"}
+
+    monkeypatch.setattr(app, "submit_otp_and_captcha", reaped_while_submitting)
+
+    assert submit_final(client, vendor, registration_id).status_code == 200
+    assert load_registration_snapshot(registration_id).form_status == FormStatus.ERROR
+
@@ -0,0 +1,57 @@
+# udyam\tests\test_plan_resume.py
+
+import pytest
+
+from database import FormStatus, RegistrationStage
+
+
+@pytest.fixture
+def portal(monkeypatch):
+    """Stand in for the browser: record each step the interpreter runs and fail once where asked"""
+    import app
+    import automate_form
+
+    calls = []
+    failures = set()
+
+    def run_plan_step(driver, pages, step, outputs):
+        calls.append((step["op"], step.get("name")))
+        if (step["op"], step.get("name")) in failures:
+            failures.discard((step["op"], step.get("name")))
+            raise RuntimeError("element went stale")
+        if step["op"] == "capture":
+            outputs[step["output"]] = "data:image/png;base64,captcha"
+
+    monkeypatch.setattr(automate_form, "get_driver", lambda registration_id: object())
+    monkeypatch.setattr(automate_form, "run_plan_step", run_plan_step)
+    monkeypatch.setattr(app, "driver_alive", lambda registration_id: True)
+    return calls, failures
+
+
+def test_resume_does_not_repeat_add_unit(portal, make_registration):
+    from app import continue_registration_after_otp, load_registration_snapshot
+
+    calls, failures = portal
+    # The step right after add_unit fails, so the resume point must already be past the click
+    failures.add(("select_index", "unit"))
+    registration_id = make_registration(form_status=FormStatus.OTP_VERIFIED)
+
+    continue_registration_after_otp(registration_id)
+
+    assert calls.count(("click", "add_unit")) == 1
+    assert calls.count(("select_index", "unit")) == 2
+    registration = load_registration_snapshot(registration_id)
+    assert registration.stage_details[RegistrationStage.CAPTCHA_REQUIRED.value]["captcha_url"]
+
+
+def test_resume_does_not_repeat_add_activity(portal, make_registration):
+    from app import continue_registration_after_otp
+
+    calls, failures = portal
+    failures.add(("postback", None))
+    registration_id = make_registration(form_status=FormStatus.OTP_VERIFIED)
+
+    continue_registration_after_otp(registration_id)
+
+    assert calls.count(("click", "add_activity")) == 1
+    assert calls.count(("click", "add_unit")) == 1
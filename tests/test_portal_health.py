@@ -0,0 +1,37 @@
+# udyam\tests\test_portal_health.py
+
+import time
+
+import pytest
+
+from portal_health import (PortalCircuitBreaker, CLOSED, HALF_OPEN, OPEN, PORTAL_BREAKER_COOLDOWN_SECONDS,
+                           PORTAL_FAILURE_MIN_SAMPLES, PORTAL_HALF_OPEN_SUCCESSES)
+
+
+@pytest.fixture
+def half_open_breaker():
+    """A breaker that opened on failed round trips, has cooled down and has admitted one trial"""
+    breaker = PortalCircuitBreaker(probe=lambda: True)
+    for _ in range(PORTAL_FAILURE_MIN_SAMPLES):
+        breaker.record("submit_aadhaar", 1.0, False)
+    assert breaker.state == OPEN
+    breaker.opened_at = time.monotonic() - PORTAL_BREAKER_COOLDOWN_SECONDS - 1
+    assert breaker.allow_dispatch()
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_trial_parked_at_otp_still_lets_the_breaker_close(half_open_breaker):
+    # The trial's Aadhaar round trip succeeds, then it waits for the applicant's OTP
+    half_open_breaker.record("submit_aadhaar", 1.0, True)
+    for _ in range(PORTAL_HALF_OPEN_SUCCESSES):
+        half_open_breaker.record_probe(True)
+    assert half_open_breaker.state == CLOSED
+    assert half_open_breaker.allow_dispatch()
+
+
+def test_failed_trial_opens_the_breaker_again(half_open_breaker):
+    half_open_breaker.record("submit_aadhaar", 1.0, False)
+    assert half_open_breaker.state == OPEN
+    half_open_breaker.record_probe(True)
+    assert not half_open_breaker.allow_dispatch()
@@ -0,0 +1,22 @@
+# udyam\tests\test_step_plan.py
+
+import pytest
+
+from step_plan import compile_form_steps
+
+
+def activity_clicks(registration):
+    steps = compile_form_steps(registration)
+    return {step["name"]: step["args"][0] for step in steps
+            if step["op"] == "click" and step.get("name") in ("major_activity", "sub_activity")}
+
+
+@pytest.mark.parametrize("major_activity, second_form_section, expected", [
+    ("Manufacturing", None, {"major_activity": 0}),
+    ("Services", None, {"major_activity": 1, "sub_activity": 0}),
+    ("Services", "2", {"major_activity": 1, "sub_activity": 1}),
+    ("Trading", None, {"major_activity": 1, "sub_activity": 1}),
+])
+def test_major_activity_maps_to_portal_options(registration_data, major_activity, second_form_section, expected):
+    registration_data.update({"major_activity": major_activity, "second_form_section": second_form_section})
+    assert activity_clicks(registration_data) == expected
@@ -0,0 +1,51 @@
+# udyam\tests\test_validators.py
+
+from validators import validate_registrations
+
+
+def errors_for(item):
+    return validate_registrations([item]).get(0, [])
+
+
+def test_valid_registration_passes(registration_data):
+    assert errors_for(registration_data) == []
+
+
+def test_deadline_is_not_accepted_from_clients(registration_data):
+    registration_data["deadline_at"] = "2099-01-01T00:00:00"
+    assert "deadline_at is not a registration field" in errors_for(registration_data)
+
+
+def test_fractional_employee_count_is_rejected(registration_data):
+    registration_data["male_employees"] = 3.7
+    assert "male_employees must be a whole number between 0 and 1e+06" in errors_for(registration_data)
+
+
+def test_integral_float_employee_count_is_accepted(registration_data):
+    registration_data["male_employees"] = 3.0
+    assert errors_for(registration_data) == []
+
+
+def test_diu_pincode_matches_its_union_territory(registration_data):
+    for prefix in ("", "official_"):
+        registration_data.update({f"{prefix}state": "Daman and Diu", f"{prefix}district": "Diu",
+                                  f"{prefix}pincode": "362520"})
+    assert errors_for(registration_data) == []
+
+
+def test_daman_pincode_still_matches(registration_data):
+    registration_data.update({"state": "Dadra and Nagar Haveli", "district": "Dadra and Nagar Haveli",
+                              "pincode": "396230"})
+    assert errors_for(registration_data) == []
+
+
+def test_unknown_major_activity_is_rejected(registration_data):
+    registration_data["major_activity"] = "Mfg"
+    assert "major_activity must be one of Manufacturing, Services, Trading" in errors_for(registration_data)
+
+
+def test_second_form_section_must_be_a_services_sub_category(registration_data):
+    registration_data.update({"major_activity": "Services", "second_form_section": "Non-Trading"})
+    assert "second_form_section must be 1 (Non-Trading) or 2 (Trading)" in errors_for(registration_data)
+    registration_data["second_form_section"] = "2"
+    assert errors_for(registration_data) == []
@@ -0,0 +1,226 @@
+# udyam\validators.py
+
+import re
+from datetime import datetime, date
+
+from sqlalchemy import String
+
+from database import UdyamRegistration, Gender, SocialCategory
+from nic_catalogue import validate_nic_codes
+from gazetteer import get_gazetteer, resolve_address
+from ifsc_directory import IFSC_PATTERN, validate_ifsc
+
+
+# Verhoeff multiplication and permutation tables used by the Aadhaar check digit
+VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 6, 8, 7, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+
+DATE_FORMAT = "%Y-%m-%d"
+MAX_EMPLOYEES = 1000000
+MAX_AMOUNT = 1e13
+MAJOR_ACTIVITIES = ("Manufacturing", "Services", "Trading")
+
+# Set by the server (any value sent is overwritten), along with every column that has a default
+SERVER_FIELDS = {"id", "vendor_id", "error_message", "active_key", "step_plan", "deadline_at", "plan_position",
+                 "stage_details"}
+# Filled in at ingest when left out
+FILLED_AT_INGEST = {"bank_name"}
+
+REGISTRATION_COLUMNS = {column.name: column for column in UdyamRegistration.__table__.columns}
+INGEST_FIELDS = [
+    name for name, column in REGISTRATION_COLUMNS.items()
+    if name not in SERVER_FIELDS and column.default is None
+]
+REQUIRED_FIELDS = [
+    name for name in INGEST_FIELDS
+    if not REGISTRATION_COLUMNS[name].nullable and name not in FILLED_AT_INGEST
+]
+MAX_LENGTHS = {
+    name: REGISTRATION_COLUMNS[name].type.length for name in INGEST_FIELDS
+    if isinstance(REGISTRATION_COLUMNS[name].type, String) and REGISTRATION_COLUMNS[name].type.length
+}
+
+
+def verhoeff_valid(number):
+    checksum = 0
+    for i, digit in enumerate(reversed(str(number))):
+        checksum = VERHOEFF_D[checksum][VERHOEFF_P[i % 8][int(digit)]]
+    return checksum == 0
+
+
+def validate_aadhaar(aadhaar):
+    return bool(re.match(r"^[2-9]\d{11}$", aadhaar)) and verhoeff_valid(aadhaar)
+
+
+def validate_name(name):
+    return bool(re.match(r"^[a-zA-Z\s]{1,100}$", name))
+
+
+def parse_date(value):
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+# Column rules: each takes the whole column of values and returns one error (or None) per row
+
+def pattern(regex, message):
+    compiled = re.compile(regex)
+    return lambda values: [None if compiled.fullmatch(str(value)) else message for value in values]
+
+
+def check(predicate, message):
+    def rule(values):
+        errors = []
+        for value in values:
+            try:
+                errors.append(None if predicate(value) else message)
+            except (TypeError, ValueError):
+                errors.append(message)
+        return errors
+    return rule
+
+
+def number_between(low, high, integer=False):
+    def predicate(value):
+        if isinstance(value, bool):
+            return False
+        number = float(value)
+        # 3.7 employees is an error, not 3
+        if integer and not number.is_integer():
+            return False
+        return low <= number <= high
+    kind = "a whole number" if integer else "a number"
+    return check(predicate, f"must be {kind} between {low:g} and {high:g}")
+
+
+def is_date(value):
+    return parse_date(value) <= date.today()
+
+
+FIELD_RULES = {
+    "aadhaar": [
+        pattern(r"[2-9]\d{11}", "must be 12 digits and cannot start with 0 or 1"),
+        check(verhoeff_valid, "fails the Aadhaar checksum"),
+    ],
+    "name": [check(validate_name, "may only contain letters and spaces")],
+    # The bot registers proprietorships, so the PAN must belong to an individual (4th letter P)
+    "pan": [pattern(r"[A-Z]{3}P[A-Z]\d{4}[A-Z]", "must be an individual PAN like ABCPE1234F")],
+    "dob": [check(is_date, "must be a past date in YYYY-MM-DD format")],
+    "mobile": [pattern(r"[6-9]\d{9}", "must be a 10 digit Indian mobile number")],
+    "email": [pattern(r"[^@\s]+@[^@\s]+\.[^@\s]+", "must be a valid email address")],
+    "gender": [check(lambda value: Gender(value), f"must be one of {', '.join(g.value for g in Gender)}")],
+    "social_category": [check(lambda value: SocialCategory(value),
+                              f"must be one of {', '.join(c.value for c in SocialCategory)}")],
+    "pincode": [pattern(r"[1-9]\d{5}", "must be a 6 digit pincode")],
+    "official_pincode": [pattern(r"[1-9]\d{5}", "must be a 6 digit pincode")],
+    "date_of_incorporation": [check(is_date, "must be a past date in YYYY-MM-DD format")],
+    "date_of_commencement": [check(is_date, "must be a past date in YYYY-MM-DD format")],
+    "account_number": [pattern(r"\d{9,18}", "must be 9 to 18 digits")],
+    "ifsc_code": [pattern(IFSC_PATTERN.pattern, "must be an 11 character IFSC like SBIN0001234")],
+    "have_gstin": [check(lambda value: value in ("Yes", "No", "Exempted"), "must be Yes, No or Exempted")],
+    "major_activity": [check(lambda value: value in MAJOR_ACTIVITIES,
+                             f"must be one of {', '.join(MAJOR_ACTIVITIES)}")],
+    # The portal's sub-category under Services, 1-based: 1 Non-Trading, 2 Trading
+    "second_form_section": [pattern(r"[12]", "must be 1 (Non-Trading) or 2 (Trading)")],
+    "male_employees": [number_between(0, MAX_EMPLOYEES, integer=True)],
+    "female_employees": [number_between(0, MAX_EMPLOYEES, integer=True)],
+    "other_employees": [number_between(0, MAX_EMPLOYEES, integer=True)],
+    "investment_wdv": [number_between(0, MAX_AMOUNT)],
+    "investment_exclusion_cost": [number_between(0, MAX_AMOUNT)],
+    "total_turnover": [number_between(0, MAX_AMOUNT)],
+    "export_turnover": [number_between(0, MAX_AMOUNT)],
+}
+
+
+def row_errors(item):
+    """Rules that need several fields of one registration"""
+    errors = []
+    gazetteer = get_gazetteer()
+
+    if item.get("nic_codes") is not None:
+        errors.extend(validate_nic_codes(item["nic_codes"]))
+
+    if item.get("ifsc_code"):
+        errors.extend(validate_ifsc(item["ifsc_code"], item.get("bank_name")))
+
+    _, _, address_errors = resolve_address(item)
+    errors.extend(address_errors)
+    for pincode_field, state_field in (("pincode", "state"), ("official_pincode", "official_state")):
+        state = gazetteer.resolve_state(item.get(state_field))
+        if state and item.get(pincode_field) and not gazetteer.pincode_matches_state(item[pincode_field], state):
+            errors.append(f"{pincode_field} {item[pincode_field]} is not in {state}")
+
+    try:
+        dob = parse_date(item["dob"])
+        incorporation = parse_date(item["date_of_incorporation"])
+        commencement = parse_date(item["date_of_commencement"])
+        if dob >= incorporation:
+            errors.append("dob must be before date_of_incorporation")
+        if commencement < incorporation:
+            errors.append("date_of_commencement cannot be before date_of_incorporation")
+    except (KeyError, TypeError, ValueError):
+        pass  # Already reported by the field rules
+
+    try:
+        if float(item["export_turnover"]) > float(item["total_turnover"]):
+            errors.append("export_turnover cannot exceed total_turnover")
+    except (KeyError, TypeError, ValueError):
+        pass
+    return errors
+
+
+def validate_registrations(items):
+    """Validate a batch in one pass; returns {index: [errors]} for every invalid item"""
+    errors = {index: [] for index in range(len(items))}
+    rows = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index].append("registration must be an object")
+            continue
+        rows.append(index)
+        for field in item:
+            if field not in INGEST_FIELDS and field not in ("id", "vendor_id"):
+                errors[index].append(f"{field} is not a registration field")
+
+    # Presence and length are checked column by column straight from the ORM schema
+    for field in REQUIRED_FIELDS:
+        for index in rows:
+            if items[index].get(field) in (None, ""):
+                errors[index].append(f"{field} is required")
+    for field, max_length in MAX_LENGTHS.items():
+        for index in rows:
+            value = items[index].get(field)
+            if isinstance(value, str) and len(value) > max_length:
+                errors[index].append(f"{field} must be at most {max_length} characters")
+
+    for field, rules in FIELD_RULES.items():
+        present = [index for index in rows if items[index].get(field) not in (None, "")]
+        column = [items[index][field] for index in present]
+        for rule in rules:
+            for index, message in zip(present, rule(column)):
+                if message:
+                    errors[index].append(f"{field} {message}")
+
+    for index in rows:
+        errors[index].extend(row_errors(items[index]))
+
+    return {index: messages for index, messages in errors.items() if messages}
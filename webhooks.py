@@ -0,0 +1,221 @@
+# udyam\webhooks.py
+
+import os
+import json
+import hmac
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+
+import aiohttp
+
+from database import RegistrationStage, Vendor, WebhookDeadLetter, get_db_session
+
+
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+WEBHOOK_BATCH_WINDOW_MS = int(os.getenv("WEBHOOK_BATCH_WINDOW_MS", "250"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "6"))
+WEBHOOK_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", "1"))
+WEBHOOK_MAX_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_MAX_BACKOFF_SECONDS", "60"))
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_POOL_SIZE = int(os.getenv("WEBHOOK_POOL_SIZE", "100"))
+WEBHOOK_TARGET_CACHE_SECONDS = int(os.getenv("WEBHOOK_TARGET_CACHE_SECONDS", "30"))
+# How long shutdown waits for deliveries still in flight (retries included)
+WEBHOOK_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+# Queued by stop(): no more events follow
+STOP = object()
+
+# Only the transitions a vendor has to act on (or that end the flow) are delivered
+WEBHOOK_STAGES = {
+    RegistrationStage.OTP_REQUESTED.value,
+    RegistrationStage.CAPTCHA_REQUIRED.value,
+    RegistrationStage.COMPLETED.value,
+    RegistrationStage.ERROR.value,
+    RegistrationStage.DEADLINE_EXCEEDED.value,
+    RegistrationStage.SESSION_EXPIRED.value,
+}
+
+
+def sign_payload(secret, timestamp, body):
+    message = f"{timestamp}.".encode() + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def load_webhook_target(vendor_id):
+    session = get_db_session()
+    try:
+        vendor = session.query(Vendor.webhook_url, Vendor.webhook_secret).filter_by(id=vendor_id).first()
+        if not vendor or not vendor.webhook_url:
+            return None
+        return vendor.webhook_url, vendor.webhook_secret
+    finally:
+        session.close()
+
+
+def record_dead_letter(vendor_id, url, payload, attempts, error):
+    session = get_db_session()
+    try:
+        session.add(WebhookDeadLetter(
+            vendor_id=vendor_id,
+            webhook_url=url,
+            payload=payload,
+            attempts=attempts,
+            last_error=(error or "")[:500]
+        ))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Error recording webhook dead letter for vendor {vendor_id}: {str(e)}")
+    finally:
+        session.close()
+
+
+class WebhookDispatcher:
+    """Delivers stage events to vendor webhooks from its own asyncio loop and connection pool.
+
+    `send` is an async callable (url, body, headers) -> HTTP status; tests can swap in a stub
+    receiver instead of the default aiohttp client.
+    """
+
+    def __init__(self, send=None):
+        self._send = send
+        self._loop = None
+        self._queue = None
+        self._http = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._vendor_locks = {}
+        self._targets = {}
+        # The loop keeps only weak references to tasks; an unreferenced delivery could vanish mid-retry
+        self._tasks = set()
+        self._stopping = False
+
+    def set_sender(self, send):
+        self._send = send
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name="webhook-dispatcher", daemon=True)
+            self._thread.start()
+            self._ready.wait(5)
+        return self
+
+    def stop(self, timeout=WEBHOOK_SHUTDOWN_TIMEOUT_SECONDS):
+        """Deliver what is queued, wait for deliveries in flight, then end the loop"""
+        if self._thread is None or self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"Webhook deliveries still in flight after {timeout:g}s at shutdown")
+
+    def enqueue(self, vendor_id, event):
+        if event["stage"] not in WEBHOOK_STAGES or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (vendor_id, event))
+
+    def invalidate_target(self, vendor_id):
+        self._targets.pop(vendor_id, None)
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._ready.set()
+        self._loop.run_until_complete(self._dispatch())
+
+    async def _dispatch(self):
+        connector = aiohttp.TCPConnector(limit=WEBHOOK_POOL_SIZE)
+        timeout = aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+            self._http = http
+            while not self._stopping:
+                batches = await self._collect_batches()
+                for vendor_id, events in batches.items():
+                    task = asyncio.ensure_future(self._deliver(vendor_id, events))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _collect_batches(self):
+        batches = {}
+        item = await self._queue.get()
+        if item is STOP:
+            self._stopping = True
+            return batches
+        vendor_id, event = item
+        batches.setdefault(vendor_id, []).append(event)
+        count = 1
+        deadline = self._loop.time() + WEBHOOK_BATCH_WINDOW_MS / 1000.0
+        while count < WEBHOOK_BATCH_SIZE:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is STOP:
+                self._stopping = True
+                break
+            vendor_id, event = item
+            batches.setdefault(vendor_id, []).append(event)
+            count += 1
+        return batches
+
+    async def _get_target(self, vendor_id):
+        cached = self._targets.get(vendor_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        target = await self._loop.run_in_executor(None, load_webhook_target, vendor_id)
+        self._targets[vendor_id] = (time.monotonic() + WEBHOOK_TARGET_CACHE_SECONDS, target)
+        return target
+
+    async def _post(self, url, body, headers):
+        async with self._http.post(url, data=body, headers=headers) as response:
+            return response.status
+
+    async def _deliver(self, vendor_id, events):
+        # Batches for one vendor go out in order; other vendors are never blocked by it
+        lock = self._vendor_locks.setdefault(vendor_id, asyncio.Lock())
+        async with lock:
+            target = await self._get_target(vendor_id)
+            if not target:
+                return
+            url, secret = target
+            payload = {"events": events}
+            body = json.dumps(payload).encode()
+            send = self._send or self._post
+
+            error = None
+            for attempt in range(1, WEBHOOK_MAX_ATTEMPTS + 1):
+                timestamp = str(int(time.time()))
+                headers = {
+                    "Content-Type": "application/json",
+                    "X-Udyam-Timestamp": timestamp,
+                    "X-Udyam-Signature": sign_payload(secret or "", timestamp, body)
+                }
+                try:
+                    status = await send(url, body, headers)
+                    if 200 <= status < 300:
+                        return
+                    error = f"HTTP {status}"
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                logging.warning(f"Webhook delivery to vendor {vendor_id} failed (attempt {attempt}): {error}")
+                if attempt < WEBHOOK_MAX_ATTEMPTS:
+                    backoff = min(WEBHOOK_BACKOFF_SECONDS * 2 ** (attempt - 1), WEBHOOK_MAX_BACKOFF_SECONDS)
+                    await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+
+            logging.error(f"Webhook delivery to vendor {vendor_id} moved to dead letters: {error}")
+            await self._loop.run_in_executor(
+                None, record_dead_letter, vendor_id, url, payload, WEBHOOK_MAX_ATTEMPTS, error
+            )
+
+
+webhook_dispatcher = WebhookDispatcher()